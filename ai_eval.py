@@ -0,0 +1,286 @@
+# ai_eval.py
+"""Offline evaluation of the AI prompts: latency, tokens and simple quality checks.
+
+Replays eval/golden_set.json through ai_service.classify_user_intent,
+generate_quick_actions and ask_question and writes a JSON report.
+
+    # against the bundled stand-in (deterministic, no network)
+    python ai_eval.py --standin --out eval/baseline.json
+    # record real replies once, then replay them offline as a fixture
+    python ai_eval.py --record eval/fixture.json --out eval/live.json
+    python ai_eval.py --fixture eval/fixture.json --variant my_variant.json --out eval/variant.json
+    # compare two runs
+    python ai_eval.py --compare eval/baseline.json eval/variant.json
+
+A variant file overrides prompt_builder constants and token budgets:
+    {"name": "short-tutor", "prompt_builder": {"TUTOR_SYSTEM_PROMPT": "..."},
+     "budgets": {"tutor": 300}}
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+DEFAULT_GOLDEN_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval', 'golden_set.json')
+DEFAULT_QUICK_ACTIONS = ["What is the main topic?", "How does this work?", "What are the steps?"]
+STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'is', 'are', 'was', 'it', 'this', 'that', 'for',
+    'on', 'with', 'as', 'by', 'be', 'at', 'from', 'you', 'your', 'i', 'me', 'my', 'we', 'our', 'what',
+    'how', 'when', 'where', 'why', 'do', 'does', 'can', 'great', 'question', 'let', 'know', 'if',
+}
+
+
+def content_words(text):
+    return {w for w in re.findall(r"[a-z0-9%$][a-z0-9%$,.'-]*[a-z0-9%]|[a-z0-9]", text.lower())
+            if w not in STOPWORDS}
+
+
+def grounding_overlap(answer, context):
+    """Share of the answer's content words that also appear in the context"""
+    words = content_words(answer)
+    if not words:
+        return 0.0
+    return len(words & content_words(context)) / float(len(words))
+
+
+def sentence_count(text):
+    return len([s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s])
+
+
+class CallRecorder:
+    """Wraps model_router.complete to capture token usage and raw replies per call"""
+
+    def __init__(self, model_router):
+        self.model_router = model_router
+        self.original = model_router.complete
+        self.calls = []
+        self.replies = {}
+
+    def install(self):
+        self.model_router.complete = self.complete
+
+    def uninstall(self):
+        self.model_router.complete = self.original
+
+    def complete(self, chosen_route, messages, user_id=None, stream=False):
+        response = self.original(chosen_route, messages, user_id=user_id, stream=stream)
+        usage = response.get('usage', {}) if not stream else {}
+        self.calls.append({
+            "task": chosen_route.task,
+            "model": chosen_route.model,
+            "prompt_tokens": usage.get('prompt_tokens', 0),
+            "completion_tokens": usage.get('completion_tokens', 0),
+        })
+        # Keyed the same way the stand-in looks up recorded replies
+        user_text = "\n".join(m['content'] for m in messages if m['role'] == 'user')
+        key = hashlib.sha256(user_text.encode('utf-8')).hexdigest()
+        self.replies[key] = response.choices[0].message.content
+        return response
+
+    def take(self):
+        calls, self.calls = self.calls, []
+        return {
+            "prompt_tokens": sum(c['prompt_tokens'] for c in calls),
+            "completion_tokens": sum(c['completion_tokens'] for c in calls),
+            "upstream_calls": len(calls),
+            "models": sorted({c['model'] for c in calls}),
+        }
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _summarize(latencies, cases):
+    # Imported here: config must not load before run() has pointed it at the stand-in
+    from services.model_router import percentile
+    return {
+        "cases": len(cases),
+        "latency_p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "latency_p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+        "latency_max_ms": round(max(latencies), 1) if latencies else None,
+        "prompt_tokens": sum(c['prompt_tokens'] for c in cases),
+        "completion_tokens": sum(c['completion_tokens'] for c in cases),
+        "prompt_tokens_mean": round(sum(c['prompt_tokens'] for c in cases) / float(len(cases)), 1) if cases else 0,
+    }
+
+
+def eval_classify(ai_service, recorder, golden):
+    cases, latencies = [], []
+    for case in golden:
+        intent, ms = _timed(ai_service.classify_user_intent,
+                            case['input'], case.get('current_section', ''), case.get('next_section', ''))
+        usage = recorder.take()
+        latencies.append(ms)
+        cases.append(dict(usage, input=case['input'], expected=case['expected'], got=intent,
+                          correct=intent == case['expected'], latency_ms=round(ms, 1)))
+    summary = _summarize(latencies, cases)
+    summary['accuracy'] = round(sum(c['correct'] for c in cases) / float(len(cases)), 3) if cases else None
+    return summary, cases
+
+
+def eval_quick_actions(ai_service, recorder, golden):
+    cases, latencies = [], []
+    for case in golden:
+        actions, ms = _timed(ai_service.generate_quick_actions, case['content'])
+        usage = recorder.take()
+        latencies.append(ms)
+        valid = len(actions) == 3 and all(a.endswith('?') and len(a) <= 60 for a in actions)
+        grounded = [grounding_overlap(a, case['content']) for a in actions]
+        cases.append(dict(usage, id=case.get('id'), actions=actions, valid=valid,
+                          fallback=actions == DEFAULT_QUICK_ACTIONS,
+                          grounding=round(sum(grounded) / len(grounded), 3) if grounded else 0.0,
+                          latency_ms=round(ms, 1)))
+    summary = _summarize(latencies, cases)
+    if cases:
+        summary['valid_rate'] = round(sum(c['valid'] for c in cases) / float(len(cases)), 3)
+        summary['fallback_rate'] = round(sum(c['fallback'] for c in cases) / float(len(cases)), 3)
+        summary['grounding_mean'] = round(sum(c['grounding'] for c in cases) / len(cases), 3)
+    return summary, cases
+
+
+def eval_ask(ai_service, recorder, golden):
+    cases, latencies = [], []
+    for case in golden:
+        answer, ms = _timed(ai_service.ask_question, case['question'], case['context'], case.get('chapter_title', ''))
+        usage = recorder.take()
+        latencies.append(ms)
+        cases.append(dict(usage, id=case.get('id'), answer=answer,
+                          words=len(answer.split()), sentences=sentence_count(answer),
+                          grounding=round(grounding_overlap(answer, case['context']), 3),
+                          latency_ms=round(ms, 1)))
+    summary = _summarize(latencies, cases)
+    if cases:
+        summary['answer_words_mean'] = round(sum(c['words'] for c in cases) / float(len(cases)), 1)
+        summary['within_two_sentences_rate'] = round(sum(c['sentences'] <= 2 for c in cases) / float(len(cases)), 3)
+        summary['grounding_mean'] = round(sum(c['grounding'] for c in cases) / len(cases), 3)
+    return summary, cases
+
+
+def apply_variant(variant, prompt_builder, config):
+    """Override prompt_builder constants and token budgets for this run"""
+    for name, value in variant.get('prompt_builder', {}).items():
+        if not hasattr(prompt_builder, name):
+            raise SystemExit(f"Unknown prompt_builder attribute in variant: {name}")
+        setattr(prompt_builder, name, value)
+    config.PROMPT_TOKEN_BUDGETS.update(variant.get('budgets', {}))
+
+
+def run(args):
+    variant = {}
+    if args.variant:
+        with open(args.variant) as f:
+            variant = json.load(f)
+
+    standin_server = None
+    if args.standin or args.fixture:
+        import openai_standin
+        responses = {}
+        if args.fixture:
+            with open(args.fixture) as f:
+                responses = json.load(f)
+        settings = openai_standin.StandinSettings(
+            ttft_ms=args.ttft_ms, inter_token_ms=args.inter_token_ms, responses=responses)
+        standin_server, base_url = openai_standin.start_in_background(settings=settings)
+        os.environ['OPENAI_API_BASE'] = base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'standin')
+    elif args.api_base:
+        os.environ['OPENAI_API_BASE'] = args.api_base
+
+    import openai
+    import config
+    from services import ai_service, model_router, prompt_builder, openai_transport
+
+    openai.api_key = config.OPENAI_API_KEY or os.environ.get('OPENAI_API_KEY')
+    openai.api_base = config.OPENAI_API_BASE or os.environ.get('OPENAI_API_BASE') or openai.api_base
+    openai_transport.reset_session()
+    apply_variant(variant, prompt_builder, config)
+
+    with open(args.golden) as f:
+        golden = json.load(f)
+
+    recorder = CallRecorder(model_router)
+    recorder.install()
+    try:
+        classify_summary, classify_cases = eval_classify(ai_service, recorder, golden.get('classify', []))
+        quick_summary, quick_cases = eval_quick_actions(ai_service, recorder, golden.get('quick_actions', []))
+        ask_summary, ask_cases = eval_ask(ai_service, recorder, golden.get('ask', []))
+    finally:
+        recorder.uninstall()
+        if standin_server:
+            standin_server.shutdown()
+
+    report = {
+        "label": variant.get('name') or args.label,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "upstream": "fixture" if args.fixture else "standin" if args.standin else openai.api_base,
+        "models": {task: route['model'] for task, route in config.AI_MODEL_ROUTES.items()},
+        "summary": {
+            "classify": classify_summary,
+            "quick_actions": quick_summary,
+            "ask": ask_summary,
+        },
+        "cases": {
+            "classify": classify_cases,
+            "quick_actions": quick_cases,
+            "ask": ask_cases,
+        },
+    }
+
+    if args.record:
+        with open(args.record, 'w') as f:
+            json.dump(recorder.replies, f, indent=2, sort_keys=True)
+        print(f"Recorded {len(recorder.replies)} replies to {args.record}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    print(json.dumps(report['summary'], indent=2))
+    return report
+
+
+def compare(base_path, new_path):
+    """Print metric-by-metric differences between two reports"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'metric':<45}{base['label']:>14}{new['label']:>14}{'delta':>12}")
+    for endpoint in ('classify', 'quick_actions', 'ask'):
+        base_summary = base['summary'].get(endpoint, {})
+        new_summary = new['summary'].get(endpoint, {})
+        for metric in sorted(set(base_summary) | set(new_summary)):
+            before, after = base_summary.get(metric), new_summary.get(metric)
+            if isinstance(before, (int, float)) and isinstance(after, (int, float)):
+                delta = after - before
+                pct = f" ({delta / before * 100:+.0f}%)" if before else ""
+                print(f"{endpoint + '.' + metric:<45}{before:>14}{after:>14}{delta:>+12.3g}{pct}")
+            else:
+                print(f"{endpoint + '.' + metric:<45}{str(before):>14}{str(after):>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the golden set through the AI service and report metrics")
+    parser.add_argument('--golden', default=DEFAULT_GOLDEN_SET)
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--variant', help="JSON file with prompt overrides")
+    parser.add_argument('--standin', action='store_true', help="run against an in-process stand-in")
+    parser.add_argument('--fixture', help="replay recorded replies through the stand-in")
+    parser.add_argument('--api-base', help="OpenAI-compatible base URL to evaluate against")
+    parser.add_argument('--ttft-ms', type=float, default=0)
+    parser.add_argument('--inter-token-ms', type=float, default=0)
+    parser.add_argument('--record', help="write raw replies to a fixture file")
+    parser.add_argument('--out', help="write the JSON report here")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="compare two reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    run(args)
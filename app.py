@@ -6,8 +6,12 @@ from flask_cors import CORS
 import openai
 from auth import auth_bp, init_oauth
 from routes import register_blueprints
+from services import analytics_service, notion_service, openai_transport, prompt_builder
 import config
+import db_connection
+import storage
 from utils.error_handler import setup_error_handlers
+from utils import instrumentation, metrics
 from datetime import datetime
 import pymongo
 
@@ -27,12 +31,65 @@ google = init_oauth(app)
 # Setup error handlers
 setup_error_handlers(app)
 
+# Per-endpoint request counts and latencies for /metrics
+instrumentation.init_app(app)
+
 # CORS configuration
 CORS(app, origins=['*'])  # In production, you might want to restrict this
 
 # Initialize OpenAI
 openai.api_key = config.OPENAI_API_KEY
 
+def start_background_services():
+    """Per-process background work: OpenAI warm-up, MongoDB connection and analytics.
+
+    Runs at import for the dev server and plain gunicorn. With gunicorn.conf.py
+    the preloading master skips it (sockets and threads don't survive fork)
+    and every worker calls it from post_fork instead.
+    """
+    # Pre-warm the pooled OpenAI connection in the background
+    openai_transport.warm_up_async()
+
+    # Connect to MongoDB in the background; /ready reports when it's done
+    if storage.uses_mongo():
+        db_connection.start_background_connect()
+
+    # Keep the analytics rollups fresh (one worker refreshes per interval)
+    analytics_service.start_scheduler()
+
+def warm_shared_content():
+    """Load read-only data up front; under preload_app workers share it copy-on-write"""
+    models = {config.DEFAULT_CHAT_MODEL}
+    for route in config.AI_MODEL_ROUTES.values():
+        models.update(filter(None, (route.get('model'), route.get('fallback_model'))))
+    for model in models:
+        prompt_builder.count_tokens('', model)
+    try:
+        course_map = notion_service.build_course_map(config.NOTION_DATABASE_ID)
+        print(f"Warmed course map ({len(course_map)} pages) and {len(models)} tokenizers")
+    except Exception as e:
+        # Workers build it on first use instead
+        print(f"Course map warm-up failed (not critical): {e}")
+
+if not config.DEFER_BACKGROUND_START:
+    start_background_services()
+
+def _shared_client_check():
+    """Ping the app's shared MongoDB client"""
+    try:
+        client = db_connection.get_client()
+    except db_connection.DatabaseUnavailableError as e:
+        return dict(db_connection.status(), error=str(e))
+    check = db_connection.status()
+    if client is not None:
+        try:
+            started = datetime.now()
+            client.admin.command('ping')
+            check["ping_ms"] = round((datetime.now() - started).total_seconds() * 1000, 1)
+        except Exception as e:
+            check["ping_error"] = str(e)
+    return check
+
 @app.route('/diagnose/mongodb')
 def diagnose_mongodb():
     """Diagnostic endpoint for MongoDB connections"""
@@ -42,7 +99,8 @@ def diagnose_mongodb():
         "pymongo_version": pymongo.__version__,
         "render_env": os.environ.get('RENDER', 'false'),
         "methods_tested": [],
-        "successful_methods": []
+        "successful_methods": [],
+        "shared_client": _shared_client_check()
     }
     
     # Get MongoDB URI
@@ -113,6 +171,7 @@ def diagnose_mongodb():
             "connection_options": str(method["options"])
         }
         
+        client = None
         try:
             # Apply URI modifier if specified
             test_uri = uri
@@ -143,6 +202,10 @@ def diagnose_mongodb():
                 
         except Exception as e:
             result["error"] = str(e)
+        finally:
+            # Probe clients are throwaway; the app itself uses the shared client
+            if client is not None:
+                client.close()
         
         results["methods_tested"].append(result)
     
@@ -164,7 +227,8 @@ def health_check():
             "timestamp": datetime.now().isoformat(),
             "environment": "Render" if is_render else "Local",
             "python_version": pymongo.__version__,
-            "mock_db": "users_collection" not in dir()
+            "storage": config.STORAGE_BACKEND,
+            "database": db_connection.status()["state"] if storage.uses_mongo() else None
         }
         return jsonify(health_info)
     except Exception as e:
@@ -174,6 +238,31 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once MongoDB is connected (always, with the SQLite backend)"""
+    if not storage.uses_mongo():
+        return jsonify({"ready": True, "storage": config.STORAGE_BACKEND,
+                        "timestamp": datetime.now().isoformat()})
+    # Kicks off a retry if the last attempt failed long enough ago
+    db_connection.start_background_connect()
+    database = db_connection.status()
+    body = {
+        "ready": database["ready"],
+        "storage": config.STORAGE_BACKEND,
+        "database": database,
+        "timestamp": datetime.now().isoformat()
+    }
+    return jsonify(body), 200 if database["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request, dependency and AI metrics for all workers on this host, in Prometheus format
+
+    /ai/metrics serves the same output for older scrapers; configure only one.
+    """
+    return metrics.exposition(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
 # --- Legacy routes for backward compatibility ---
 @app.route('/get-course-content', methods=['GET'])
 def legacy_get_course_content():
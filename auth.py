@@ -4,142 +4,10 @@ import json
 from datetime import datetime
 from flask import Blueprint, redirect, url_for, session, request, jsonify, flash
 from authlib.integrations.flask_client import OAuth
-from pymongo import MongoClient
 from bson import ObjectId
 from dotenv import load_dotenv
 import config
-import ssl
-
-# Initialize MongoDB with multiple connection methods
-try:
-    # Check if we're on Render
-    is_render = os.environ.get('RENDER', 'false').lower() == 'true'
-    
-    if is_render:
-        print("Running on Render - trying multiple MongoDB connection methods")
-        
-        # Try multiple connection methods
-        connection_options = [
-            # Method 1: Standard SRV connection with TLS options
-            {
-                "name": "Standard SRV with TLS options",
-                "options": {
-                    "tls": True,
-                    "tlsAllowInvalidCertificates": True,
-                    "retryWrites": True,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                }
-            },
-            # Method 2: Direct connection without SRV
-            {
-                "name": "Direct connection without SRV",
-                "options": {
-                    "tls": True,
-                    "tlsAllowInvalidCertificates": True,
-                    "retryWrites": True,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                },
-                "uri_modifier": lambda uri: uri.replace("mongodb+srv://", "mongodb://")
-            },
-            # Method 3: SSL with certificate requirements disabled
-            {
-                "name": "SSL with cert requirements disabled",
-                "options": {
-                    "ssl": True,
-                    "ssl_cert_reqs": ssl.CERT_NONE,
-                    "retryWrites": False,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                }
-            }
-        ]
-        
-        # Try each method until one works
-        last_error = None
-        for method in connection_options:
-            try:
-                print(f"Trying MongoDB connection method: {method['name']}")
-                
-                # Apply URI modifier if specified
-                if "uri_modifier" in method:
-                    uri = method["uri_modifier"](config.MONGODB_URI)
-                    print(f"Modified URI: {uri.split('@')[0]}@***")
-                else:
-                    uri = config.MONGODB_URI
-                
-                # Create client with options
-                client = MongoClient(uri, **method["options"])
-                
-                # Test connection
-                client.admin.command('ping')
-                print(f"MongoDB connection successful with method: {method['name']}")
-                
-                # Get database
-                db = client[config.MONGODB_DB_NAME]
-                users_collection = db.users
-                
-                # Exit the loop if connection works
-                break
-                
-            except Exception as e:
-                print(f"Connection method failed: {method['name']} - {e}")
-                last_error = e
-                continue
-        
-        # If we've tried all methods and still have an error, raise it
-        if last_error and 'users_collection' not in locals():
-            raise last_error
-    else:
-        # Standard connection for local development
-        print("Local environment - using standard MongoDB connection")
-        client = MongoClient(config.MONGODB_URI)
-        db = client[config.MONGODB_DB_NAME]
-        users_collection = db.users
-        
-except Exception as e:
-    print(f"MongoDB connection error in auth.py: {e}")
-    
-    # Define a mock collection for development/testing
-    class MockCollection:
-        def find_one(self, query=None, *args, **kwargs):
-            print(f"Mock DB - find_one with query: {query}")
-            # Return a mock user for development
-            return {
-                "_id": "mock_id", 
-                "email": "test@hy.ly", 
-                "name": "Test User", 
-                "google_id": "12345",
-                "course_progress": {},
-                "completed_chapters": [],
-                "total_time_spent": 0,
-                "created_at": datetime.utcnow()
-            }
-        
-        def insert_one(self, document, *args, **kwargs):
-            print(f"Mock DB - insert_one: {document}")
-            class MockResult:
-                @property
-                def inserted_id(self):
-                    return "mock_id"
-            return MockResult()
-        
-        def update_one(self, query, update, *args, **kwargs):
-            print(f"Mock DB - update_one: {query} → {update}")
-            return None
-    
-    # Use mock database if MongoDB connection fails
-    print("Using mock database for development/testing")
-    class MockDB:
-        def __getattr__(self, name):
-            return MockCollection()
-    
-    db = MockDB()
-    users_collection = db.users
+from services import user_service
 
 # Create Blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -214,34 +82,8 @@ def callback():
             
             print(f"Access granted for: {email}")
             
-            # Check if user exists in database
-            user = users_collection.find_one({'email': email})
-            
-            if not user:
-                # Create new user
-                user_data = {
-                    'email': email,
-                    'name': name,
-                    'google_id': google_id,
-                    'picture': picture,
-                    'created_at': datetime.utcnow(),
-                    'last_login': datetime.utcnow(),
-                    'course_progress': {},
-                    'total_time_spent': 0,
-                    'completed_chapters': [],
-                    'bookmarks': []
-                }
-                result = users_collection.insert_one(user_data)
-                user_data['_id'] = result.inserted_id
-                user = user_data
-                print(f"Created new user: {email}")
-            else:
-                # Update last login
-                users_collection.update_one(
-                    {'_id': user['_id']},
-                    {'$set': {'last_login': datetime.utcnow()}}
-                )
-                print(f"Updated existing user: {email}")
+            # Create or update the user in one round trip
+            user = user_service.upsert_login(email, name, google_id, picture)
             
             # Store user info in session
             session['user'] = {
@@ -522,10 +364,26 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def is_admin():
+    """True if the signed-in user is on the ADMIN_EMAILS allow-list"""
+    email = (session.get('user') or {}).get('email') or ''
+    return email.lower() in config.ADMIN_EMAILS
+
+def require_admin(f):
+    """Decorator to restrict a route to ADMIN_EMAILS (use under require_auth)"""
+    from functools import wraps
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not is_admin():
+            return jsonify({"error": "Admin access required", "status": "error"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 # Helper function to get current user
-def get_current_user():
-    """Get current user from session"""
+def get_current_user(fields=None):
+    """Get current user from session, loading only `fields` when given"""
     user_session = session.get('user')
     if user_session and user_session.get('is_authenticated'):
-        return users_collection.find_one({'_id': ObjectId(user_session['id'])})
+        return user_service.get_user_by_id(user_session['id'], fields)
     return None
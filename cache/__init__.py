@@ -0,0 +1,50 @@
+# cache/__init__.py
+"""Cache for content fetched from Notion, shared as widely as the backend allows.
+
+CACHE_BACKEND picks the store: 'memory' (per process, shared with gunicorn
+workers only when filled before the fork), 'disk' (a directory shared by the
+workers on one host; /dev/shm keeps it in memory) or 'mongo' (a TTL-indexed
+collection shared by every instance). Shared backends keep a small in-process
+LRU in front so hot keys don't pay a read each time.
+"""
+import os
+import threading
+import config
+from cache.base import Cache
+from cache.memory_cache import MemoryCache
+
+_cache = None
+_lock = threading.Lock()
+
+
+def _create(backend):
+    local = MemoryCache(config.CACHE_LOCAL_MAX_ENTRIES)
+    if backend == 'memory':
+        return local
+    if backend == 'disk':
+        from cache.disk_cache import DiskCache
+        return DiskCache(config.CACHE_DIR, local=local)
+    if backend == 'mongo':
+        from cache.mongo_cache import MongoCache
+        return MongoCache(local=local)
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r} (expected 'memory', 'disk' or 'mongo')")
+
+
+def get_cache():
+    """The process-wide cache for the configured backend"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = _create(config.CACHE_BACKEND)
+    return _cache
+
+
+def _after_fork():
+    global _lock
+    _lock = threading.Lock()
+    if _cache is not None:
+        _cache._after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
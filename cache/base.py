@@ -0,0 +1,192 @@
+# cache/base.py
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import config
+
+
+def dumps(value):
+    """Every backend stores the same compact JSON text"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads(payload):
+    return json.loads(payload)
+
+
+class Cache(ABC):
+    """Cache for content fetched from Notion (course map, rendered pages).
+
+    Values must be JSON-serializable and are stored as the same JSON text by
+    every backend, so switching backends never changes what callers get back.
+    None means "missing" and is never stored. Subclasses implement _read,
+    _write and _delete and, when several processes share the store,
+    _acquire_lease/_release_lease. Backend errors are logged and treated as
+    misses: the cache must never take content offline.
+
+    get_or_compute guards against stampedes at two levels: one thread per
+    process computes a missing key while the others wait for it, and across
+    processes the holder of a short lease computes while the rest poll the
+    shared store.
+    """
+
+    name = None
+
+    def __init__(self, local=None):
+        # Optional in-process front tier (a MemoryCache) for shared backends
+        self.local = local
+        self.counts = {'hits': 0, 'misses': 0, 'computes': 0, 'lease_waits': 0, 'errors': 0}
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    # --- Backend ---
+
+    @abstractmethod
+    def _read(self, key):
+        """Stored payload for key, or None when missing or expired"""
+
+    @abstractmethod
+    def _write(self, key, payload, ttl):
+        """Store payload for ttl seconds"""
+
+    @abstractmethod
+    def _delete(self, key):
+        """Remove key if present"""
+
+    def _acquire_lease(self, key, ttl):
+        """True if this process should compute key; in-process backends always should"""
+        return True
+
+    def _release_lease(self, key):
+        pass
+
+    def _after_fork(self):
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        if self.local is not None:
+            self.local._after_fork()
+
+    # --- Public ---
+
+    def _key(self, key):
+        # Bump CACHE_NAMESPACE to invalidate everything, e.g. after changing the markdown rendering
+        return f"{config.CACHE_NAMESPACE}:{key}"
+
+    def get(self, key):
+        """Cached value, or None"""
+        key = self._key(key)
+        if self.local is not None:
+            payload = self.local._read(key)
+            if payload is not None:
+                self.counts['hits'] += 1
+                return loads(payload)
+        try:
+            payload = self._read(key)
+        except Exception as e:
+            self.counts['errors'] += 1
+            print(f"Cache read from {self.name} failed: {e}")
+            payload = None
+        if payload is None:
+            self.counts['misses'] += 1
+            return None
+        self.counts['hits'] += 1
+        if self.local is not None:
+            # Can outlive the shared entry by up to CACHE_LOCAL_TTL_SECONDS
+            self.local._write(key, payload, config.CACHE_LOCAL_TTL_SECONDS)
+        return loads(payload)
+
+    def set(self, key, value, ttl):
+        key, payload = self._key(key), dumps(value)
+        if self.local is not None:
+            self.local._write(key, payload, min(ttl, config.CACHE_LOCAL_TTL_SECONDS))
+        try:
+            self._write(key, payload, ttl)
+        except Exception as e:
+            self.counts['errors'] += 1
+            print(f"Cache write to {self.name} failed: {e}")
+
+    def delete(self, key):
+        key = self._key(key)
+        if self.local is not None:
+            self.local._delete(key)
+        try:
+            self._delete(key)
+        except Exception as e:
+            self.counts['errors'] += 1
+            print(f"Cache delete from {self.name} failed: {e}")
+
+    def get_or_compute(self, key, compute, ttl):
+        """Cached value for key, or compute() stored for ttl seconds (None results aren't stored)"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._flight(key):
+            # Another thread may have filled it while this one waited
+            value = self.get(key)
+            if value is not None:
+                return value
+            leased = self._lease(key)
+            if not leased:
+                value = self._wait_for(key)
+                if value is not None:
+                    return value
+                # The holder is slow or gone; compute rather than fail
+            try:
+                self.counts['computes'] += 1
+                value = compute()
+                if value is not None:
+                    self.set(key, value, ttl)
+            finally:
+                if leased:
+                    self._unlease(key)
+        return value
+
+    def stats(self):
+        return dict(self.counts, backend=self.name)
+
+    # --- Stampede protection ---
+
+    @contextmanager
+    def _flight(self, key):
+        """Per-key lock so one thread per process computes a missing entry"""
+        with self._flights_lock:
+            lock, waiters = self._flights.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._flights[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flights_lock:
+                lock, waiters = self._flights[key]
+                if waiters == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, waiters - 1)
+
+    def _lease(self, key):
+        try:
+            return self._acquire_lease(self._key(key), config.CACHE_LEASE_SECONDS)
+        except Exception as e:
+            self.counts['errors'] += 1
+            print(f"Cache lease on {self.name} failed: {e}")
+            return True
+
+    def _unlease(self, key):
+        try:
+            self._release_lease(self._key(key))
+        except Exception as e:
+            print(f"Cache lease release on {self.name} failed: {e}")
+
+    def _wait_for(self, key):
+        """Poll for the value another process is computing"""
+        self.counts['lease_waits'] += 1
+        deadline = time.monotonic() + config.CACHE_LEASE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(config.CACHE_POLL_SECONDS)
+            value = self.get(key)
+            if value is not None:
+                return value
+        return None
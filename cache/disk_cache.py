@@ -0,0 +1,104 @@
+# cache/disk_cache.py
+import hashlib
+import os
+import tempfile
+import time
+from cache.base import Cache
+
+# Sweep expired entries every this many writes
+PRUNE_EVERY = 200
+
+
+class DiskCache(Cache):
+    """One file per key in a directory shared by the workers on a host.
+
+    Point CACHE_DIR at /dev/shm to keep it in shared memory. Entries are
+    written to a temporary file and renamed into place, so readers never see
+    a partial one; leases are lock files created with O_EXCL.
+    """
+
+    name = 'disk'
+
+    def __init__(self, directory, local=None):
+        super().__init__(local)
+        self.directory = directory
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix='.json'):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + suffix)
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                # First line is the wall-clock expiry, shared by every process
+                expires_at = float(f.readline())
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        return payload if expires_at > time.time() else None
+
+    def _write(self, key, payload, ttl):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f"{time.time() + ttl}\n")
+                f.write(payload)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def _delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _acquire_lease(self, key, ttl):
+        path = self._path(key, '.lock')
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                pass
+            # A holder that died leaves its lock behind; take over once it's older than the lease
+            try:
+                if time.time() - os.path.getmtime(path) < ttl:
+                    return False
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return False
+
+    def _release_lease(self, key):
+        try:
+            os.unlink(self._path(key, '.lock'))
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        """Remove expired entries and abandoned temporary files; returns how many"""
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.json'):
+                    with open(path, encoding='utf-8') as f:
+                        expired = float(f.readline()) <= now
+                else:
+                    expired = now - os.path.getmtime(path) > 3600
+                if expired:
+                    os.unlink(path)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
@@ -0,0 +1,49 @@
+# cache/memory_cache.py
+import threading
+import time
+from collections import OrderedDict
+from cache.base import Cache
+
+
+class MemoryCache(Cache):
+    """In-process LRU with per-entry expiry.
+
+    Entries written before a fork (gunicorn preload_app) are shared with the
+    workers copy-on-write; after that each process fills its own.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries):
+        super().__init__()
+        self.max_entries = max_entries
+        # key -> (expires_at on the monotonic clock, payload)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _write(self, key, payload, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _after_fork(self):
+        # Keep the entries, they're the point of preloading
+        super()._after_fork()
+        self._lock = threading.Lock()
@@ -0,0 +1,67 @@
+# cache/mongo_cache.py
+import os
+import socket
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import db_connection
+from cache.base import Cache
+
+
+class MongoCache(Cache):
+    """Entries in a MongoDB collection shared by every instance.
+
+    A TTL index on expires_at (db_indexes.py) removes expired entries; reads
+    check expires_at too, because the TTL monitor only runs once a minute.
+    Leases are documents in the same collection with _id 'lease:<key>'.
+    Until this process is connected every read misses and nothing is
+    written, so a slow Atlas never holds up content.
+    """
+
+    name = 'mongo'
+
+    def __init__(self, local=None):
+        super().__init__(local)
+        self.entries = db_connection.get_collection('cache_entries')
+
+    def _available(self):
+        if db_connection.is_ready():
+            return True
+        db_connection.start_background_connect()
+        return False
+
+    def _read(self, key):
+        if not self._available():
+            return None
+        doc = self.entries.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}}, {'value': 1})
+        return doc['value'] if doc else None
+
+    def _write(self, key, payload, ttl):
+        if not self._available():
+            return
+        self.entries.update_one(
+            {'_id': key},
+            {'$set': {'value': payload, 'expires_at': datetime.utcnow() + timedelta(seconds=ttl)}},
+            upsert=True)
+
+    def _delete(self, key):
+        if self._available():
+            self.entries.delete_one({'_id': key})
+
+    def _acquire_lease(self, key, ttl):
+        if not self._available():
+            return True
+        now = datetime.utcnow()
+        try:
+            # Matches only a missing or expired lease; a live one makes the upsert collide on _id
+            self.entries.update_one(
+                {'_id': f'lease:{key}', 'expires_at': {'$lte': now}},
+                {'$set': {'expires_at': now + timedelta(seconds=ttl),
+                          'holder': f"{socket.gethostname()}:{os.getpid()}"}},
+                upsert=True)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _release_lease(self, key):
+        if self._available():
+            self.entries.delete_one({'_id': f'lease:{key}', 'holder': f"{socket.gethostname()}:{os.getpid()}"})
@@ -10,6 +10,9 @@ if os.path.exists('.env'):
 SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-secret-key')
 DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
 PORT = int(os.getenv('PORT', 5000))
+# Set by gunicorn.conf.py: background threads and connections start in each
+# worker's post_fork rather than in the preloading master
+DEFER_BACKGROUND_START = os.getenv('DEFER_BACKGROUND_START', 'false').lower() in ('true', '1', 't')
 
 # API Keys
 NOTION_API_KEY = os.getenv('NOTION_API_KEY')
@@ -23,10 +26,195 @@ GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 # MongoDB
 MONGODB_URI = os.getenv('MONGODB_URI')
 MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME', 'course_platform')
+# One pooled client per process; sized per gunicorn worker
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 20))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 0))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 60000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 30000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 30000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 30000))
+# Connection is established in the background; requests wait this long for it
+MONGODB_STARTUP_WAIT_SECONDS = float(os.getenv('MONGODB_STARTUP_WAIT_SECONDS', 10))
+MONGODB_RETRY_AFTER_SECONDS = int(os.getenv('MONGODB_RETRY_AFTER_SECONDS', 5))
+MONGODB_ENSURE_INDEXES = os.getenv('MONGODB_ENSURE_INDEXES', 'true').lower() in ('true', '1', 't')
+
+# User and progress storage: 'mongo', or 'sqlite' for an embedded database file
+# (offline development and load tests; analytics rollups and chat transcripts
+# need MongoDB)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'local_storage.db')
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', 5))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+# Cache for the course map and rendered Notion pages (see cache/__init__.py):
+# 'memory' (per process), 'disk' (shared by the workers on a host) or 'mongo'
+# (shared by every instance)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory').lower()
+CACHE_NAMESPACE = os.getenv('CACHE_NAMESPACE', 'v1')
+CACHE_DIR = os.getenv('CACHE_DIR', '/dev/shm/course-cache' if os.path.isdir('/dev/shm') else 'cache_data')
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 256))
+CACHE_LOCAL_TTL_SECONDS = float(os.getenv('CACHE_LOCAL_TTL_SECONDS', 30))
+CACHE_COURSE_MAP_TTL_SECONDS = int(os.getenv('CACHE_COURSE_MAP_TTL_SECONDS', 3600))
+# Notion's signed file URLs (images) expire after an hour; refresh well before
+CACHE_PAGE_TTL_SECONDS = int(os.getenv('CACHE_PAGE_TTL_SECONDS', 1800))
+# Stampede protection: one process computes a missing entry, the rest wait up to CACHE_LEASE_WAIT_SECONDS
+CACHE_LEASE_SECONDS = int(os.getenv('CACHE_LEASE_SECONDS', 30))
+CACHE_LEASE_WAIT_SECONDS = float(os.getenv('CACHE_LEASE_WAIT_SECONDS', 10))
+CACHE_POLL_SECONDS = float(os.getenv('CACHE_POLL_SECONDS', 0.1))
+
+# Per-process cache of the session user lookup (progress and other fields are per request)
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 2048))
+
+# Progress saves: 'buffered' merges them in memory and writes them in bulk every
+# PROGRESS_FLUSH_SECONDS (a crash can lose that window); 'immediate' writes each one
+PROGRESS_WRITE_MODE = os.getenv('PROGRESS_WRITE_MODE', 'buffered')
+PROGRESS_FLUSH_SECONDS = float(os.getenv('PROGRESS_FLUSH_SECONDS', 5))
+PROGRESS_MAX_PENDING = int(os.getenv('PROGRESS_MAX_PENDING', 500))
+PROGRESS_BATCH_MAX_EVENTS = int(os.getenv('PROGRESS_BATCH_MAX_EVENTS', 50))
+_progress_w = os.getenv('PROGRESS_WRITE_CONCERN', '1')
+PROGRESS_WRITE_CONCERN = int(_progress_w) if _progress_w.isdigit() else _progress_w
+
+# Section dwell samples are appended to one bucket document per user, chapter
+# and hour; samples are capped at DWELL_MAX_SECONDS (idle tabs) and views shorter
+# than DWELL_SKIP_SECONDS count as skipped in the heatmap
+DWELL_BUCKET_MAX_SAMPLES = int(os.getenv('DWELL_BUCKET_MAX_SAMPLES', 200))
+DWELL_MAX_SECONDS = int(os.getenv('DWELL_MAX_SECONDS', 1800))
+DWELL_SKIP_SECONDS = int(os.getenv('DWELL_SKIP_SECONDS', 3))
+
+# Chat transcripts: messages per bucket document, and write-behind flushing
+CHAT_BUCKET_SIZE = int(os.getenv('CHAT_BUCKET_SIZE', 50))
+CHAT_FLUSH_SECONDS = float(os.getenv('CHAT_FLUSH_SECONDS', 2))
+CHAT_MAX_PENDING = int(os.getenv('CHAT_MAX_PENDING', 500))
+CHAT_MAX_MESSAGE_CHARS = int(os.getenv('CHAT_MAX_MESSAGE_CHARS', 8000))
+
+# Admin user listing page size
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+ADMIN_PAGE_SIZE_MAX = int(os.getenv('ADMIN_PAGE_SIZE_MAX', 200))
+
+# Analytics rollups: recomputed in the background, read by /admin/analytics
+ANALYTICS_ROLLUP_ENABLED = os.getenv('ANALYTICS_ROLLUP_ENABLED', 'true').lower() in ('true', '1', 't')
+ANALYTICS_REFRESH_SECONDS = int(os.getenv('ANALYTICS_REFRESH_SECONDS', 900))
+ANALYTICS_DASHBOARD_DAYS = int(os.getenv('ANALYTICS_DASHBOARD_DAYS', 30))
+
+# /metrics: with several workers each one writes its values to METRICS_DIR
+# every METRICS_SNAPSHOT_SECONDS and a scrape adds them up (gunicorn.conf.py
+# sets it); unset, /metrics reports the current process only
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_SNAPSHOT_SECONDS = float(os.getenv('METRICS_SNAPSHOT_SECONDS', 5))
+
+# Progress export: users read per cursor batch
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
 
 # Application Settings
 ALLOWED_DOMAINS = os.getenv('ALLOWED_DOMAINS', '@hy.ly').split(',')
+# Comma-separated emails allowed to run admin actions (analytics refresh, progress export); empty means nobody
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
 COURSE_NAME = os.getenv('COURSE_NAME', "Hylees Intro to Multifamily")
+READING_WORDS_PER_MINUTE = int(os.getenv('READING_WORDS_PER_MINUTE', 200))
+
+# Prompt building: default chat model and per-endpoint token budgets for user-supplied text
+DEFAULT_CHAT_MODEL = os.getenv('DEFAULT_CHAT_MODEL', 'gpt-3.5-turbo')
+# tiktoken downloads its BPE files on first use; with this directory populated
+# (run `TIKTOKEN_CACHE_DIR=tiktoken_cache python -c "import tiktoken;
+# tiktoken.get_encoding('cl100k_base')"` once with network access) no download
+# is needed. Without either, token counts fall back to an approximation.
+TIKTOKEN_CACHE_DIR = os.getenv('TIKTOKEN_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tiktoken_cache'))
+PROMPT_TOKEN_BUDGETS = {
+    'classify': int(os.getenv('PROMPT_BUDGET_CLASSIFY', 60)),
+    'quick_actions': int(os.getenv('PROMPT_BUDGET_QUICK_ACTIONS', 300)),
+    'tutor': int(os.getenv('PROMPT_BUDGET_TUTOR', 500)),
+}
+
+# Model routing per AI task: model, request parameters, timeout (seconds) and a
+# faster fallback model used when the task's p95 latency breaches its SLO
+AI_FALLBACK_MODEL = os.getenv('AI_FALLBACK_MODEL', 'gpt-4o-mini')
+AI_ROUTER_COOLDOWN_SECONDS = int(os.getenv('AI_ROUTER_COOLDOWN_SECONDS', 300))
+AI_MODEL_ROUTES = {
+    'classify': {
+        'model': os.getenv('AI_MODEL_CLASSIFY', DEFAULT_CHAT_MODEL),
+        'fallback_model': AI_FALLBACK_MODEL,
+        'params': {'max_tokens': 5, 'temperature': 0},
+        'timeout': 5,
+        'slo_p95_ms': int(os.getenv('AI_SLO_CLASSIFY_MS', 1000)),
+        'hedge': True,
+    },
+    'quick_actions': {
+        'model': os.getenv('AI_MODEL_QUICK_ACTIONS', DEFAULT_CHAT_MODEL),
+        'fallback_model': AI_FALLBACK_MODEL,
+        'params': {'max_tokens': 100, 'temperature': 0.2},
+        'timeout': 10,
+        'slo_p95_ms': int(os.getenv('AI_SLO_QUICK_ACTIONS_MS', 3000)),
+        'hedge': True,
+    },
+    'tutor': {
+        'model': os.getenv('AI_MODEL_TUTOR', DEFAULT_CHAT_MODEL),
+        'fallback_model': AI_FALLBACK_MODEL,
+        'params': {'max_tokens': 120, 'temperature': 0.7, 'top_p': 0.9, 'frequency_penalty': 0.1},
+        'timeout': 20,
+        # For streamed answers this is time to first token
+        'slo_p95_ms': int(os.getenv('AI_SLO_TUTOR_MS', 4000)),
+    },
+    'test': {
+        'model': DEFAULT_CHAT_MODEL,
+        'params': {'max_tokens': 10},
+        'timeout': 10,
+    },
+}
+
+# Hedged requests for short calls: a duplicate is sent once the first passes this percentile
+AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'True').lower() in ('true', '1', 't')
+AI_HEDGE_PERCENTILE = int(os.getenv('AI_HEDGE_PERCENTILE', 90))
+AI_HEDGE_MAX_WORKERS = int(os.getenv('AI_HEDGE_MAX_WORKERS', 16))
+
+# Circuit breaker around OpenAI: open after consecutive failures, probe again after a pause
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', 20))
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 500))
+
+# OpenAI transport; OPENAI_API_BASE points the client at a compatible server
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE')
+OPENAI_POOL_MAXSIZE = int(os.getenv('OPENAI_POOL_MAXSIZE', 20))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 8))
+OPENAI_MAX_QUEUE = int(os.getenv('OPENAI_MAX_QUEUE', 32))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv('OPENAI_QUEUE_TIMEOUT_SECONDS', 5))
+OPENAI_REQUEST_TIMEOUT_SECONDS = float(os.getenv('OPENAI_REQUEST_TIMEOUT_SECONDS', 20))
+OPENAI_RETRY_AFTER_SECONDS = int(os.getenv('OPENAI_RETRY_AFTER_SECONDS', 2))
+OPENAI_MAX_QUEUE_PER_USER = int(os.getenv('OPENAI_MAX_QUEUE_PER_USER', 4))
+
+# Per-user AI budgets: sustained requests per minute, burst size and fair-queue cost
+AI_ENDPOINT_CLASSES = {
+    'classify': {
+        'per_minute': float(os.getenv('AI_QUOTA_CLASSIFY_PER_MINUTE', 60)),
+        'burst': int(os.getenv('AI_QUOTA_CLASSIFY_BURST', 20)),
+        'cost': 1,
+    },
+    'quick_actions': {
+        'per_minute': float(os.getenv('AI_QUOTA_QUICK_ACTIONS_PER_MINUTE', 20)),
+        'burst': int(os.getenv('AI_QUOTA_QUICK_ACTIONS_BURST', 6)),
+        'cost': 2,
+    },
+    'tutor': {
+        'per_minute': float(os.getenv('AI_QUOTA_TUTOR_PER_MINUTE', 12)),
+        'burst': int(os.getenv('AI_QUOTA_TUTOR_BURST', 5)),
+        'cost': 4,
+    },
+}
+
+# Estimated USD price per 1K tokens, for AI cost telemetry
+AI_MODEL_PRICES = {
+    'gpt-3.5-turbo': {'prompt': 0.0005, 'completion': 0.0015},
+    'gpt-4o-mini': {'prompt': 0.00015, 'completion': 0.0006},
+}
+
+# Server-Sent Events streaming
+SSE_COALESCE_MS = int(os.getenv('SSE_COALESCE_MS', 50))
+SSE_COALESCE_MAX_CHARS = int(os.getenv('SSE_COALESCE_MAX_CHARS', 64))
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_RESUME_BUFFER_EVENTS = int(os.getenv('SSE_RESUME_BUFFER_EVENTS', 512))
+SSE_RESUME_TTL_SECONDS = int(os.getenv('SSE_RESUME_TTL_SECONDS', 120))
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 256))
 
 # Validate required configuration
 def validate_config():
@@ -1,57 +1,323 @@
 # db_connection.py
 import os
-import ssl
-from pymongo import MongoClient
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import MongoClient, monitoring
 import config
-from datetime import datetime
+from utils.error_handler import ApiError
+from utils.instrumentation import observe_dependency
 
-def get_mongodb_connection():
-    """Get a MongoDB connection using the best method for the environment"""
-    
-    # Check if we're on Render
+# One MongoClient (and connection pool) per process, created on first use.
+# storage/mongo_repository.py, the services and the diagnostics all share it
+# through get_collection(), so each gunicorn worker opens a single pool to Atlas.
+#
+# Connecting happens on a background thread (start_background_connect) so a
+# slow or degraded Atlas never blocks import or worker boot; requests wait a
+# bounded time for it and /ready reports the state.
+_client = None
+_db = None
+_client_pid = None
+_connection_method = None
+_connection_error = None
+_state = 'idle'  # idle -> connecting -> connected | failed (retried after MONGODB_RETRY_AFTER_SECONDS)
+_connect_started = None
+_failed_at = None
+_connect_ms = None
+_ready = threading.Event()
+_lock = threading.Lock()
+
+
+class DatabaseUnavailableError(ApiError):
+    """Raised when MongoDB is still connecting after the startup wait, or unreachable"""
+    def __init__(self, message="Database is starting up, please retry shortly", retry_after=None):
+        retry_after = retry_after or config.MONGODB_RETRY_AFTER_SECONDS
+        super().__init__(message, 503, headers={'Retry-After': str(retry_after)})
+        self.retry_after = retry_after
+
+
+# Connection methods tried in order on Render, where the default TLS setup
+# has failed in the past; locally only the standard connection is used
+RENDER_CONNECTION_METHODS = [
+    {
+        "name": "Standard SRV with TLS options",
+        "options": {
+            "tls": True,
+            "tlsAllowInvalidCertificates": True,
+            "retryWrites": True,
+        },
+    },
+    {
+        "name": "Direct connection without SRV",
+        "options": {
+            "tls": True,
+            "tlsAllowInvalidCertificates": True,
+            "retryWrites": True,
+        },
+        "uri_modifier": lambda uri: uri.replace("mongodb+srv://", "mongodb://"),
+    },
+    {
+        "name": "TLS with certificate checks disabled",
+        "options": {
+            "tls": True,
+            "tlsInsecure": True,
+            "retryWrites": False,
+        },
+    },
+]
+
+STANDARD_CONNECTION_METHODS = [
+    {"name": "Standard connection", "options": {}},
+]
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Records every MongoDB command in dependency_duration_seconds, per collection and command"""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection, from started until succeeded/failed
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        operation = f"{collection}.{event.command_name}" if collection else event.command_name
+        observe_dependency('mongodb', operation, event.duration_micros / 1e6, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, 'ok')
+
+    def failed(self, event):
+        self._finish(event, 'error')
+
+command_timer = CommandTimer()
+
+
+def _pool_options():
+    """Pool sizing and timeouts applied to every connection method"""
+    return {
+        "maxPoolSize": config.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": config.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": config.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": config.MONGODB_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    }
+
+
+def connection_methods():
+    """Connection methods to try for the current environment"""
     is_render = os.environ.get('RENDER', 'false').lower() == 'true'
-    
-    if is_render:
-        print("Running on Render - using MongoDB connection method for Render")
-        
-        # For Render, we need to modify the URI and use special connection options
-        mongo_uri = config.MONGODB_URI
-        
-        # Convert URI format if using SRV format
-        if mongo_uri.startswith('mongodb+srv://'):
-            # Extract username, password, host and database
-            srv_parts = mongo_uri.split('@')
-            credentials = srv_parts[0].replace('mongodb+srv://', '')
-            host_and_options = srv_parts[1]
-            
-            # Split host and options if present
-            if '?' in host_and_options:
-                host_part, options_part = host_and_options.split('?', 1)
-                options = f"?{options_part}"
-            else:
-                host_part = host_and_options
-                options = ""
-            
-            # Convert to standard format with specific servers
-            # This is a workaround for Render's SSL/TLS issues
-            mongo_uri = f"mongodb://{credentials}@{host_part.replace('.mongodb.net', '-shard-00-00.mongodb.net:27017,')}{host_part.replace('.mongodb.net', '-shard-00-01.mongodb.net:27017,')}{host_part.replace('.mongodb.net', '-shard-00-02.mongodb.net:27017')}/admin?ssl=true&replicaSet=atlas-lv2bm9-shard-0&authSource=admin&retryWrites=true"
-        
-        # Create client with special options for Render
-        client = MongoClient(
-            mongo_uri,
-            ssl=True,
-            ssl_cert_reqs=ssl.CERT_NONE,  # This is key for Render
-            connectTimeoutMS=30000,
-            socketTimeoutMS=30000,
-            serverSelectionTimeoutMS=30000
-        )
-    else:
-        print("Local environment - using standard MongoDB connection")
-        client = MongoClient(config.MONGODB_URI)
-    
-    # Test the connection
-    client.admin.command('ping')
-    print("MongoDB connection successful!")
-    
-    # Return the database
-    return client[config.MONGODB_DB_NAME]
+    return RENDER_CONNECTION_METHODS if is_render else STANDARD_CONNECTION_METHODS
+
+
+def _try_method(method):
+    """Connect with one method and ping; returns the client or raises"""
+    uri = config.MONGODB_URI
+    if "uri_modifier" in method:
+        uri = method["uri_modifier"](uri)
+    client = None
+    try:
+        print(f"Trying MongoDB connection method: {method['name']}")
+        client = MongoClient(uri, event_listeners=[command_timer], **_pool_options(), **method["options"])
+        client.admin.command('ping')
+        return client
+    except Exception as e:
+        print(f"Connection method failed: {method['name']} - {e}")
+        if client is not None:
+            client.close()
+        raise
+
+
+def _close_result(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def _connect():
+    """Probe every connection method in parallel; the first to answer a ping wins"""
+    if not config.MONGODB_URI:
+        raise RuntimeError("MONGODB_URI is not set")
+
+    methods = connection_methods()
+    pool = ThreadPoolExecutor(max_workers=len(methods), thread_name_prefix='mongo-probe')
+    futures = {pool.submit(_try_method, method): method for method in methods}
+    last_error = None
+    try:
+        for future in as_completed(futures):
+            try:
+                client = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            name = futures[future]['name']
+            print(f"MongoDB connection successful with method: {name}")
+            # Slower methods that also succeed are closed as they finish
+            for other in futures:
+                if other is not future:
+                    other.add_done_callback(_close_result)
+            return client, name
+    finally:
+        pool.shutdown(wait=False)
+    raise last_error
+
+
+def _ensure_indexes(db):
+    import db_indexes
+    try:
+        db_indexes.ensure_indexes(db)
+    except Exception as e:
+        # Missing indexes slow queries down but must not take the app offline
+        print(f"Index setup failed: {e}")
+
+
+def _background_connect(pid):
+    global _client, _db, _connection_method, _connection_error, _state, _connect_ms, _failed_at
+    try:
+        client, method = _connect()
+        db, state, error = client[config.MONGODB_DB_NAME], 'connected', None
+        if config.MONGODB_ENSURE_INDEXES:
+            _ensure_indexes(db)
+    except Exception as e:
+        # No silent fallback: requests get a 503 until a retry succeeds. Use
+        # STORAGE_BACKEND=sqlite to run without MongoDB.
+        print(f"MongoDB connection error: {e}")
+        client, method, db, state, error = None, None, None, 'failed', str(e)
+
+    with _lock:
+        if _client_pid != pid:
+            # Reset while we were connecting; this result is stale
+            if client is not None:
+                client.close()
+            return
+        _client, _db, _connection_method, _connection_error = client, db, method, error
+        _connect_ms = round((time.monotonic() - _connect_started) * 1000, 1)
+        _state = state
+        _failed_at = time.monotonic() if state == 'failed' else None
+        _ready.set()
+    print(f"MongoDB connection {state} after {_connect_ms}ms")
+
+
+def start_background_connect():
+    """Begin connecting on a background thread if this process hasn't yet,
+    or if the last attempt failed more than MONGODB_RETRY_AFTER_SECONDS ago"""
+    global _client_pid, _state, _connect_started
+    pid = os.getpid()
+    with _lock:
+        if _client_pid == pid and _state != 'idle':
+            if _state != 'failed' or time.monotonic() - _failed_at < config.MONGODB_RETRY_AFTER_SECONDS:
+                return
+        _client_pid = pid
+        _state = 'connecting'
+        _connect_started = time.monotonic()
+        _ready.clear()
+    threading.Thread(target=_background_connect, args=(pid,), name="mongo-connect", daemon=True).start()
+
+
+def wait_until_ready(timeout=None):
+    """Block until the connection attempt finishes; returns True if it did"""
+    start_background_connect()
+    return _ready.wait(timeout)
+
+
+def get_db():
+    """Return this process's database handle, connecting on first use.
+
+    Waits up to MONGODB_STARTUP_WAIT_SECONDS for the background connection and
+    raises DatabaseUnavailableError after that, or when MongoDB is unreachable.
+    """
+    db = _db
+    if db is not None and _client_pid == os.getpid():
+        return db
+    if not wait_until_ready(config.MONGODB_STARTUP_WAIT_SECONDS):
+        raise DatabaseUnavailableError()
+    if _db is None:
+        raise DatabaseUnavailableError(f"Database is unavailable: {_connection_error}")
+    return _db
+
+
+def get_client():
+    """Shared MongoClient for this process (raises DatabaseUnavailableError like get_db)"""
+    get_db()
+    return _client
+
+
+def reset_client(close=False):
+    """Forget the current client so the next call reconnects.
+
+    Called in forked workers (without closing, the sockets belong to the
+    parent) and by tests or admin tooling that need a fresh connection.
+    """
+    global _client, _db, _client_pid, _connection_method, _connection_error, _state, _failed_at, _ready, _lock
+    if _client_pid != os.getpid():
+        # Forked child: the parent's lock and event may be in any state
+        _lock = threading.Lock()
+        _ready = threading.Event()
+    with _lock:
+        if close and _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _db = None
+        _client_pid = None
+        _connection_method = None
+        _connection_error = None
+        _state = 'idle'
+        _failed_at = None
+        _ready.clear()
+
+
+def is_ready():
+    """True once this process is connected"""
+    return _client_pid == os.getpid() and _state == 'connected'
+
+
+def status():
+    """Connection state for health, readiness and diagnostic endpoints (never blocks)"""
+    current = _client_pid == os.getpid()
+    return {
+        "state": _state if current else 'idle',
+        "ready": is_ready(),
+        "connected": current and _client is not None,
+        "method": _connection_method if current else None,
+        "error": _connection_error if current else None,
+        "connect_ms": _connect_ms if current else None,
+        "pid": os.getpid(),
+        "max_pool_size": config.MONGODB_MAX_POOL_SIZE,
+    }
+
+
+class CollectionProxy:
+    """Collection handle that resolves against the shared client on each use.
+
+    Safe to create at import time: nothing connects until the first query, and
+    a reconnect after fork is picked up automatically.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+    def __repr__(self):
+        return f"CollectionProxy({self.name!r})"
+
+
+def get_collection(name):
+    """Shared, lazily connected handle for a collection"""
+    return CollectionProxy(name)
+
+
+def get_mongodb_connection():
+    """Get the shared database handle (kept for older callers)"""
+    return get_db()
+
+
+# Forked children (gunicorn workers) must build their own client
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_client)
@@ -0,0 +1,136 @@
+# db_indexes.py
+"""Declared MongoDB indexes, created idempotently at startup.
+
+Run directly to create and verify them against the configured database,
+optionally backfilling derived fields such as users.name_lower:
+
+    python db_indexes.py [--backfill]
+"""
+import json
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# collection -> index models; names are explicit so verification is stable
+INDEXES = {
+    'users': [
+        # Login looks users up by email
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        # Older users may not have a google_id
+        IndexModel([('google_id', ASCENDING)], name='google_id_unique', unique=True,
+                   partialFilterExpression={'google_id': {'$type': 'string'}}),
+        # Recently active users
+        IndexModel([('last_activity', DESCENDING)], name='last_activity'),
+        # Admin search by name prefix (see BACKFILLS)
+        IndexModel([('name_lower', ASCENDING)], name='name_lower'),
+    ],
+    'progress': [
+        # One document per user and chapter; also serves "all of a user's progress"
+        IndexModel([('user_id', ASCENDING), ('chapter_id', ASCENDING)], name='user_chapter_unique', unique=True),
+        # Covered lookup of a user's completed chapter titles
+        IndexModel([('user_id', ASCENDING), ('completed', ASCENDING), ('chapter_id', ASCENDING)],
+                   name='user_completed'),
+        # Per-chapter completion counts across users
+        IndexModel([('chapter_id', ASCENDING), ('completed', ASCENDING)], name='chapter_completed'),
+        # Daily active learners rollup
+        IndexModel([('last_updated', DESCENDING)], name='last_updated'),
+    ],
+    'dwell_buckets': [
+        # Bucket appends look up the open bucket for a user, chapter and hour
+        IndexModel([('user_id', ASCENDING), ('chapter_id', ASCENDING), ('hour', DESCENDING)],
+                   name='user_chapter_hour'),
+        # Section heatmap over a time window
+        IndexModel([('hour', DESCENDING)], name='hour'),
+    ],
+    'chat_transcripts': [
+        # Open bucket for appends and newest-first restore
+        IndexModel([('user_id', ASCENDING), ('chapter_id', ASCENDING), ('_id', DESCENDING)],
+                   name='user_chapter_latest'),
+    ],
+    'cache_entries': [
+        # Shared content cache (cache/mongo_cache.py); expired entries and leases are removed
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+    'analytics_rollups': [
+        IndexModel([('kind', ASCENDING), ('day', ASCENDING)], name='kind_day'),
+    ],
+}
+
+
+# Derived fields that indexed queries rely on: collection -> (filter, pipeline update)
+BACKFILLS = {
+    'users': [
+        ({'name_lower': {'$exists': False}, 'name': {'$type': 'string'}},
+         [{'$set': {'name_lower': {'$toLower': '$name'}}}]),
+    ],
+}
+
+def _expected_options(model):
+    document = dict(model.document)
+    document.pop('name')
+    document.pop('key')
+    return document
+
+
+def verify_indexes(db):
+    """Compare declared indexes with the database; returns a list of problems"""
+    problems = []
+    for collection_name, models in INDEXES.items():
+        existing = db[collection_name].index_information()
+        for model in models:
+            name = model.document['name']
+            info = existing.get(name)
+            if info is None:
+                problems.append(f"{collection_name}.{name}: missing")
+                continue
+            if list(info['key']) != list(model.document['key'].items()):
+                problems.append(f"{collection_name}.{name}: keys {info['key']} differ from declaration")
+            for option, value in _expected_options(model).items():
+                if info.get(option) != value:
+                    problems.append(f"{collection_name}.{name}: {option}={info.get(option)!r}, expected {value!r}")
+    return problems
+
+
+def ensure_indexes(db):
+    """Create any missing declared indexes and report drift; safe to run on every start"""
+    for collection_name, models in INDEXES.items():
+        try:
+            db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            # Usually an index with the same name but different options, or
+            # duplicate values blocking a unique index; never drop automatically
+            print(f"Index creation failed for {collection_name}: {e}")
+
+    problems = verify_indexes(db)
+    for problem in problems:
+        print(f"Index check: {problem}")
+    if not problems:
+        print("MongoDB indexes verified")
+    return problems
+
+
+def run_backfills(db):
+    """Populate derived fields on documents written before they existed"""
+    updated = {}
+    for collection_name, backfills in BACKFILLS.items():
+        for query, pipeline in backfills:
+            result = db[collection_name].update_many(query, pipeline)
+            updated[collection_name] = updated.get(collection_name, 0) + result.modified_count
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+    import db_connection
+
+    parser = argparse.ArgumentParser(description="Create and verify the declared MongoDB indexes")
+    parser.add_argument('--backfill', action='store_true', help="also populate derived indexed fields")
+    args = parser.parse_args()
+
+    try:
+        db = db_connection.get_db()
+    except db_connection.DatabaseUnavailableError as e:
+        raise SystemExit(f"MongoDB is not reachable: {e}")
+    report = {"problems": ensure_indexes(db)}
+    if args.backfill:
+        report["backfilled"] = run_backfills(db)
+    print(json.dumps(report, indent=2))
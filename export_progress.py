@@ -0,0 +1,42 @@
+# export_progress.py
+"""Export learner progress as NDJSON or CSV, one row per (user, chapter).
+
+Rows are streamed from a batched cursor, so memory stays flat. Pass --since
+to export only users active after a date (incremental exports).
+
+    python export_progress.py --format csv --out progress.csv
+    python export_progress.py --since 2024-05-01 > progress.ndjson
+"""
+import argparse
+import sys
+
+import config
+import db_connection
+from services import user_service
+from utils import export
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream learner progress as NDJSON or CSV")
+    parser.add_argument('--format', choices=sorted(export.FORMATS), default='ndjson')
+    parser.add_argument('--since', help="only users active since this ISO date or datetime")
+    parser.add_argument('--out', help="write to this file instead of stdout")
+    parser.add_argument('--batch-size', type=int, default=config.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        since = export.parse_since(args.since)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    rows = user_service.iter_progress_export(since, args.batch_size)
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    try:
+        for chunk in export.render(rows, args.format, user_service.EXPORT_FIELDS):
+            out.write(chunk)
+    except db_connection.DatabaseUnavailableError as e:
+        raise SystemExit(f"MongoDB is not reachable: {e}")
+    finally:
+        if args.out:
+            out.close()
+    if args.out:
+        print(f"Export written to {args.out}", file=sys.stderr)
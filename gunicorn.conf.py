@@ -0,0 +1,80 @@
+# gunicorn.conf.py
+"""Production gunicorn settings (gunicorn -c gunicorn.conf.py app:app).
+
+The app is preloaded in the master so the course map and tokenizers are
+loaded once and shared copy-on-write by every worker. Anything that holds
+sockets or threads (MongoDB, the OpenAI and Notion sessions, the flushers
+and the analytics scheduler) starts in each worker after the fork instead.
+Every setting can be overridden from the environment.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Read by config.py when the app is preloaded below
+os.environ.setdefault('DEFER_BACKGROUND_START', 'true')
+# Workers share their metrics through this directory (see utils/metrics.py)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"course-metrics-{os.getenv('PORT', '5000')}"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Workers for CPU, threads to overlap the Notion/OpenAI/MongoDB waits
+workers = int(os.getenv('WEB_CONCURRENCY',
+                        min(multiprocessing.cpu_count() * 2 + 1, int(os.getenv('GUNICORN_MAX_WORKERS', 8)))))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+# /ai/ask-stream keeps a request open for the whole answer
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """Drop metrics left over from a previous run"""
+    from utils import metrics
+    metrics.clear_snapshots()
+
+
+def when_ready(server):
+    """Warm shared read-only content in the master, before the first fork"""
+    import app
+    from utils import metrics
+    app.warm_shared_content()
+    # Workers start from zero; the master's warm-up calls are reported from its own file
+    metrics.write_snapshot()
+
+
+def post_fork(server, worker):
+    """Give each worker its own connections and background threads"""
+    import app
+    import db_connection
+    from services import notion_service, openai_transport
+    db_connection.reset_client()
+    openai_transport.reset_session()
+    notion_service.reset_client()
+    app.start_background_services()
+    server.log.info(f"Worker {worker.pid} initialized")
+
+
+def worker_exit(server, worker):
+    """Write queued progress and transcripts before the worker goes away"""
+    from services import chat_service, user_service
+    from utils import metrics
+    user_service.flush_progress()
+    chat_service.flush_transcripts()
+    metrics.write_snapshot()
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's counts in the host totals"""
+    from utils import metrics
+    metrics.mark_process_dead(worker.pid)
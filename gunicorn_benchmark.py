@@ -0,0 +1,152 @@
+# gunicorn_benchmark.py
+"""Compare plain gunicorn with gunicorn.conf.py: memory per worker and first-request latency.
+
+Each mode starts a real gunicorn master with the same number of workers,
+waits for /health, times the first request to --path (cold course map and
+tokenizer in the default mode, preloaded in the tuned one) and a few warm
+ones, then reads every worker's PSS/RSS from /proc. PSS splits shared
+copy-on-write pages between the processes sharing them, so it shows what
+preloading saves. Linux only.
+
+    python gunicorn_benchmark.py --workers 4
+    python gunicorn_benchmark.py --workers 2 --path /course/content --cookie "session=..." --out gunicorn.json
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from startup_benchmark import percentile
+
+MODES = {
+    # What the Procfile used to run
+    'default': [],
+    'tuned': ['-c', 'gunicorn.conf.py'],
+}
+
+
+def get(url, timeout, cookie=None):
+    """Status code and elapsed milliseconds for one GET"""
+    request = urllib.request.Request(url, headers={'Cookie': cookie} if cookie else {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - started) * 1000
+
+
+def wait_for_health(base, deadline):
+    while time.time() < deadline:
+        try:
+            if get(base + '/health', 2)[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_kb(pid):
+    """PSS and RSS in kB from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Pss', 'Rss'):
+                values[key.lower() + '_kb'] = int(rest.split()[0])
+    return values
+
+
+def run_mode(mode, args):
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(args.workers))
+    command = [sys.executable, '-m', 'gunicorn', *MODES[mode],
+               '--workers', str(args.workers), '--bind', f'127.0.0.1:{args.port}', 'app:app']
+    base = f'http://127.0.0.1:{args.port}'
+
+    launched = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=root, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        if not wait_for_health(base, time.time() + args.start_timeout):
+            raise RuntimeError(f"{mode}: gunicorn did not become healthy")
+        healthy_ms = (time.perf_counter() - launched) * 1000
+        # Let post_fork/background start-up settle before measuring
+        time.sleep(args.settle)
+
+        first_status, first_ms = get(base + args.path, args.request_timeout, args.cookie)
+        warm = [get(base + args.path, args.request_timeout, args.cookie)[1] for _ in range(args.requests)]
+
+        workers = [dict(memory_kb(pid), pid=pid) for pid in worker_pids(proc.pid)]
+        master = memory_kb(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            _, stderr = proc.communicate(timeout=args.start_timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            _, stderr = proc.communicate()
+    if proc.returncode not in (0, -signal.SIGTERM):
+        print(f"{mode}: gunicorn exited with {proc.returncode}:\n{stderr[-2000:]}")
+
+    return {
+        "mode": mode,
+        "healthy_ms": round(healthy_ms, 1),
+        "first_status": first_status,
+        "first_request_ms": round(first_ms, 1),
+        "warm_p50_ms": percentile(warm, 50),
+        "master_pss_kb": master.get('pss_kb'),
+        "worker_pss_kb_avg": round(sum(w['pss_kb'] for w in workers) / len(workers)) if workers else None,
+        "worker_rss_kb_avg": round(sum(w['rss_kb'] for w in workers) / len(workers)) if workers else None,
+        "total_pss_kb": master.get('pss_kb', 0) + sum(w['pss_kb'] for w in workers),
+        "workers": workers,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn memory and first-request latency")
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['default', 'tuned'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', default='/health', help="path for the timed requests")
+    parser.add_argument('--cookie', help="Cookie header for authenticated paths such as /course/content")
+    parser.add_argument('--requests', type=int, default=20, help="warm requests after the first")
+    parser.add_argument('--settle', type=float, default=2, help="seconds to wait after /health")
+    parser.add_argument('--start-timeout', type=float, default=60)
+    parser.add_argument('--request-timeout', type=float, default=60)
+    parser.add_argument('--out', help="write the JSON report here")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(mode, args)
+        results.append(result)
+        print(f"{mode}: first request {result['first_request_ms']:.0f}ms ({result['first_status']}), "
+              f"warm p50 {result['warm_p50_ms']}ms, "
+              f"worker PSS {result['worker_pss_kb_avg']} kB (RSS {result['worker_rss_kb_avg']} kB), "
+              f"total PSS {result['total_pss_kb']} kB")
+
+    report = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "path": args.path,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
@@ -0,0 +1,102 @@
+# migrate_progress.py
+"""Move embedded progress out of user documents into the progress collection.
+
+Copies users.course_progress and users.completed_chapters into one progress
+document per (user_id, chapter_id), then unsets the embedded fields. Safe to
+re-run: positions and dates are merged with $max, so newer progress written
+since the deploy is never overwritten.
+
+    python migrate_progress.py --dry-run
+    python migrate_progress.py --batch-size 200
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import db_connection
+import db_indexes
+from services.user_service import flatten_legacy_progress
+
+LEGACY_QUERY = {'$or': [{'course_progress': {'$exists': True}}, {'completed_chapters': {'$exists': True}}]}
+
+
+def progress_operations(user):
+    """Progress upserts for one user's embedded progress"""
+    operations = []
+    for chapter_title, value in flatten_legacy_progress(user.get('course_progress')):
+        update = {'$max': {'section_index': value.get('section_index', 0)},
+                  '$setOnInsert': {'time_spent': 0}}
+        if value.get('last_updated'):
+            update['$max']['last_updated'] = value['last_updated']
+        operations.append(UpdateOne({'user_id': user['_id'], 'chapter_id': chapter_title}, update, upsert=True))
+    for chapter_title in user.get('completed_chapters', []):
+        operations.append(UpdateOne(
+            {'user_id': user['_id'], 'chapter_id': chapter_title},
+            {'$set': {'completed': True}, '$setOnInsert': {'time_spent': 0}},
+            upsert=True))
+    return operations
+
+
+def migrate_batch(db, users, dry_run, keep_embedded):
+    operations, owners, user_ids = [], [], []
+    for user in users:
+        user_operations = progress_operations(user)
+        operations.extend(user_operations)
+        owners.extend([user['_id']] * len(user_operations))
+        user_ids.append(user['_id'])
+    if dry_run:
+        return len(operations), 0
+
+    failed_users = set()
+    if operations:
+        try:
+            db.progress.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed_users.add(owners[error['index']])
+                print(f"Progress write failed: {error.get('errmsg')}")
+
+    # Only drop the embedded copy once every chapter of that user is in place
+    migrated = [user_id for user_id in user_ids if user_id not in failed_users]
+    if migrated and not keep_embedded:
+        db.users.update_many({'_id': {'$in': migrated}},
+                             {'$unset': {'course_progress': '', 'completed_chapters': ''}})
+    return len(operations), len(failed_users)
+
+
+def run(batch_size=200, dry_run=False, keep_embedded=False):
+    try:
+        db = db_connection.get_db()
+    except db_connection.DatabaseUnavailableError as e:
+        raise SystemExit(f"MongoDB is not reachable: {e}")
+    # The unique (user_id, chapter_id) index makes the upserts safe to repeat
+    db_indexes.ensure_indexes(db)
+
+    totals = {"users": 0, "progress_documents": 0, "failed_users": 0, "dry_run": dry_run}
+    cursor = db.users.find(LEGACY_QUERY, {'course_progress': 1, 'completed_chapters': 1}, batch_size=batch_size)
+    batch = []
+    for user in cursor:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            written, failed = migrate_batch(db, batch, dry_run, keep_embedded)
+            totals["users"] += len(batch)
+            totals["progress_documents"] += written
+            totals["failed_users"] += failed
+            print(f"Migrated {totals['users']} users so far")
+            batch = []
+    if batch:
+        written, failed = migrate_batch(db, batch, dry_run, keep_embedded)
+        totals["users"] += len(batch)
+        totals["progress_documents"] += written
+        totals["failed_users"] += failed
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded user progress into the progress collection")
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--dry-run', action='store_true', help="count what would be written")
+    parser.add_argument('--keep-embedded', action='store_true', help="copy without unsetting the old fields")
+    args = parser.parse_args()
+    print(json.dumps(run(args.batch_size, args.dry_run, args.keep_embedded), indent=2))
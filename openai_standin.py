@@ -0,0 +1,257 @@
+# openai_standin.py
+"""Local stand-in for the OpenAI chat completions API, for offline and load testing.
+
+Run it and point the app at it:
+
+    python openai_standin.py --port 8089 --ttft-ms 300 --inter-token-ms 25
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 OPENAI_API_KEY=test python app.py
+
+Responses are deterministic for a given prompt: the classifier, quick-action
+and tutor prompts built by services/prompt_builder.py each get a canned reply
+derived from the request text.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import prompt_builder
+
+CONTINUE_WORDS = ('next', 'continue', 'move on', 'yes', 'ok', 'got it', 'sure', 'go on')
+
+
+class StandinSettings:
+    """Latency, error and response settings shared by all request handlers"""
+
+    def __init__(self, ttft_ms=200, inter_token_ms=20, error_rate=0.0, error_status=503,
+                 seed=0, responses=None):
+        self.ttft_ms = ttft_ms
+        self.inter_token_ms = inter_token_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responses = responses or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def _message_text(messages, role):
+    return "\n".join(m.get('content', '') for m in messages if m.get('role') == role)
+
+
+def _stable_pick(options, key):
+    """Pick an option deterministically from the request text"""
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    return options[digest[0] % len(options)]
+
+
+def canned_reply(messages, responses):
+    """Deterministic reply for a chat request, mimicking each app prompt"""
+    system = _message_text(messages, 'system')
+    user = _message_text(messages, 'user')
+
+    # Recorded or hand-written replies take precedence (keyed by user text sha256)
+    recorded = responses.get(hashlib.sha256(user.encode('utf-8')).hexdigest())
+    if recorded is not None:
+        return recorded
+
+    if system == prompt_builder.INTENT_SYSTEM_PROMPT:
+        said = user.lower()
+        return 'CONTINUE' if any(word in said for word in CONTINUE_WORDS) else 'QUESTION'
+
+    if system == prompt_builder.QUICK_ACTIONS_SYSTEM_PROMPT:
+        terms, seen = [], {'content', 'the'}
+        # Capitalised runs on one line only, so headings don't merge with the next paragraph
+        for term in re.findall(r'\b[A-Z][a-z]+(?:-[a-z]+)?(?:[ ]+[A-Z][a-z]+(?:-[a-z]+)?)*\b', user):
+            term = re.sub(r'^(?:The|A|An) ', '', term)
+            if term.lower() not in seen:
+                seen.add(term.lower())
+                terms.append(term)
+        questions = [f'"What is {term}?"' for term in terms[:3]]
+        questions += ['"What is the main topic?"', '"How does this work?"', '"What are the steps?"']
+        return "\n".join(f"{i}. {q}" for i, q in enumerate(questions[:3], 1))
+
+    if system == prompt_builder.TUTOR_SYSTEM_PROMPT:
+        body, _, question = user.rpartition('Q:')
+        question = question.strip()
+        # Ground in the context only; the trailing question line and headings are not part of it
+        context = body.split('Context:', 1)[-1]
+        context = " ".join(line.strip() for line in context.splitlines() if not line.lstrip().startswith('#'))
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', context) if len(s.split()) > 4]
+        grounding = _stable_pick(sentences, question) if sentences else "This section covers the key ideas."
+        # Two sentences, like the prompt asks for; the grounding keeps its own case (e.g. "NOI")
+        return f"Great question! {grounding}"
+
+    return "Hello! This is the local OpenAI stand-in."
+
+
+def _tokens(text):
+    """Split a reply into token-like pieces, keeping whitespace with each word"""
+    return re.findall(r'\s*\S+', text) or [text]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = StandinSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "gpt-3.5-turbo", "object": "model"},
+                {"id": "gpt-4o-mini", "object": "model"},
+            ]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        settings = self.settings
+        model = request.get('model', 'gpt-3.5-turbo')
+        messages = request.get('messages', [])
+
+        time.sleep(settings.ttft_ms / 1000.0)
+        if settings.should_fail():
+            self._send_json(settings.error_status, {"error": {
+                "message": "Injected failure from the local stand-in",
+                "type": "server_error",
+            }})
+            return
+
+        reply = canned_reply(messages, settings.responses)
+        tokens = _tokens(reply)
+        max_tokens = request.get('max_tokens')
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if request.get('stream'):
+            self._stream(completion_id, created, model, tokens)
+            return
+
+        prompt_tokens = prompt_builder.count_message_tokens(messages, model)
+        time.sleep(settings.inter_token_ms * len(tokens) / 1000.0)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            },
+        })
+
+    def _stream(self, completion_id, created, model, tokens):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant"})
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.settings.inter_token_ms / 1000.0)
+                chunk({"content": token})
+            chunk({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def run(host='127.0.0.1', port=8089, settings=None):
+    """Start the stand-in server and block serving requests"""
+    StandinHandler.settings = settings or StandinSettings()
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    print(f"OpenAI stand-in listening on http://{host}:{port}/v1 "
+          f"(ttft={StandinHandler.settings.ttft_ms}ms, inter-token={StandinHandler.settings.inter_token_ms}ms, "
+          f"error rate={StandinHandler.settings.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def start_in_background(host='127.0.0.1', port=0, settings=None):
+    """Start the stand-in on a background thread; returns (server, base_url)"""
+    StandinHandler.settings = settings or StandinSettings()
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openai-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completions stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('OPENAI_STANDIN_PORT', 8089)))
+    parser.add_argument('--ttft-ms', type=float, default=200, help="delay before the first token")
+    parser.add_argument('--inter-token-ms', type=float, default=20, help="delay between streamed tokens")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=0, help="seed for error injection")
+    parser.add_argument('--responses', help="JSON file mapping sha256(user text) to a canned reply")
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    run(args.host, args.port, StandinSettings(
+        ttft_ms=args.ttft_ms,
+        inter_token_ms=args.inter_token_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        responses=responses,
+    ))
@@ -8,6 +8,7 @@ def register_blueprints(app: Flask):
     from .ai_routes import ai_bp
     from .admin_routes import admin_bp
     from .static_routes import static_bp
+    from .chat_routes import chat_bp
     
     # Register blueprints
     app.register_blueprint(course_bp)
@@ -15,6 +16,7 @@ def register_blueprints(app: Flask):
     app.register_blueprint(ai_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(static_bp)
+    app.register_blueprint(chat_bp)
     
     # Return the app for chaining
     return app
\ No newline at end of file
@@ -1,83 +1,57 @@
 # routes/admin_routes.py
-from flask import Blueprint, jsonify
-from services import user_service
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from markupsafe import escape
+from urllib.parse import urlencode
+from services import analytics_service, user_service
+from auth import require_auth, require_admin
+from utils import export
+from utils.error_handler import handle_error, ApiError
 from datetime import datetime
+import config
 import json
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-@admin_bp.route('/users')
-def view_users():
-    """Admin route to view all users - REMOVE IN PRODUCTION"""
-    try:
-        # Get all users from MongoDB
-        users = user_service.get_all_users()
-        
-        # Create HTML to display users
-        html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Users Data - Admin View</title>
+ADMIN_PAGE_STYLE = '''
             <style>
-                body {{ font-family: Arial, sans-serif; padding: 20px; background: #f5f5f5; }}
-                .container {{ max-width: 1200px; margin: 0 auto; background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                .user-card {{ background: #f8f9fa; padding: 20px; margin: 15px 0; border-radius: 6px; border-left: 4px solid #26BBED; }}
-                .user-email {{ font-size: 1.2rem; font-weight: bold; color: #26BBED; margin-bottom: 10px; }}
-                .user-details {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 10px; }}
-                .detail-item {{ background: white; padding: 10px; border-radius: 4px; }}
-                .detail-label {{ font-weight: bold; color: #666; font-size: 0.9rem; }}
-                .detail-value {{ color: #333; }}
-                .stats {{ background: #e8f5e8; padding: 15px; border-radius: 6px; margin-bottom: 20px; text-align: center; }}
-                .json-view {{ background: #f8f9fa; padding: 15px; border-radius: 4px; margin-top: 10px; overflow-x: auto; }}
-                .json-toggle {{ background: #6c757d; color: white; border: none; padding: 5px 10px; border-radius: 3px; cursor: pointer; font-size: 0.8rem; }}
-                .nav-links {{ margin-bottom: 20px; }}
-                .nav-links a {{ background: #26BBED; color: white; padding: 8px 16px; text-decoration: none; border-radius: 4px; margin-right: 10px; }}
+                body { font-family: Arial, sans-serif; padding: 20px; background: #f5f5f5; }
+                .container { max-width: 1200px; margin: 0 auto; background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+                .user-card { background: #f8f9fa; padding: 20px; margin: 15px 0; border-radius: 6px; border-left: 4px solid #26BBED; }
+                .user-email { font-size: 1.2rem; font-weight: bold; color: #26BBED; margin-bottom: 10px; }
+                .user-details { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 10px; }
+                .detail-item { background: white; padding: 10px; border-radius: 4px; }
+                .detail-label { font-weight: bold; color: #666; font-size: 0.9rem; }
+                .detail-value { color: #333; }
+                .stats { background: #e8f5e8; padding: 15px; border-radius: 6px; margin-bottom: 20px; text-align: center; }
+                .json-view { background: #f8f9fa; padding: 15px; border-radius: 4px; margin-top: 10px; overflow-x: auto; }
+                .json-toggle { background: #6c757d; color: white; border: none; padding: 5px 10px; border-radius: 3px; cursor: pointer; font-size: 0.8rem; }
+                .nav-links { margin-bottom: 20px; }
+                .nav-links a, .pager a { background: #26BBED; color: white; padding: 8px 16px; text-decoration: none; border-radius: 4px; margin-right: 10px; }
+                .search { margin-bottom: 20px; }
+                .search input { padding: 8px; width: 300px; border: 1px solid #ccc; border-radius: 4px; }
+                .pager { margin-top: 20px; }
             </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="nav-links">
-                    <a href="/">← Back to Course</a>
-                    <a href="/admin/users">Refresh Users</a>
-                </div>
-                
-                <h1>🎓 Course Platform - Users Data</h1>
-                
-                <div class="stats">
-                    <h3>📊 Statistics</h3>
-                    <p><strong>Total Users:</strong> {len(users)}</p>
-                    <p><strong>Database:</strong> course_platform.users</p>
-                    <p><strong>Last Updated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                </div>
-        '''
-        
-        if not users:
-            html += '''
-                <div class="user-card">
-                    <p>No users found in the database yet.</p>
-                    <p>Users will appear here after they log in for the first time.</p>
-                </div>
-            '''
-        else:
-            for i, user in enumerate(users):
-                completed_count = len(user.get('completed_chapters', []))
-                total_time = user.get('total_time_spent', 0)
-                
-                html += f'''
+'''
+
+def _render_user_card(i, user):
+    """HTML for one user row"""
+    completed_count = len(user.get('completed_chapters', []))
+    total_time = user.get('total_time_spent', 0)
+    google_id = user.get('google_id') or 'Not available'
+    return f'''
                 <div class="user-card">
-                    <div class="user-email">👤 {user.get('email', 'No email')}</div>
+                    <div class="user-email">👤 {escape(user.get('email', 'No email'))}</div>
                     
                     <div class="user-details">
                         <div class="detail-item">
                             <div class="detail-label">Name</div>
-                            <div class="detail-value">{user.get('name', 'Not provided')}</div>
+                            <div class="detail-value">{escape(user.get('name') or 'Not provided')}</div>
                         </div>
                         
                         <div class="detail-item">
                             <div class="detail-label">Google ID</div>
-                            <div class="detail-value">{user.get('google_id', 'Not available')[:20]}...</div>
+                            <div class="detail-value">{escape(google_id[:20])}...</div>
                         </div>
                         
                         <div class="detail-item">
@@ -103,12 +77,59 @@ def view_users():
                     
                     <button class="json-toggle" onclick="toggleJson({i})">Show Full Data</button>
                     <div id="json-{i}" class="json-view" style="display: none;">
-                        <pre>{json.dumps(user, indent=2)}</pre>
+                        <pre>{escape(json.dumps(user, indent=2, default=str))}</pre>
                     </div>
                 </div>
                 '''
-        
-        html += '''
+
+def _render_users_page(users, next_cursor, search, limit, total):
+    """Yield the admin page in pieces so the response streams row by row"""
+    yield f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Users Data - Admin View</title>
+            {ADMIN_PAGE_STYLE}
+        </head>
+        <body>
+            <div class="container">
+                <div class="nav-links">
+                    <a href="/">← Back to Course</a>
+                    <a href="/admin/users">Refresh Users</a>
+                </div>
+                
+                <h1>🎓 Course Platform - Users Data</h1>
+                
+                <div class="stats">
+                    <h3>📊 Statistics</h3>
+                    <p><strong>Total Users:</strong> {total}</p>
+                    <p><strong>Database:</strong> course_platform.users</p>
+                    <p><strong>Last Updated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+                </div>
+                
+                <form class="search" method="get" action="/admin/users">
+                    <input type="text" name="q" value="{escape(search)}" placeholder="Email or name starts with...">
+                    <input type="hidden" name="limit" value="{limit}">
+                </form>
+        '''
+
+    if not users:
+        yield '''
+                <div class="user-card">
+                    <p>No users found in the database yet.</p>
+                    <p>Users will appear here after they log in for the first time.</p>
+                </div>
+            '''
+    for i, user in enumerate(users):
+        yield _render_user_card(i, user)
+
+    if next_cursor:
+        params = urlencode({'q': search, 'after': next_cursor, 'limit': limit})
+        yield f'''
+                <div class="pager"><a href="/admin/users?{params}">Next page →</a></div>
+        '''
+
+    yield '''
                 <div style="margin-top: 30px; padding: 20px; background: #fff3cd; border-radius: 6px;">
                     <h4>⚠️ Security Note</h4>
                     <p>This admin route shows sensitive user data. In production:</p>
@@ -136,12 +157,144 @@ def view_users():
         </body>
         </html>
         '''
-        
-        return html
+
+@admin_bp.route('/users')
+def view_users():
+    """Admin route to view users a page at a time - REMOVE IN PRODUCTION"""
+    try:
+        search = request.args.get('q', '').strip()
+        after = request.args.get('after') or None
+        limit = min(max(request.args.get('limit', config.ADMIN_PAGE_SIZE, type=int), 1), config.ADMIN_PAGE_SIZE_MAX)
+
+        # One bounded page with projected fields; memory doesn't grow with the user count
+        users, next_cursor = user_service.list_users(search, after, limit)
+        total = user_service.count_users()
+
+        return Response(stream_with_context(_render_users_page(users, next_cursor, search, limit, total)),
+                        mimetype='text/html')
         
     except Exception as e:
         return f'''
         <h1>Error loading users</h1>
-        <p>Error: {str(e)}</p>
+        <p>Error: {escape(str(e))}</p>
         <p><a href="/">Return to Course</a></p>
-        '''
\ No newline at end of file
+        '''
+
+def _render_analytics(dashboard):
+    """Small HTML dashboard over the precomputed rollups"""
+    funnel_rows = ''.join(
+        f"<tr><td>{escape(row['chapter_id'])}</td><td>{row['started']}</td><td>{row['completed']}</td>"
+        f"<td>{row['completion_rate'] * 100:.0f}%</td><td>{row.get('median_time_spent', 0)}</td></tr>"
+        for row in dashboard['chapter_funnel'])
+    drop_off_rows = ''.join(
+        f"<tr><td>{escape(row['chapter_id'])}</td><td>{row['section_index']}</td>"
+        f"<td>{row['learners']} of {row['unfinished']}</td></tr>"
+        for row in dashboard['drop_off'])
+    slowest = max((row['avg_seconds'] for row in dashboard['section_heatmap']), default=0) or 1
+    heatmap_rows = ''.join(
+        f"<tr><td>{escape(row['chapter_id'])}</td><td>{row['section_index']}</td><td>{row['views']}</td>"
+        f"<td>{row['learners']}</td>"
+        f"<td style=\"background: rgba(231, 76, 60, {row['avg_seconds'] / slowest:.2f})\">{row['avg_seconds']}s</td>"
+        f"<td>{row['skip_rate'] * 100:.0f}%</td></tr>"
+        for row in dashboard['section_heatmap'])
+    daily_rows = ''.join(
+        f"<tr><td>{row['day']}</td><td>{row['learners']}</td></tr>" for row in dashboard['daily_active'])
+    return f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Course Analytics - Admin View</title>
+            {ADMIN_PAGE_STYLE}
+            <style>
+                table {{ width: 100%; border-collapse: collapse; margin-bottom: 30px; }}
+                th, td {{ text-align: left; padding: 8px; border-bottom: 1px solid #eee; }}
+                th {{ color: #666; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="nav-links">
+                    <a href="/">← Back to Course</a>
+                    <a href="/admin/users">Users</a>
+                    <a href="/admin/analytics?format=json">JSON</a>
+                </div>
+                
+                <h1>📈 Course Analytics</h1>
+                <div class="stats">
+                    <p><strong>Computed At:</strong> {dashboard['computed_at'] or 'Not computed yet'}</p>
+                </div>
+                
+                <h3>Completion Funnel</h3>
+                <table>
+                    <tr><th>Chapter</th><th>Started</th><th>Completed</th><th>Completion</th><th>Median Time Spent</th></tr>
+                    {funnel_rows}
+                </table>
+                
+                <h3>Drop-off Section (unfinished learners)</h3>
+                <table>
+                    <tr><th>Chapter</th><th>Section</th><th>Learners stopped here</th></tr>
+                    {drop_off_rows}
+                </table>
+                
+                <h3>Section Dwell Time</h3>
+                <table>
+                    <tr><th>Chapter</th><th>Section</th><th>Views</th><th>Learners</th><th>Avg Dwell</th><th>Skipped</th></tr>
+                    {heatmap_rows}
+                </table>
+                
+                <h3>Active Learners per Day</h3>
+                <table>
+                    <tr><th>Day</th><th>Learners</th></tr>
+                    {daily_rows}
+                </table>
+            </div>
+        </body>
+        </html>
+        '''
+
+@admin_bp.route('/analytics')
+def view_analytics():
+    """Course analytics from the precomputed rollups - REMOVE IN PRODUCTION"""
+    try:
+        dashboard = analytics_service.get_dashboard(request.args.get('days', type=int))
+        if request.args.get('format') == 'json':
+            return jsonify(dashboard)
+        return _render_analytics(dashboard)
+    except Exception as e:
+        return handle_error(e)
+
+@admin_bp.route('/analytics/refresh', methods=['POST'])
+@require_auth
+@require_admin
+def refresh_analytics():
+    """Recompute the analytics rollups now (full aggregations, so admins only)"""
+    try:
+        return jsonify({"success": True, "refreshed": analytics_service.refresh_rollups()})
+    except Exception as e:
+        return handle_error(e)
+
+@admin_bp.route('/export/progress')
+@require_auth
+@require_admin
+def export_progress():
+    """Stream learner progress as NDJSON (default) or CSV; ?since= limits it to recently active users"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in export.FORMATS:
+            raise ApiError(f"format must be one of {', '.join(export.FORMATS)}", 400)
+        try:
+            since = export.parse_since(request.args.get('since'))
+        except ValueError as e:
+            raise ApiError(str(e), 400)
+
+        rows = user_service.iter_progress_export(since, config.EXPORT_BATCH_SIZE)
+        filename = f"progress-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{fmt}"
+        return Response(
+            stream_with_context(export.render(rows, fmt, user_service.EXPORT_FIELDS)),
+            mimetype=export.FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    except ApiError as e:
+        return handle_error(e, e.status_code)
+    except Exception as e:
+        return handle_error(e)
@@ -1,13 +1,21 @@
 # routes/ai_routes.py
-from flask import Blueprint, jsonify, request, Response
-import json
+from flask import Blueprint, jsonify, request, Response, session
 from auth import require_auth
-from services import ai_service
+from services import ai_service, chat_service, meta_answers, model_router
+from services.ai_quota import check_quota
+from services.circuit_breaker import openai_breaker
+from services.openai_transport import UpstreamBusyError
 from utils.error_handler import handle_error, ApiError
+from utils import sse
+from utils import metrics
 
 # Create blueprint
 ai_bp = Blueprint('ai', __name__, url_prefix='/ai')
 
+def _current_user_id():
+    """User id from the session, used for per-user quotas and fair queuing"""
+    return session.get('user', {}).get('id')
+
 @ai_bp.route('/classify-intent', methods=['POST'])
 @require_auth
 def classify_intent():
@@ -20,8 +28,11 @@ def classify_intent():
         
         if not user_input:
             raise ApiError("User input is required", 400)
+        
+        user_id = _current_user_id()
+        check_quota(user_id, 'classify')
             
-        intent = ai_service.classify_user_intent(user_input, current_section, next_section)
+        intent = ai_service.classify_user_intent(user_input, current_section, next_section, user_id)
         return jsonify({"intent": intent})
         
     except ApiError as e:
@@ -40,8 +51,11 @@ def generate_quick_actions():
         
         if not section_content:
             raise ApiError("Section content is required", 400)
+        
+        user_id = _current_user_id()
+        check_quota(user_id, 'quick_actions')
             
-        actions = ai_service.generate_quick_actions(section_content)
+        actions = ai_service.generate_quick_actions(section_content, user_id)
         return jsonify({"actions": actions})
         
     except ApiError as e:
@@ -64,7 +78,18 @@ def ask_question():
         if not question or not context: 
             raise ApiError("Question and context required.", 400)
 
-        answer = ai_service.ask_question(question, context, current_chapter_title)
+        user_id = _current_user_id()
+        meta_answer = meta_answers.answer_meta_question(question, current_chapter_title, user_id)
+        if meta_answer:
+            chat_service.record_message(user_id, current_chapter_title, 'user', question)
+            chat_service.record_message(user_id, current_chapter_title, 'assistant', meta_answer)
+            return jsonify({"answer": meta_answer})
+
+        check_quota(user_id, 'tutor')
+
+        answer = ai_service.ask_question(question, context, current_chapter_title, user_id)
+        chat_service.record_message(user_id, current_chapter_title, 'user', question)
+        chat_service.record_message(user_id, current_chapter_title, 'assistant', answer)
         return jsonify({"answer": answer})
     except ApiError as e:
         return handle_error(e, e.status_code)
@@ -77,59 +102,101 @@ def ask_question():
 def ask_question_stream():
     """Streaming AI tutoring endpoint for real-time empathetic responses"""
     try:
+        owner = _current_user_id()
+        
+        # A reconnecting client resumes the buffered stream instead of re-asking
+        last_event_id = request.headers.get('Last-Event-ID')
+        if last_event_id:
+            buffer, after_seq = sse.resume_stream(last_event_id, owner)
+            if buffer:
+                print(f"Resuming stream {buffer.stream_id} after event {after_seq}")
+                return _sse_response(sse.iter_events(buffer, after_seq))
+        
         data = request.get_json()
         question = data.get('question')
         context = data.get('context')
         current_chapter_title = data.get('current_chapter_title', '')
         
-        print(f"Streaming endpoint called - Question: {question[:50]}...")
-        
         if not question or not context: 
             raise ApiError("Question and context required.", 400)
 
-        def generate_streaming_response():
-            """Generator function for streaming OpenAI responses"""
-            try:
-                # Get streaming response from AI service
-                response = ai_service.stream_response(question, context, current_chapter_title)
-                
-                print("OpenAI API call successful, starting stream...")
-                
-                # Stream the response
-                for chunk in response:
-                    if 'choices' in chunk and len(chunk['choices']) > 0:
-                        delta = chunk['choices'][0].get('delta', {})
-                        if 'content' in delta:
-                            content = delta['content']
-                            print(f"Received chunk: {content}")
-                            # Send each chunk as Server-Sent Event
-                            yield f"data: {json.dumps({'content': content})}\n\n"
-                
-                print("Streaming complete")
-                # Send completion signal
-                yield "data: [DONE]\n\n"
-                
-            except Exception as e:
-                print(f"Error in streaming: {e}")
-                yield f"data: {json.dumps({'error': 'Sorry, I encountered an issue.'})}\n\n"
-                yield "data: [DONE]\n\n"
-
-        return Response(
-            generate_streaming_response(),
-            mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            }
-        )
+        # Course meta questions are answered instantly from local data
+        meta_answer = meta_answers.answer_meta_question(question, current_chapter_title, owner)
+        if meta_answer:
+            chat_service.record_message(owner, current_chapter_title, 'user', question)
+            chat_service.record_message(owner, current_chapter_title, 'assistant', meta_answer)
+            return _sse_response(sse.iter_events(sse.single_event_stream({'content': meta_answer}, owner)))
+
+        # Resumes and meta answers are free; only LLM questions are charged
+        check_quota(owner, 'tutor')
+
+        print(f"Streaming endpoint called - Question: {question[:50]}...")
+
+        # Open the upstream stream here so a full queue fails fast with a 503
+        setup_error = None
+        try:
+            response = ai_service.stream_response(question, context, current_chapter_title, owner)
+        except UpstreamBusyError:
+            raise
+        except Exception as e:
+            setup_error = e
+
+        chat_service.record_message(owner, current_chapter_title, 'user', question)
+
+        def produce_deltas():
+            """Yield content deltas from the OpenAI stream"""
+            if setup_error:
+                raise setup_error
+            parts = []
+            for chunk in response:
+                if 'choices' in chunk and len(chunk['choices']) > 0:
+                    delta = chunk['choices'][0].get('delta', {})
+                    if 'content' in delta:
+                        parts.append(delta['content'])
+                        yield delta['content']
+            print("Streaming complete")
+            # Only complete answers go into the transcript
+            chat_service.record_message(owner, current_chapter_title, 'assistant', ''.join(parts))
+
+        buffer = sse.start_stream(produce_deltas, owner)
+        return _sse_response(sse.iter_events(buffer))
     except ApiError as e:
         return handle_error(e, e.status_code)
     except Exception as e:
         print(f"Error setting up streaming: {e}")
         return jsonify({"error": "Failed to set up streaming response"}), 500
 
+def _sse_response(events):
+    """Wrap an SSE event iterator in a streaming response"""
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type, Last-Event-ID'
+        }
+    )
+
+@ai_bp.route('/model-stats', methods=['GET'])
+@require_auth
+def get_model_stats():
+    """Per task/model latency percentiles and token usage from the model router"""
+    return jsonify({
+        "models": model_router.model_stats(),
+        "circuit": openai_breaker.snapshot()
+    })
+
+@ai_bp.route('/metrics', methods=['GET'])
+def get_ai_metrics():
+    """Alias of /metrics (same series, same output), kept for existing scrapers.
+
+    Scrape one or the other, never both, or every series is counted twice.
+    """
+    return Response(metrics.exposition(), content_type=metrics.CONTENT_TYPE)
+
 @ai_bp.route('/test', methods=['GET'])
 def test_openai():
     """Test OpenAI connectivity"""
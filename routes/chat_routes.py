@@ -0,0 +1,38 @@
+# routes/chat_routes.py
+from flask import Blueprint, jsonify, request, session
+from auth import require_auth
+from services import chat_service
+from utils.error_handler import handle_error, ApiError
+
+# Create blueprint
+chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
+
+@chat_bp.route('/history', methods=['GET'])
+@require_auth
+def get_history():
+    """One page (bucket) of the user's transcript for a chapter, newest page first.
+
+    Pass the returned `before` cursor to fetch the next older page.
+    """
+    try:
+        user_id = session.get('user', {}).get('id')
+        if not user_id:
+            raise ApiError("User not found", 401)
+
+        try:
+            messages, before = chat_service.get_transcript_page(
+                user_id, request.args.get('chapter', ''), request.args.get('before'))
+        except ValueError as e:
+            raise ApiError(str(e), 400)
+
+        return jsonify({
+            "messages": [
+                {"role": m['role'], "content": m['content'], "at": m['at'].isoformat() + 'Z'}
+                for m in messages
+            ],
+            "before": before
+        })
+    except ApiError as e:
+        return handle_error(e, e.status_code)
+    except Exception as e:
+        return handle_error(e)
@@ -37,8 +37,7 @@ def get_table_of_contents():
         first_chapter_title = all_chapters[0]["title"] if all_chapters else None
         
         # Get table of contents content
-        toc_blocks = notion_service.get_all_blocks_from_id(toc_page_id)
-        content = "\n\n".join(filter(None, [notion_service.convert_block_to_markdown(b) for b in toc_blocks]))
+        content = notion_service.render_page(toc_page_id)
         
         # Preload first chapter content for performance
         first_chapter_content = None
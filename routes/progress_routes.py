@@ -17,7 +17,7 @@ def complete_chapter():
         completed_chapter = data.get('chapter_title')
         
         # Get current user
-        current_user = get_current_user()
+        current_user = get_current_user(user_service.SESSION_FIELDS)
         if not current_user:
             raise ApiError("User not found", 401)
         
@@ -66,7 +66,7 @@ def complete_chapter():
 def get_user_progress():
     """Get current user's progress"""
     try:
-        current_user = get_current_user()
+        current_user = get_current_user(user_service.SESSION_FIELDS)
         if not current_user:
             return jsonify({"error": "User not found"}), 401
         
@@ -75,6 +75,9 @@ def get_user_progress():
             return jsonify({"error": "Could not retrieve user progress"}), 500
         
         return jsonify({"user": progress})
+    except ApiError as e:
+        # DatabaseUnavailableError: 503 with Retry-After, so the client retries instead of logging out
+        return handle_error(e, e.status_code)
     except Exception as e:
         print(f"Error getting user progress: {e}")
         return jsonify({"error": str(e)}), 500
@@ -84,7 +87,7 @@ def get_user_progress():
 def save_progress():
     """Save user's current progress"""
     try:
-        current_user = get_current_user()
+        current_user = get_current_user(user_service.SESSION_FIELDS)
         if not current_user:
             return jsonify({"error": "User not found"}), 401
         
@@ -104,6 +107,59 @@ def save_progress():
             return jsonify({"error": "Failed to update progress"}), 500
         
         return jsonify({"success": True})
+    except ApiError as e:
+        # DatabaseUnavailableError: 503 with Retry-After, so the client retries instead of logging out
+        return handle_error(e, e.status_code)
     except Exception as e:
         print(f"Error saving progress: {e}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+def _parse_progress_events(payload):
+    """Validate a batch of progress events: a list, or {"events": [...]}"""
+    events = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(events, list) or not events:
+        raise ApiError("events must be a non-empty list", 400)
+    if len(events) > config.PROGRESS_BATCH_MAX_EVENTS:
+        raise ApiError(f"At most {config.PROGRESS_BATCH_MAX_EVENTS} events per batch", 400)
+
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict) or not event.get('chapter_title'):
+            raise ApiError("Each event needs a chapter_title", 400)
+        try:
+            section_index = int(event.get('section_index', 0))
+            time_spent = max(0, int(event.get('time_spent', 0)))
+            dwell_index = event.get('dwell_section_index')
+            dwell_index = None if dwell_index is None else max(0, int(dwell_index))
+        except (TypeError, ValueError):
+            raise ApiError("section_index, time_spent and dwell_section_index must be numbers", 400)
+        # The section the time was actually spent on (usually the previous one)
+        dwell_section = None
+        if dwell_index is not None:
+            dwell_section = (event.get('dwell_chapter_title') or event['chapter_title'], dwell_index)
+        parsed.append({
+            'chapter_title': event['chapter_title'],
+            'section_index': max(0, section_index),
+            'time_spent': time_spent,
+            'dwell_section': dwell_section
+        })
+    return parsed
+
+@progress_bp.route('/save-batch', methods=['POST'])
+@require_auth
+def save_progress_batch():
+    """Save several progress events at once (also the navigator.sendBeacon target)"""
+    try:
+        current_user = get_current_user(user_service.SESSION_FIELDS)
+        if not current_user:
+            raise ApiError("User not found", 401)
+
+        # sendBeacon posts without a JSON content type
+        events = _parse_progress_events(request.get_json(force=True, silent=True))
+        accepted = user_service.save_progress_batch(current_user['_id'], events)
+
+        return jsonify({"success": True, "accepted": accepted})
+    except ApiError as e:
+        return handle_error(e, e.status_code)
+    except Exception as e:
+        return handle_error(e)
@@ -0,0 +1,79 @@
+# services/ai_quota.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from utils.error_handler import ApiError
+
+# Buckets kept per process; least recently used users are dropped beyond this
+MAX_TRACKED_BUCKETS = 10000
+
+
+class QuotaExceededError(ApiError):
+    """Raised when a user has used up their budget for an endpoint class"""
+    def __init__(self, endpoint_class, retry_after):
+        retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(
+            "You're sending requests too quickly, please wait a moment",
+            429,
+            details={"endpoint_class": endpoint_class},
+            headers={'Retry-After': str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `burst` capacity refilled at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def take(self, amount=1):
+        """Take tokens; returns 0 on success or the seconds until enough are available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0
+        if self.rate <= 0:
+            return 60
+        return (amount - self.tokens) / self.rate
+
+
+_buckets = OrderedDict()
+_lock = threading.Lock()
+
+
+def check_quota(user_id, endpoint_class):
+    """Charge one request to the user's bucket for endpoint_class or raise QuotaExceededError"""
+    settings = config.AI_ENDPOINT_CLASSES.get(endpoint_class)
+    if not user_id or not settings:
+        return
+
+    key = (user_id, endpoint_class)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(settings['per_minute'], settings['burst'])
+            _buckets[key] = bucket
+            while len(_buckets) > MAX_TRACKED_BUCKETS:
+                _buckets.popitem(last=False)
+        else:
+            _buckets.move_to_end(key)
+        wait = bucket.take()
+
+    if wait:
+        print(f"AI quota exceeded for user {user_id} on {endpoint_class}")
+        raise QuotaExceededError(endpoint_class, wait)
+
+
+def request_cost(endpoint_class):
+    """Fair-queue cost of one upstream call for an endpoint class"""
+    settings = config.AI_ENDPOINT_CLASSES.get(endpoint_class)
+    return settings['cost'] if settings else 1
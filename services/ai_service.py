@@ -1,71 +1,73 @@
 # services/ai_service.py
-import openai
-import config
 import re
-
-def classify_user_intent(user_input, current_section_title, next_section_title):
+import threading
+from collections import OrderedDict
+import config
+from services import ai_telemetry, model_router, prompt_builder
+from services.circuit_breaker import CircuitOpenError
+from services.openai_transport import UpstreamBusyError
+
+# Recent tutoring answers, served when the OpenAI circuit is open
+_answer_cache = OrderedDict()
+_answer_cache_lock = threading.Lock()
+
+def _answer_key(question, current_chapter_title):
+    return (current_chapter_title or '', ' '.join(question.lower().split()))
+
+def remember_answer(question, current_chapter_title, answer):
+    """Keep a successful answer for use while the upstream is unhealthy"""
+    if not answer:
+        return
+    key = _answer_key(question, current_chapter_title)
+    with _answer_cache_lock:
+        _answer_cache[key] = answer
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > config.ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+
+def cached_answer(question, current_chapter_title):
+    """Previously given answer to the same question in the same chapter, if any"""
+    with _answer_cache_lock:
+        return _answer_cache.get(_answer_key(question, current_chapter_title))
+
+def _remember_streamed_answer(stream, question, current_chapter_title):
+    """Pass stream chunks through and cache the full answer once it completes"""
+    parts = []
+    for chunk in stream:
+        if 'choices' in chunk and len(chunk['choices']) > 0:
+            parts.append(chunk['choices'][0].get('delta', {}).get('content', ''))
+        yield chunk
+    remember_answer(question, current_chapter_title, ''.join(parts))
+
+def _fallback_reason(error):
+    return 'circuit_open' if isinstance(error, CircuitOpenError) else 'error'
+
+def classify_user_intent(user_input, current_section_title, next_section_title, user_id=None):
     """Faster intent classification with shorter prompt"""
-    intent_prompt = f"""
-Determine user intent: CONTINUE (wants next section) or QUESTION (has question about current content).
-
-User said: "{user_input}"
-
-CONTINUE examples: next, continue, move on, yes, ok, got it
-QUESTION examples: what, how, explain, clarify, don't understand
-
-Respond: CONTINUE or QUESTION
-"""
+    route = model_router.route('classify')
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": intent_prompt}],
-            max_tokens=5,  # Just need one word
-            temperature=0,  # Deterministic for speed
-        )
+        messages = prompt_builder.build_intent_messages(user_input, route.model)
+        response = model_router.complete(route, messages, user_id=user_id)
         
         result = response.choices[0].message.content.strip().upper()
         return result if result in ['CONTINUE', 'QUESTION'] else 'QUESTION'
+    except UpstreamBusyError:
+        raise
     except Exception as e:
         print(f"Intent classification error: {e}")
+        ai_telemetry.record_call('classify', cache='none', fallback_reason=_fallback_reason(e))
         return 'QUESTION'
 
-def generate_quick_actions(section_content):
+def generate_quick_actions(section_content, user_id=None):
     """Generate specific, content-based quick actions - exactly 3 actions"""
     
-    # Truncate content for faster processing
-    max_content_length = 1200
-    if len(section_content) > max_content_length:
-        section_content = section_content[:max_content_length] + "..."
-    
-    quick_actions_prompt = f"""
-Based on this content, create exactly 3 specific questions about actual terms, numbers, concepts, or facts mentioned.
-
-Content: {section_content}
-
-Requirements:
-- Extract specific terms, numbers, or concepts from the content
-- Format as questions like "What is [specific term]?", "How many [specific number/data]?", "When was [specific event]?"
-- Use ONLY information that actually appears in the content
-- Each question must be different and specific
-- Keep questions under 6 words
-- NO generic questions like "give examples", "elaborate", "define key terms"
-
-Example good questions:
-- "What is Lease-up Phase?"
-- "How many units converted?"
-- "What is Cap Rate?"
-
-Generate exactly 3 specific questions:
-"""
+    # Trimmed to the token budget at a sentence boundary
+    route = model_router.route('quick_actions')
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": quick_actions_prompt}],
-            max_tokens=100,
-            temperature=0.2,  # Low temperature for consistency
-        )
+        messages = prompt_builder.build_quick_actions_messages(section_content, route.model)
+        response = model_router.complete(route, messages, user_id=user_id)
         
         result = response.choices[0].message.content.strip()
         print(f"Raw AI response: {result}")
@@ -130,105 +132,69 @@ Generate exactly 3 specific questions:
         print(f"Final 3 actions: {final_actions}")
         return final_actions
             
+    except UpstreamBusyError:
+        raise
     except Exception as e:
         print(f"Quick actions generation error: {e}")
+        ai_telemetry.record_call('quick_actions', cache='none', fallback_reason=_fallback_reason(e))
         return ["What is the main topic?", "How does this work?", "What are the steps?"]
 
-def ask_question(question, context, current_chapter_title=''):
+def ask_question(question, context, current_chapter_title='', user_id=None):
     """Non-streaming AI tutoring endpoint with empathetic responses"""
     if not question or not context: 
         raise ValueError("Question and context required.")
 
-    # Updated system prompt for better responses
-    system_prompt = (
-        "You are Hylee, a friendly and empathetic multifamily real estate tutor. "
-        "Always be warm, understanding, and helpful. "
-        
-        "Rules: "
-        "1) Answer in 1-2 sentences max using only the provided context. "
-        "2) For chapter completion time questions: Give realistic estimates based on content length (typically 10-15 minutes per chapter). "
-        "3) For off-topic questions, be understanding and try to connect to course content when possible. "
-        "4) Always maintain a warm, encouraging tone. Never sound robotic or dismissive. "
-        "5) Be conversational and show genuine interest in helping them learn. "
-        "6) Don't mention future chapters unless specifically asked about course progression."
-    )
-    
-    # Truncate context if too long to speed up processing
-    max_context_length = 2000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    
-    user_message = f"Current Chapter: {current_chapter_title}\nContext: {context}\n\nQ: {question}"
+    route = model_router.route('tutor')
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=120,
-            temperature=0.7,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            stream=False
-        )
-        return response.choices[0].message.content
+        messages = prompt_builder.build_tutor_messages(question, context, current_chapter_title, route.model)
+        response = model_router.complete(route, messages, user_id=user_id)
+        answer = response.choices[0].message.content
+        remember_answer(question, current_chapter_title, answer)
+        return answer
+    except UpstreamBusyError:
+        raise
+    except CircuitOpenError as e:
+        print(f"ask_question short-circuited: {e}")
+        answer = cached_answer(question, current_chapter_title)
+        ai_telemetry.record_call('tutor', cache='hit' if answer else 'none', fallback_reason='circuit_open')
+        return answer or "I'm sorry, I encountered an issue. Could you try rephrasing?"
     except Exception as e:
         print(f"Error in ask_question: {e}")
+        ai_telemetry.record_call('tutor', cache='none', fallback_reason='error')
         return "I'm sorry, I encountered an issue. Could you try rephrasing?"
 
-def stream_response(question, context, current_chapter_title=''):
+def stream_response(question, context, current_chapter_title='', user_id=None):
     """Streaming AI tutoring endpoint for real-time empathetic responses"""
     if not question or not context: 
         raise ValueError("Question and context required.")
 
-    # Updated system prompt
-    system_prompt = (
-        "You are Hylee, a friendly and empathetic multifamily real estate tutor. "
-        "Always be warm, understanding, and helpful. "
-        
-        "Rules: "
-        "1) Answer in 1-2 sentences max using only the provided context. "
-        "2) For chapter completion time questions: Give realistic estimates based on content length (typically 10-15 minutes per chapter). "
-        "3) For off-topic questions, be understanding and try to connect to course content when possible. "
-        "4) Always maintain a warm, encouraging tone. Never sound robotic or dismissive. "
-        "5) Be conversational and show genuine interest in helping them learn. "
-        "6) Don't mention future chapters unless specifically asked about course progression."
-    )
-    
-    # Truncate context if too long
-    max_context_length = 2000
-    truncated_context = context[:max_context_length] + "..." if len(context) > max_context_length else context
-    
-    user_message = f"Current Chapter: {current_chapter_title}\nContext: {truncated_context}\n\nQ: {question}"
+    route = model_router.route('tutor')
 
-    print("Making OpenAI API call...")
+    print(f"Making OpenAI API call ({route.model})...")
     # Create streaming completion
-    return openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ],
-        max_tokens=120,
-        temperature=0.7,
-        top_p=0.9,
-        frequency_penalty=0.1,
-        stream=True  # Enable streaming
-    )
+    try:
+        messages = prompt_builder.build_tutor_messages(question, context, current_chapter_title, route.model)
+        stream = model_router.complete(route, messages, user_id=user_id, stream=True)
+    except CircuitOpenError:
+        answer = cached_answer(question, current_chapter_title)
+        ai_telemetry.record_call('tutor', cache='hit' if answer else 'none', fallback_reason='circuit_open')
+        if not answer:
+            raise
+        print("OpenAI circuit open - serving cached answer")
+        return [{'choices': [{'delta': {'content': answer}}]}]
+    return _remember_streamed_answer(stream, question, current_chapter_title)
 
 def test_connection():
     """Test OpenAI connectivity"""
     try:
         # Simple test query
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        response = model_router.complete(
+            model_router.route('test'),
+            [
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": "Say hello!"}
-            ],
-            max_tokens=10
+            ]
         )
         return True, response.choices[0].message.content
     except Exception as e:
@@ -0,0 +1,65 @@
+# services/ai_telemetry.py
+import json
+
+import config
+from utils.error_handler import logger
+from utils.metrics import registry
+
+# Token-count buckets for prompt/completion size histograms
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+ai_calls = registry.counter(
+    'ai_calls_total', 'AI calls by endpoint, model, cache result and fallback reason',
+    ('endpoint', 'model', 'cache', 'fallback_reason'))
+ai_tokens = registry.counter(
+    'ai_tokens_total', 'Tokens used by AI calls', ('endpoint', 'model', 'kind'))
+ai_cost = registry.counter(
+    'ai_cost_usd_total', 'Estimated OpenAI spend in USD', ('endpoint', 'model'))
+ai_ttft = registry.histogram(
+    'ai_time_to_first_token_seconds', 'Time to first streamed token', ('endpoint', 'model'))
+ai_duration = registry.histogram(
+    'ai_call_duration_seconds', 'Total AI call duration', ('endpoint', 'model'))
+ai_prompt_size = registry.histogram(
+    'ai_prompt_tokens', 'Prompt tokens per AI call', ('endpoint', 'model'), buckets=TOKEN_BUCKETS)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of a call from config.AI_MODEL_PRICES (per 1K tokens)"""
+    prices = config.AI_MODEL_PRICES.get(model)
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices['prompt'] + completion_tokens * prices['completion']) / 1000.0
+
+
+def record_call(endpoint, model=None, prompt_tokens=0, completion_tokens=0, ttft_ms=None,
+                duration_ms=None, cache='miss', fallback_reason=None):
+    """Record one AI call: upstream calls, cache hits and local fallbacks alike"""
+    model = model or 'none'
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+
+    ai_calls.inc(endpoint=endpoint, model=model, cache=cache, fallback_reason=fallback_reason or 'none')
+    if prompt_tokens or completion_tokens:
+        ai_tokens.inc(prompt_tokens, endpoint=endpoint, model=model, kind='prompt')
+        ai_tokens.inc(completion_tokens, endpoint=endpoint, model=model, kind='completion')
+        ai_prompt_size.observe(prompt_tokens, endpoint=endpoint, model=model)
+    if cost:
+        ai_cost.inc(cost, endpoint=endpoint, model=model)
+    if ttft_ms is not None:
+        ai_ttft.observe(ttft_ms / 1000.0, endpoint=endpoint, model=model)
+    if duration_ms is not None:
+        ai_duration.observe(duration_ms / 1000.0, endpoint=endpoint, model=model)
+
+    # One structured line per call instead of ad-hoc prints
+    logger.info("ai_call %s", json.dumps({
+        "endpoint": endpoint,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+        "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+        "cache": cache,
+        "fallback_reason": fallback_reason,
+        "cost_usd": round(cost, 6),
+    }))
@@ -0,0 +1,200 @@
+# services/analytics_service.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import config
+import storage
+from db_connection import get_collection
+
+# Aggregations run against the progress collection and are materialized into
+# analytics_rollups; dashboards only ever read the rollups.
+progress_collection = get_collection('progress')
+dwell_collection = get_collection('dwell_buckets')
+rollups_collection = get_collection('analytics_rollups')
+
+LEASE_ID = 'refresh_lease'
+
+
+def _funnel_pipeline():
+    """Per chapter: learners started and completed, and median time spent (sort + push)"""
+    return [
+        {'$sort': {'chapter_id': 1, 'time_spent': 1}},
+        {'$group': {
+            '_id': '$chapter_id',
+            'started': {'$sum': 1},
+            'completed': {'$sum': {'$cond': [{'$eq': ['$completed', True]}, 1, 0]}},
+            'times': {'$push': {'$ifNull': ['$time_spent', 0]}},
+        }},
+        {'$project': {
+            '_id': 0,
+            'chapter_id': '$_id',
+            'started': 1,
+            'completed': 1,
+            'completion_rate': {'$cond': [
+                {'$gt': ['$started', 0]}, {'$divide': ['$completed', '$started']}, 0]},
+            'median_time_spent': {'$arrayElemAt': [
+                '$times', {'$floor': {'$divide': [{'$size': '$times'}, 2]}}]},
+        }},
+        {'$sort': {'chapter_id': 1}},
+    ]
+
+
+def _drop_off_pipeline():
+    """Per chapter: the section where the most unfinished learners stopped"""
+    return [
+        {'$match': {'completed': {'$ne': True}, 'section_index': {'$exists': True}}},
+        {'$group': {'_id': {'chapter_id': '$chapter_id', 'section_index': '$section_index'}, 'learners': {'$sum': 1}}},
+        {'$sort': {'learners': -1, '_id.section_index': 1}},
+        {'$group': {
+            '_id': '$_id.chapter_id',
+            'section_index': {'$first': '$_id.section_index'},
+            'learners': {'$first': '$learners'},
+            'unfinished': {'$sum': '$learners'},
+        }},
+        {'$project': {'_id': 0, 'chapter_id': '$_id', 'section_index': 1, 'learners': 1, 'unfinished': 1}},
+        {'$sort': {'chapter_id': 1}},
+    ]
+
+
+def _daily_active_pipeline(since):
+    """Distinct learners whose progress changed on each day since `since`"""
+    return [
+        {'$match': {'last_updated': {'$gte': since}}},
+        {'$group': {'_id': {
+            'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$last_updated'}},
+            'user_id': '$user_id',
+        }}},
+        {'$group': {'_id': '$_id.day', 'learners': {'$sum': 1}}},
+    ]
+
+
+def _section_heatmap_pipeline(since):
+    """Per chapter and section: views, dwell time and skips, from the dwell buckets"""
+    return [
+        {'$match': {'hour': {'$gte': since}}},
+        {'$unwind': '$samples'},
+        {'$group': {
+            '_id': {'chapter_id': '$chapter_id', 'section_index': '$samples.s'},
+            'views': {'$sum': 1},
+            'total_seconds': {'$sum': '$samples.d'},
+            'skipped': {'$sum': {'$cond': [{'$lt': ['$samples.d', config.DWELL_SKIP_SECONDS]}, 1, 0]}},
+            'learners': {'$addToSet': '$user_id'},
+        }},
+        {'$project': {
+            '_id': 0,
+            'chapter_id': '$_id.chapter_id',
+            'section_index': '$_id.section_index',
+            'views': 1,
+            'learners': {'$size': '$learners'},
+            'avg_seconds': {'$round': [{'$divide': ['$total_seconds', '$views']}, 1]},
+            'skip_rate': {'$divide': ['$skipped', '$views']},
+        }},
+        {'$sort': {'chapter_id': 1, 'section_index': 1}},
+    ]
+
+
+def refresh_rollups(now=None):
+    """Recompute every rollup and store it; returns a summary of what was written.
+
+    Funnel and drop-off are recomputed in full, the section heatmap over the
+    last ANALYTICS_DASHBOARD_DAYS of dwell buckets. Daily active learners are
+    incremental: only today and yesterday are recomputed (progress documents
+    only keep their latest update, so older days can't be recovered) and a
+    day's count is only ever raised.
+    """
+    now = now or datetime.utcnow()
+    funnel = list(progress_collection.aggregate(_funnel_pipeline(), allowDiskUse=True))
+    drop_off = list(progress_collection.aggregate(_drop_off_pipeline(), allowDiskUse=True))
+
+    rollups_collection.update_one(
+        {'_id': 'chapter_funnel'},
+        {'$set': {'kind': 'chapter_funnel', 'value': funnel, 'computed_at': now}},
+        upsert=True)
+    rollups_collection.update_one(
+        {'_id': 'drop_off'},
+        {'$set': {'kind': 'drop_off', 'value': drop_off, 'computed_at': now}},
+        upsert=True)
+
+    heatmap_since = now - timedelta(days=config.ANALYTICS_DASHBOARD_DAYS)
+    heatmap = list(dwell_collection.aggregate(_section_heatmap_pipeline(heatmap_since), allowDiskUse=True))
+    rollups_collection.update_one(
+        {'_id': 'section_heatmap'},
+        {'$set': {'kind': 'section_heatmap', 'value': heatmap, 'computed_at': now}},
+        upsert=True)
+
+    since = datetime(now.year, now.month, now.day) - timedelta(days=1)
+    days = list(progress_collection.aggregate(_daily_active_pipeline(since)))
+    for row in days:
+        rollups_collection.update_one(
+            {'_id': f"daily_active:{row['_id']}"},
+            {'$set': {'kind': 'daily_active', 'day': row['_id'], 'computed_at': now},
+             '$max': {'learners': row['learners']}},
+            upsert=True)
+
+    print(f"Analytics rollups refreshed: {len(funnel)} chapters, {len(days)} active days")
+    return {"chapters": len(funnel), "drop_off_chapters": len(drop_off),
+            "heatmap_sections": len(heatmap), "active_days": len(days)}
+
+
+def _take_lease(now):
+    """Only one worker refreshes per interval; returns True if this one should"""
+    expires = now + timedelta(seconds=config.ANALYTICS_REFRESH_SECONDS * 0.9)
+    try:
+        lease = rollups_collection.find_one_and_update(
+            {'_id': LEASE_ID, 'expires_at': {'$lt': now}},
+            {'$set': {'expires_at': expires, 'holder': os.getpid()}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        # Someone else holds an unexpired lease
+        return False
+    return bool(lease) and lease.get('holder') == os.getpid()
+
+
+def get_dashboard(days=None):
+    """Latest rollups for the analytics dashboard (reads a handful of small documents)"""
+    days = days or config.ANALYTICS_DASHBOARD_DAYS
+    first_day = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    funnel = rollups_collection.find_one({'_id': 'chapter_funnel'}) or {}
+    drop_off = rollups_collection.find_one({'_id': 'drop_off'}) or {}
+    heatmap = rollups_collection.find_one({'_id': 'section_heatmap'}) or {}
+    daily = rollups_collection.find(
+        {'kind': 'daily_active', 'day': {'$gte': first_day}},
+        {'_id': 0, 'day': 1, 'learners': 1}).sort('day', 1)
+    return {
+        "computed_at": funnel.get('computed_at'),
+        "chapter_funnel": funnel.get('value', []),
+        "drop_off": drop_off.get('value', []),
+        "section_heatmap": heatmap.get('value', []),
+        "daily_active": list(daily),
+    }
+
+
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def _run_scheduler():
+    while True:
+        try:
+            now = datetime.utcnow()
+            if _take_lease(now):
+                refresh_rollups(now)
+        except Exception as e:
+            print(f"Analytics rollup refresh failed: {e}")
+        time.sleep(config.ANALYTICS_REFRESH_SECONDS)
+
+
+def start_scheduler():
+    """Refresh rollups every ANALYTICS_REFRESH_SECONDS in the background (once per process)"""
+    global _scheduler_pid
+    # The aggregations are MongoDB pipelines
+    if not config.ANALYTICS_ROLLUP_ENABLED or not storage.uses_mongo():
+        return
+    with _scheduler_lock:
+        if _scheduler_pid == os.getpid():
+            return
+        _scheduler_pid = os.getpid()
+    threading.Thread(target=_run_scheduler, name="analytics-rollups", daemon=True).start()
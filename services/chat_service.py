@@ -0,0 +1,174 @@
+# services/chat_service.py
+import atexit
+import os
+import threading
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import config
+import storage
+from db_connection import get_collection
+
+# Append-only chat transcripts, bucketed: one document per user and chapter
+# holds about CHAT_BUCKET_SIZE messages in order. Restoring reads the newest
+# bucket through the (user_id, chapter_id, _id) index.
+transcripts_collection = get_collection('chat_transcripts')
+
+ROLES = ('user', 'assistant')
+
+
+def _message(role, content, at):
+    return {'role': role, 'content': content[:config.CHAT_MAX_MESSAGE_CHARS], 'at': at}
+
+
+def _append_update(user_id, chapter_id, messages):
+    """Push messages onto the open bucket, or start a new one.
+
+    Each flush pushes a user's pending messages with one update, so a bucket
+    can overshoot CHAT_BUCKET_SIZE by one flush but is never matched again
+    once it has reached it; messages therefore stay in order across buckets.
+    """
+    return UpdateOne(
+        {'user_id': ObjectId(user_id), 'chapter_id': chapter_id, 'count': {'$lt': config.CHAT_BUCKET_SIZE}},
+        {'$push': {'messages': {'$each': messages}},
+         '$inc': {'count': len(messages)},
+         '$min': {'first_at': messages[0]['at']},
+         '$max': {'last_at': messages[-1]['at']}},
+        upsert=True)
+
+
+class TranscriptBuffer:
+    """Write-behind queue for transcript messages.
+
+    Requests only enqueue; a background thread appends every
+    CHAT_FLUSH_SECONDS with one unordered bulk_write. Failed appends are put
+    back in front of newer messages and retried.
+    """
+
+    def __init__(self):
+        # (user_id, chapter_id) -> [message, ...] in arrival order
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def add(self, user_id, chapter_id, message):
+        with self._lock:
+            self._pending.setdefault((str(user_id), chapter_id), []).append(message)
+            full = len(self._pending) >= config.CHAT_MAX_PENDING
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, user_id, chapter_id):
+        """Messages not written yet, so a restore right after a question sees them"""
+        with self._lock:
+            return list(self._pending.get((str(user_id), chapter_id), []))
+
+    def flush(self):
+        """Append all pending messages; returns how many transcripts were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            keys = list(batch)
+            operations = [_append_update(user_id, chapter_id, batch[(user_id, chapter_id)])
+                          for user_id, chapter_id in keys]
+            failed = set()
+            try:
+                transcripts_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            except Exception as e:
+                print(f"Transcript bulk write failed: {e}")
+                failed = set(range(len(operations)))
+
+            if failed:
+                print(f"Transcript flush: {len(failed)} of {len(keys)} transcripts will be retried")
+                with self._lock:
+                    for index in failed:
+                        key = keys[index]
+                        self._pending[key] = batch[key] + self._pending.get(key, [])
+            return len(keys) - len(failed)
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+            threading.Thread(target=self._run, name="transcript-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(config.CHAT_FLUSH_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Transcript flusher error: {e}")
+
+    def _after_fork(self):
+        # Messages queued in the parent belong to the parent
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+transcript_buffer = TranscriptBuffer()
+atexit.register(transcript_buffer.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=transcript_buffer._after_fork)
+
+
+def record_message(user_id, chapter_id, role, content):
+    """Queue one message for the user's transcript of a chapter ('toc' for the contents page).
+
+    Transcripts are only kept with the MongoDB backend.
+    """
+    if not user_id or not content or role not in ROLES or not storage.uses_mongo():
+        return False
+    transcript_buffer.add(user_id, chapter_id or 'toc', _message(role, content, datetime.utcnow()))
+    return True
+
+
+def flush_transcripts():
+    """Write queued messages now (worker shutdown)"""
+    return transcript_buffer.flush()
+
+
+def get_transcript_page(user_id, chapter_id, before=None):
+    """One bucket of a transcript, newest first: (messages, cursor for the older bucket or None).
+
+    The first page also includes this process's not-yet-written messages.
+    """
+    if not storage.uses_mongo():
+        return [], None
+    chapter_id = chapter_id or 'toc'
+    query = {'user_id': ObjectId(user_id), 'chapter_id': chapter_id}
+    if before:
+        try:
+            query['_id'] = {'$lt': ObjectId(before)}
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid 'before' cursor")
+
+    bucket = next(iter(transcripts_collection.find(query, {'messages': 1}).sort('_id', -1).limit(1)), None)
+    messages = list(bucket.get('messages', [])) if bucket else []
+    if not before:
+        messages.extend(transcript_buffer.pending(user_id, chapter_id))
+
+    cursor = None
+    if bucket:
+        # Index-only check for an older bucket
+        older = dict(query, _id={'$lt': bucket['_id']})
+        if transcripts_collection.find_one(older, {'_id': 1}):
+            cursor = str(bucket['_id'])
+    return messages, cursor
@@ -0,0 +1,84 @@
+# services/circuit_breaker.py
+import threading
+import time
+
+import config
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently considered unhealthy"""
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through once the
+    open period has passed (half-open); the probe's outcome closes or re-opens it"""
+
+    def __init__(self, name, failure_threshold, open_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == OPEN and elapsed >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                print(f"Circuit '{self.name}' half-open, probing upstream")
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.open_seconds - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"Circuit '{self.name}' closed, upstream healthy again")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def record_neutral(self):
+        """A call ended without saying anything about upstream health (e.g. a bad request)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def is_closed(self):
+        with self._lock:
+            return self.state == CLOSED
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+openai_breaker = CircuitBreaker(
+    'openai',
+    config.CIRCUIT_FAILURE_THRESHOLD,
+    config.CIRCUIT_OPEN_SECONDS,
+)
@@ -0,0 +1,155 @@
+# services/meta_answers.py
+import math
+import re
+
+import config
+from services import ai_telemetry, notion_service, user_service
+
+# Meta questions about the course itself, answered from local data without the LLM.
+# Each pattern needs the question to be about the course ("this chapter", "the
+# course", "to read"): course content is full of "how long does it take to ..."
+# and "how many chapters ..." questions that belong to the tutor.
+_COURSE_UNIT = (r"(?:(?:this|the|that|each|every|a|my|current|next|whole|entire)\s+(?:\w+\s+)?"
+                r"(?:chapter|course|lesson|module)s?|chapter\s+\d+)\b")
+CHAPTER_TIME_PATTERN = re.compile(
+    # "how long is this chapter", "how long will it take me to finish the course"
+    r"\bhow (?:long|much time)\s+(?:is|are|will|does|do|would|should|might)\s+"
+    r"(?:it\s+take\s+(?:me\s+)?(?:to\s+(?:read|finish|complete|get through|go through|do)\s+)?)?" + _COURSE_UNIT +
+    # "how long will it take to read?" (nothing else named)
+    r"|\bhow (?:long|much time)\b[^?.!]*\bto read(?:\s+(?:it|this|that|through))?\s*[?.!]*$"
+    r"|\breading time\b",
+    re.IGNORECASE)
+CHAPTERS_LEFT_PATTERN = re.compile(
+    r"\bhow many (?:more )?chapters?(?:\s+(?:are|is|do i have|have i got))?\s+(?:left|remaining|to go)\b"
+    r"|\bhow many more chapters\s*[?.!]*$"
+    r"|\bchapters? (?:are |is )?(?:left|remaining)\s*[?.!]*$",
+    re.IGNORECASE)
+# "how many chapters (are there / does the course have / in total)?" and nothing more
+CHAPTER_COUNT_PATTERN = re.compile(
+    r"\bhow many chapters(?:\s+(?:are|is))?(?:\s+there)?"
+    r"(?:\s+(?:in|does|do)\s+(?:the|this)\s+course(?:\s+(?:have|has|contain))?)?"
+    r"(?:\s+(?:in\s+)?total)?\s*[?.!]*$",
+    re.IGNORECASE)
+COMPLETED_PATTERN = re.compile(
+    r"\bwhat (have|did) i (already )?(finish|finished|complete|completed|done|cover|covered)\b"
+    r"|\bwhich chapters (have|did) i\b|\bmy progress\b",
+    re.IGNORECASE)
+
+
+def detect_meta_intent(question):
+    """Return the meta intent of a question, or None for regular tutoring questions"""
+    if not question:
+        return None
+    if CHAPTERS_LEFT_PATTERN.search(question):
+        return 'chapters_left'
+    if CHAPTER_COUNT_PATTERN.search(question):
+        return 'chapter_count'
+    if COMPLETED_PATTERN.search(question):
+        return 'completed'
+    if CHAPTER_TIME_PATTERN.search(question):
+        return 'chapter_time'
+    return None
+
+
+def reading_minutes(word_count):
+    """Estimated reading time in whole minutes"""
+    return max(1, int(math.ceil(word_count / float(config.READING_WORDS_PER_MINUTE))))
+
+
+def _course_chapters():
+    return notion_service.get_chapter_titles(notion_service.build_course_map(config.NOTION_DATABASE_ID))
+
+
+def _completed_chapters(user_id, chapters):
+    completed = user_service.get_completed_chapters(user_id) if user_id else None
+    if completed is None:
+        return None
+    completed = set(completed)
+    return [title for title in chapters if title in completed]
+
+
+def _chapter_word_count(chapter_title):
+    """Words in the server-rendered chapter (rendering it, from the content cache, if needed)"""
+    word_count = notion_service.chapter_word_counts.get(chapter_title)
+    if word_count is None:
+        notion_service.get_chapter_content(
+            notion_service.build_course_map(config.NOTION_DATABASE_ID), chapter_title)
+        word_count = notion_service.chapter_word_counts.get(chapter_title)
+    return word_count
+
+
+def _answer_chapter_time(current_chapter_title):
+    # The whole chapter as rendered here, never the section text the client sent
+    chapter_title = current_chapter_title
+    if not chapter_title:
+        # Asked from the table of contents: estimate the first chapter
+        chapters = _course_chapters()
+        if not chapters:
+            return None
+        chapter_title = chapters[0]
+    word_count = _chapter_word_count(chapter_title)
+    if not word_count:
+        return None
+
+    minutes = reading_minutes(word_count)
+    unit = "minute" if minutes == 1 else "minutes"
+    return (f"**{chapter_title}** is about {word_count:,} words, so it should take around "
+            f"{minutes} {unit} to read through at a comfortable pace. Take your time - "
+            f"there's no rush!")
+
+
+def _answer_chapter_count(chapters):
+    return f"The course has {len(chapters)} chapters in total. Each one builds on the last, so you're in good hands!"
+
+
+def _answer_chapters_left(chapters, completed):
+    left = len(chapters) - len(completed)
+    if left == 0:
+        return f"You've completed all {len(chapters)} chapters - amazing work! 🎉"
+    unit = "chapter" if left == 1 else "chapters"
+    return (f"You've completed {len(completed)} of {len(chapters)} chapters, so there "
+            f"{'is' if left == 1 else 'are'} {left} {unit} left to go. You've got this!")
+
+
+def _answer_completed(chapters, completed):
+    if not completed:
+        return "You haven't completed any chapters yet - but every expert started right where you are!"
+    listed = "\n".join(f"* {title}" for title in completed)
+    return f"You've completed {len(completed)} of {len(chapters)} chapters so far:\n\n{listed}\n\nGreat progress!"
+
+
+def answer_meta_question(question, current_chapter_title='', user_id=None):
+    """Answer course meta questions (reading time, chapter counts, progress) locally.
+
+    Returns the answer text, or None if the question is not a meta question or
+    the local data needed to answer it exactly is unavailable.
+    """
+    intent = detect_meta_intent(question)
+    if not intent:
+        return None
+
+    try:
+        if intent == 'chapter_time':
+            answer = _answer_chapter_time(current_chapter_title)
+        else:
+            chapters = _course_chapters()
+            if not chapters:
+                return None
+            if intent == 'chapter_count':
+                answer = _answer_chapter_count(chapters)
+            else:
+                completed = _completed_chapters(user_id, chapters)
+                if completed is None:
+                    return None
+                if intent == 'chapters_left':
+                    answer = _answer_chapters_left(chapters, completed)
+                else:
+                    answer = _answer_completed(chapters, completed)
+    except Exception as e:
+        print(f"Meta question handling failed, falling back to the LLM: {e}")
+        return None
+
+    if answer:
+        print(f"Answered meta question locally ({intent})")
+        ai_telemetry.record_call('tutor', model='local', cache='local', fallback_reason=intent)
+    return answer
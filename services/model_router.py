@@ -0,0 +1,283 @@
+# services/model_router.py
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+import openai
+
+import config
+from services import ai_telemetry, openai_transport, prompt_builder
+from services.circuit_breaker import openai_breaker
+
+# Latency samples kept per (task, model) for percentile checks
+LATENCY_WINDOW = 200
+# Minimum samples before an SLO breach can trigger a fallback
+MIN_SAMPLES_FOR_SLO = 20
+
+# Upstream failures worth retrying once on the fallback model
+RETRYABLE_ERRORS = (
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+)
+
+# Failures that count against upstream health for the circuit breaker
+BREAKER_ERRORS = RETRYABLE_ERRORS + (
+    openai.error.APIError,
+    openai.error.RateLimitError,
+)
+
+# Threads running hedged calls; losers finish in the background
+_hedge_pool = ThreadPoolExecutor(max_workers=config.AI_HEDGE_MAX_WORKERS, thread_name_prefix="ai-hedge")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, int(math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Route:
+    """The model and request parameters chosen for one AI call"""
+
+    def __init__(self, task, model, params, fallback_model=None, hedge=False, reason=None):
+        self.task = task
+        self.model = model
+        self.params = params
+        self.fallback_model = fallback_model
+        self.hedge = hedge
+        # Why a fallback model is in use, if it is (for telemetry)
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Route({self.task} -> {self.model})"
+
+
+class ModelStats:
+    """Latency samples and token usage for one (task, model) pair"""
+
+    def __init__(self):
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def snapshot(self):
+        samples = list(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+        }
+
+
+_stats = {}
+_degraded_until = {}
+_lock = threading.Lock()
+
+
+def _stats_for(task, model):
+    """Get or create stats for (task, model) (caller must hold the lock)"""
+    key = (task, model)
+    if key not in _stats:
+        _stats[key] = ModelStats()
+    return _stats[key]
+
+
+def route(task):
+    """Pick the model and parameters for a task from config.AI_MODEL_ROUTES"""
+    settings = config.AI_MODEL_ROUTES[task]
+    model = settings['model']
+    fallback_model = settings.get('fallback_model') or None
+    params = dict(settings.get('params', {}))
+    params['request_timeout'] = settings.get('timeout', config.OPENAI_REQUEST_TIMEOUT_SECONDS)
+    hedge = config.AI_HEDGE_ENABLED and settings.get('hedge', False)
+
+    slo_ms = settings.get('slo_p95_ms')
+    if fallback_model and slo_ms:
+        now = time.monotonic()
+        with _lock:
+            if _degraded_until.get(task, 0) > now:
+                return Route(task, fallback_model, params, hedge=hedge, reason='slo_breach')
+            stats = _stats_for(task, model)
+            samples = list(stats.latencies_ms)
+            p95 = percentile(samples, 95) if len(samples) >= MIN_SAMPLES_FOR_SLO else None
+            if p95 is not None and p95 > slo_ms:
+                print(f"Model router: {task} p95 {p95:.0f}ms on {model} breaches {slo_ms}ms SLO, "
+                      f"using {fallback_model} for {config.AI_ROUTER_COOLDOWN_SECONDS}s")
+                _degraded_until[task] = now + config.AI_ROUTER_COOLDOWN_SECONDS
+                # Start the primary's window afresh when it is tried again
+                stats.latencies_ms.clear()
+                return Route(task, fallback_model, params, hedge=hedge, reason='slo_breach')
+
+    return Route(task, model, params, fallback_model, hedge)
+
+
+def record(task, model, latency_ms=None, prompt_tokens=0, completion_tokens=0, error=False):
+    """Record one call's latency and token usage"""
+    with _lock:
+        stats = _stats_for(task, model)
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        if latency_ms is not None:
+            stats.latencies_ms.append(latency_ms)
+        stats.prompt_tokens += prompt_tokens or 0
+        stats.completion_tokens += completion_tokens or 0
+
+
+def hedge_delay_ms(task, model):
+    """Latency after which a duplicate request is sent, or None without enough samples"""
+    with _lock:
+        samples = list(_stats_for(task, model).latencies_ms)
+    if len(samples) < MIN_SAMPLES_FOR_SLO:
+        return None
+    return percentile(samples, config.AI_HEDGE_PERCENTILE)
+
+
+def model_stats():
+    """Per task/model latency and token usage, for diagnostics"""
+    with _lock:
+        return {f"{task}/{model}": stats.snapshot() for (task, model), stats in _stats.items()}
+
+
+class _MeteredStream:
+    """Wraps a streaming response to record time-to-first-token and chunk count"""
+
+    def __init__(self, stream, chosen_route, model, started, prompt_tokens):
+        self._stream = stream
+        self._task = chosen_route.task
+        self._reason = chosen_route.reason
+        self._model = model
+        self._started = started
+        self._prompt_tokens = prompt_tokens
+
+    def __iter__(self):
+        first_token_ms = None
+        chunks = 0
+        failed = False
+        try:
+            for chunk in self._stream:
+                if first_token_ms is None:
+                    first_token_ms = (time.monotonic() - self._started) * 1000
+                chunks += 1
+                yield chunk
+        except BREAKER_ERRORS:
+            failed = True
+            openai_breaker.record_failure()
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Streams carry no usage block; each content chunk is roughly one token
+            record(self._task, self._model, first_token_ms, self._prompt_tokens, chunks, error=failed)
+            ai_telemetry.record_call(
+                self._task, self._model, self._prompt_tokens, chunks,
+                ttft_ms=first_token_ms,
+                duration_ms=(time.monotonic() - self._started) * 1000,
+                fallback_reason='stream_error' if failed else self._reason,
+            )
+
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+
+
+def _call(chosen_route, model, messages, user_id, stream):
+    started = time.monotonic()
+    endpoint_class = chosen_route.task if chosen_route.task in config.AI_ENDPOINT_CLASSES else None
+    response = openai_transport.chat_completion(
+        user_id=user_id,
+        endpoint_class=endpoint_class,
+        model=model,
+        messages=messages,
+        stream=stream,
+        **chosen_route.params
+    )
+    if stream:
+        prompt_tokens = prompt_builder.count_message_tokens(messages, model)
+        return _MeteredStream(response, chosen_route, model, started, prompt_tokens)
+
+    duration_ms = (time.monotonic() - started) * 1000
+    usage = response.get('usage', {})
+    prompt_tokens = usage.get('prompt_tokens', 0)
+    completion_tokens = usage.get('completion_tokens', 0)
+    record(chosen_route.task, model, duration_ms, prompt_tokens, completion_tokens)
+    ai_telemetry.record_call(
+        chosen_route.task, model, prompt_tokens, completion_tokens,
+        duration_ms=duration_ms, fallback_reason=chosen_route.reason,
+    )
+    return response
+
+
+def _guarded_call(chosen_route, model, messages, user_id, stream):
+    """Call upstream unless the circuit is open, reporting the outcome to the breaker"""
+    openai_breaker.before_call()
+    try:
+        response = _call(chosen_route, model, messages, user_id, stream)
+    except BREAKER_ERRORS:
+        openai_breaker.record_failure()
+        raise
+    except Exception:
+        openai_breaker.record_neutral()
+        raise
+    openai_breaker.record_success()
+    return response
+
+
+def _hedged_call(chosen_route, model, messages, user_id):
+    """Send a duplicate request once the first is slower than the task's hedge percentile"""
+    delay_ms = hedge_delay_ms(chosen_route.task, model)
+    if delay_ms is None:
+        return _guarded_call(chosen_route, model, messages, user_id, False)
+
+    primary = _hedge_pool.submit(_guarded_call, chosen_route, model, messages, user_id, False)
+    try:
+        return primary.result(timeout=delay_ms / 1000.0)
+    except FutureTimeout:
+        pass
+
+    # Never hedge into a struggling upstream or a busy gate; that only adds load
+    if not openai_breaker.is_closed() or not openai_transport.gate.has_capacity():
+        return primary.result()
+
+    print(f"Hedging {chosen_route.task} on {model} after {delay_ms:.0f}ms")
+    hedge = _hedge_pool.submit(_guarded_call, chosen_route, model, messages, user_id, False)
+    done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+    first = done.pop()
+    if first.exception() is None:
+        return first.result()
+    other = hedge if first is primary else primary
+    return other.result()
+
+
+def complete(chosen_route, messages, user_id=None, stream=False):
+    """Run a chat completion for a route, retrying once on the fallback model.
+
+    Raises CircuitOpenError straight away while the upstream is unhealthy so
+    callers can serve their local fallback without waiting on a timeout.
+    """
+    started = time.monotonic()
+    try:
+        if chosen_route.hedge and not stream:
+            return _hedged_call(chosen_route, chosen_route.model, messages, user_id)
+        return _guarded_call(chosen_route, chosen_route.model, messages, user_id, stream)
+    except RETRYABLE_ERRORS as e:
+        # Timeouts are the slowest calls of all; they must reach the p95 window the SLO check reads
+        record(chosen_route.task, chosen_route.model, (time.monotonic() - started) * 1000, error=True)
+        if not chosen_route.fallback_model:
+            raise
+        print(f"Model router: {chosen_route.model} failed for {chosen_route.task} ({e}), "
+              f"retrying on {chosen_route.fallback_model}")
+        chosen_route.reason = 'upstream_error'
+        return _guarded_call(chosen_route, chosen_route.fallback_model, messages, user_id, stream)
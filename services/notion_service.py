@@ -1,11 +1,24 @@
 # services/notion_service.py
 import os
+import re
 import config
+from cache import get_cache
+from utils.instrumentation import timed
 from notion_client import Client
 
 # Initialize Notion client
 notion = Client(auth=config.NOTION_API_KEY)
-course_map = None
+
+def reset_client():
+    """Fresh Notion client with its own connection pool (e.g. after a fork)"""
+    global notion
+    notion = Client(auth=config.NOTION_API_KEY)
+    return notion
+
+# Course map and rendered pages are shared through the configured cache
+cache = get_cache()
+# Word counts of rendered chapters, filled in as chapters are fetched
+chapter_word_counts = {}
 
 def convert_rich_text_to_markdown(rich_text_array):
     """Convert Notion rich text to markdown format"""
@@ -23,7 +36,8 @@ def convert_rich_text_to_markdown(rich_text_array):
 def get_all_blocks_from_id(block_id):
     """Fetch all blocks from a Notion page/block"""
     try:
-        return notion.blocks.children.list(block_id=block_id).get("results", [])
+        with timed('notion', 'blocks.children.list'):
+            return notion.blocks.children.list(block_id=block_id).get("results", [])
     except Exception as e:
         print(f"Error fetching blocks for ID {block_id}: {e}")
         return []
@@ -68,15 +82,20 @@ def convert_block_to_markdown(block):
     return ""
 
 def build_course_map(database_id, course_name=config.COURSE_NAME):
+    """Map of page title -> page id for the course, built once per CACHE_COURSE_MAP_TTL_SECONDS"""
+    return cache.get_or_compute(
+        f"course_map:{database_id}:{course_name}",
+        lambda: _fetch_course_map(database_id, course_name),
+        config.CACHE_COURSE_MAP_TTL_SECONDS)
+
+def _fetch_course_map(database_id, course_name):
     """Build a map of all course content from Notion database"""
-    global course_map
-    if course_map is not None: return course_map
-    
     print("Building course map...")
-    db_response = notion.databases.query(
-        database_id=database_id, 
-        filter={"property": "Course Name", "title": {"equals": course_name}}
-    )
+    with timed('notion', 'databases.query'):
+        db_response = notion.databases.query(
+            database_id=database_id,
+            filter={"property": "Course Name", "title": {"equals": course_name}}
+        )
     pages = db_response.get("results", [])
     if not pages: raise Exception(f"Could not find '{course_name}' page.")
     
@@ -101,9 +120,19 @@ def build_course_map(database_id, course_name=config.COURSE_NAME):
             if title:
                 temp_map[title] = page_id
     
-    course_map = temp_map
-    print(f"Course map built with {len(course_map)} items.")
-    return course_map
+    print(f"Course map built with {len(temp_map)} items.")
+    return temp_map
+
+def render_page(page_id):
+    """Markdown for a page, rendered once per CACHE_PAGE_TTL_SECONDS"""
+    return cache.get_or_compute(f"page:{page_id}", lambda: _render_page(page_id), config.CACHE_PAGE_TTL_SECONDS) or ""
+
+def _render_page(page_id):
+    blocks = get_all_blocks_from_id(page_id)
+    if not blocks:
+        # Fetch errors also come back empty; don't cache them
+        return None
+    return "\n\n".join(filter(None, [convert_block_to_markdown(b) for b in blocks]))
 
 def get_chapter_content(course_map, chapter_title):
     """Get content for a specific chapter"""
@@ -111,11 +140,27 @@ def get_chapter_content(course_map, chapter_title):
     if not chapter_page_id: 
         raise ValueError(f"Chapter '{chapter_title}' not found in course map.")
         
-    chapter_blocks = get_all_blocks_from_id(chapter_page_id)
-    content = "\n\n".join(filter(None, [convert_block_to_markdown(b) for b in chapter_blocks]))
+    content = render_page(chapter_page_id)
+    chapter_word_counts[chapter_title] = count_words(content)
     
     return content
 
+def count_words(markdown):
+    """Count readable words in rendered markdown (images and links excluded)"""
+    text = re.sub(r'!\[[^\]]*\]\([^)]*\)', ' ', markdown)
+    text = re.sub(r'https?://\S+', ' ', text)
+    return len(re.findall(r"[A-Za-z0-9]+(?:['’-][A-Za-z0-9]+)*", text))
+
+def get_chapter_titles(course_map):
+    """Chapter titles from the course map, ordered by chapter number"""
+    chapters = []
+    for title in course_map.keys():
+        if "Chapter" in title and title != "Table of contents":
+            number = extract_chapter_number(title)
+            if number:
+                chapters.append((number, title))
+    return [title for _, title in sorted(chapters)]
+
 def extract_chapter_number(title):
     """Extract chapter number from title like 'Chapter 1: Introduction'"""
     import re
@@ -0,0 +1,233 @@
+# services/openai_transport.py
+import heapq
+import socket
+import threading
+
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+import config
+from services.ai_quota import request_cost
+from utils.error_handler import ApiError
+from utils.instrumentation import timed
+
+
+class UpstreamBusyError(ApiError):
+    """Raised when the OpenAI wait queue is full so callers can fail fast"""
+    def __init__(self, message="AI service is busy, please retry shortly", retry_after=None):
+        retry_after = retry_after or config.OPENAI_RETRY_AFTER_SECONDS
+        super().__init__(message, 503, headers={'Retry-After': str(retry_after)})
+        self.retry_after = retry_after
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTP adapter with a larger pool and TCP keep-alive on pooled sockets"""
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = list(HTTPConnection.default_socket_options)
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        kwargs['socket_options'] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class _SharedSession(requests.Session):
+    """Process-wide session; openai closes its per-thread sessions periodically,
+    which would drop every pooled connection, so close() is a no-op here"""
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+def _build_session():
+    session = _SharedSession()
+    adapter = _KeepAliveAdapter(
+        pool_connections=4,
+        pool_maxsize=config.OPENAI_POOL_MAXSIZE,
+        max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.2),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ConcurrencyGate:
+    """Caps concurrent upstream calls behind a bounded, weighted fair wait queue.
+
+    Waiters are served by virtual finish time (start-time fair queuing): each
+    flow (user) advances its own tag by the cost of every queued call, so a
+    user with many queued requests is interleaved with everyone else instead
+    of monopolising the slots.
+    """
+
+    def __init__(self, max_concurrent, max_waiting, wait_timeout, max_waiting_per_flow=None):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_waiting_per_flow = max_waiting_per_flow or max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.virtual_time = 0.0
+        self._waiters = []  # heap of (finish_tag, seq, waiter)
+        self._flow_finish = {}
+        self._flow_waiting = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, flow=None, cost=1):
+        """Take a slot, waiting in line if needed; raises UpstreamBusyError when full"""
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                return
+            if len(self._waiters) >= self.max_waiting:
+                raise UpstreamBusyError()
+            if flow is not None and self._flow_waiting.get(flow, 0) >= self.max_waiting_per_flow:
+                raise UpstreamBusyError()
+
+            start = max(self.virtual_time, self._flow_finish.get(flow, 0.0))
+            finish = start + cost
+            if flow is not None:
+                self._flow_finish[flow] = finish
+                self._flow_waiting[flow] = self._flow_waiting.get(flow, 0) + 1
+            self._seq += 1
+            waiter = {'event': threading.Event(), 'granted': False, 'flow': flow}
+            heapq.heappush(self._waiters, (finish, self._seq, waiter))
+
+        waiter['event'].wait(self.wait_timeout)
+
+        with self._lock:
+            if not waiter['granted']:
+                self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+                heapq.heapify(self._waiters)
+                self._done_waiting(flow)
+                raise UpstreamBusyError()
+
+    def release(self):
+        """Hand the slot to the waiter with the smallest finish tag, or free it"""
+        with self._lock:
+            if self._waiters:
+                finish, _, waiter = heapq.heappop(self._waiters)
+                self.virtual_time = max(self.virtual_time, finish)
+                self._done_waiting(waiter['flow'])
+                waiter['granted'] = True
+                waiter['event'].set()
+            else:
+                self.active -= 1
+                if self.active == 0:
+                    # Idle: forget per-flow history so tags do not grow forever
+                    self._flow_finish.clear()
+                    self.virtual_time = 0.0
+
+    def _done_waiting(self, flow):
+        """Update per-flow waiting counts (caller must hold the lock)"""
+        if flow is None:
+            return
+        remaining = self._flow_waiting.get(flow, 0) - 1
+        if remaining > 0:
+            self._flow_waiting[flow] = remaining
+        else:
+            self._flow_waiting.pop(flow, None)
+            if self._flow_finish.get(flow, 0.0) <= self.virtual_time:
+                self._flow_finish.pop(flow, None)
+
+    def has_capacity(self):
+        """True if a call would start immediately without queueing"""
+        with self._lock:
+            return self.active < self.max_concurrent and not self._waiters
+
+    def stats(self):
+        with self._lock:
+            return {"active": self.active, "waiting": len(self._waiters), "flows_waiting": len(self._flow_waiting)}
+
+
+class _StreamSlot:
+    """Iterates an OpenAI stream and releases the gate slot exactly once"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._released = False
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            gate.release()
+
+    def __del__(self):
+        self.close()
+
+
+gate = ConcurrencyGate(
+    config.OPENAI_MAX_CONCURRENCY,
+    config.OPENAI_MAX_QUEUE,
+    config.OPENAI_QUEUE_TIMEOUT_SECONDS,
+    config.OPENAI_MAX_QUEUE_PER_USER,
+)
+session = None
+
+
+def init_session():
+    """Install the pooled keep-alive session for all openai requests"""
+    global session
+    session = _build_session()
+    openai.requestssession = session
+    if config.OPENAI_API_BASE:
+        openai.api_base = config.OPENAI_API_BASE
+    return session
+
+
+def reset_session():
+    """Drop pooled connections (e.g. after a fork) and start a fresh session"""
+    global session
+    if session is not None:
+        session.shutdown()
+    return init_session()
+
+
+def warm_up():
+    """Open a TLS connection to the API ahead of the first real request"""
+    try:
+        response = session.get(
+            f"{openai.api_base}/models",
+            headers={'Authorization': f"Bearer {openai.api_key}"},
+            timeout=config.OPENAI_REQUEST_TIMEOUT_SECONDS,
+        )
+        print(f"OpenAI connection warmed up (status {response.status_code})")
+    except Exception as e:
+        print(f"OpenAI warm-up failed (not critical): {e}")
+
+
+def warm_up_async():
+    """Warm up the connection pool without blocking startup"""
+    threading.Thread(target=warm_up, name="openai-warmup", daemon=True).start()
+
+
+def chat_completion(user_id=None, endpoint_class=None, **kwargs):
+    """Call openai.ChatCompletion.create through the shared pool and fair concurrency gate"""
+    kwargs.setdefault('request_timeout', config.OPENAI_REQUEST_TIMEOUT_SECONDS)
+    gate.acquire(flow=user_id, cost=request_cost(endpoint_class))
+    try:
+        # Streams count until the response starts; ai_call_duration_seconds has the full length
+        with timed('openai', 'chat_completion_stream' if kwargs.get('stream') else 'chat_completion'):
+            response = openai.ChatCompletion.create(**kwargs)
+    except Exception:
+        gate.release()
+        raise
+
+    if kwargs.get('stream'):
+        # Hold the slot until the stream is fully consumed or closed
+        return _StreamSlot(response)
+    gate.release()
+    return response
+
+
+init_session()
@@ -0,0 +1,158 @@
+# services/prompt_builder.py
+import os
+import re
+from functools import lru_cache
+
+import config
+
+# Read by tiktoken when it loads an encoding
+if os.path.isdir(config.TIKTOKEN_CACHE_DIR):
+    os.environ.setdefault('TIKTOKEN_CACHE_DIR', config.TIKTOKEN_CACHE_DIR)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    print("tiktoken not installed - prompt token counts are approximate")
+
+# Static prompt prefixes. Keep these byte-identical between calls (no
+# interpolation) and ahead of any per-request text so the provider can reuse
+# its cached prefix.
+TUTOR_SYSTEM_PROMPT = (
+    "You are Hylee, a friendly and empathetic multifamily real estate tutor. "
+    "Always be warm, understanding, and helpful. "
+    "Rules: "
+    "1) Answer in 1-2 sentences max using only the provided context. "
+    "2) For chapter completion time questions: Give realistic estimates based on content length (typically 10-15 minutes per chapter). "
+    "3) For off-topic questions, be understanding and try to connect to course content when possible. "
+    "4) Always maintain a warm, encouraging tone. Never sound robotic or dismissive. "
+    "5) Be conversational and show genuine interest in helping them learn. "
+    "6) Don't mention future chapters unless specifically asked about course progression."
+)
+
+INTENT_SYSTEM_PROMPT = """Determine user intent: CONTINUE (wants next section) or QUESTION (has question about current content).
+
+CONTINUE examples: next, continue, move on, yes, ok, got it
+QUESTION examples: what, how, explain, clarify, don't understand
+
+Respond: CONTINUE or QUESTION"""
+
+QUICK_ACTIONS_SYSTEM_PROMPT = """Based on the content the user sends, create exactly 3 specific questions about actual terms, numbers, concepts, or facts mentioned.
+
+Requirements:
+- Extract specific terms, numbers, or concepts from the content
+- Format as questions like "What is [specific term]?", "How many [specific number/data]?", "When was [specific event]?"
+- Use ONLY information that actually appears in the content
+- Each question must be different and specific
+- Keep questions under 6 words
+- NO generic questions like "give examples", "elaborate", "define key terms"
+
+Example good questions:
+- "What is Lease-up Phase?"
+- "How many units converted?"
+- "What is Cap Rate?"
+
+Generate exactly 3 specific questions."""
+
+# Sentence ends, or paragraph/line breaks in the rendered markdown
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    """The model's tokenizer, or None (cached, so a failed load isn't retried per prompt)"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Usually no network to download the BPE file and no TIKTOKEN_CACHE_DIR copy
+        print(f"Tokenizer for {model} unavailable, prompt token counts are approximate: {e}")
+        return None
+
+
+def count_tokens(text, model=config.DEFAULT_CHAT_MODEL):
+    """Count tokens in text with the model's tokenizer"""
+    encoding = _encoding(model)
+    if encoding is None:
+        # Rough fallback when tiktoken is unavailable
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages, model=config.DEFAULT_CHAT_MODEL):
+    """Count prompt tokens for a chat request (message framing included)"""
+    total = 3  # every reply is primed with <|start|>assistant<|message|>
+    for message in messages:
+        total += 3  # <|start|>{role}<|message|>...<|end|>
+        total += count_tokens(message['content'], model)
+    return total
+
+
+def trim_to_tokens(text, budget, model=config.DEFAULT_CHAT_MODEL):
+    """Trim text to at most `budget` tokens, cutting at a sentence boundary"""
+    if count_tokens(text, model) <= budget:
+        return text
+
+    kept_end = 0
+    used = 0
+    position = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        piece = text[position:match.end()]
+        piece_tokens = count_tokens(piece, model)
+        if used + piece_tokens > budget:
+            break
+        used += piece_tokens
+        kept_end = match.end()
+        position = match.end()
+
+    if kept_end:
+        return text[:kept_end].rstrip() + " ..."
+
+    # A single sentence is over budget: fall back to a hard token cut
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:budget * 4].rstrip() + "..."
+    return encoding.decode(encoding.encode(text)[:budget]).rstrip() + "..."
+
+
+def _log_prompt(endpoint, messages, model):
+    prompt_tokens = count_message_tokens(messages, model)
+    print(f"Prompt tokens [{endpoint}] ({model}): {prompt_tokens}")
+    return prompt_tokens
+
+
+def build_intent_messages(user_input, model=config.DEFAULT_CHAT_MODEL):
+    """Messages for the CONTINUE/QUESTION classifier"""
+    user_input = trim_to_tokens(user_input, config.PROMPT_TOKEN_BUDGETS['classify'], model)
+    messages = [
+        {"role": "system", "content": INTENT_SYSTEM_PROMPT},
+        {"role": "user", "content": f'User said: "{user_input}"'}
+    ]
+    _log_prompt('classify', messages, model)
+    return messages
+
+
+def build_quick_actions_messages(section_content, model=config.DEFAULT_CHAT_MODEL):
+    """Messages for quick-action question extraction"""
+    section_content = trim_to_tokens(section_content, config.PROMPT_TOKEN_BUDGETS['quick_actions'], model)
+    messages = [
+        {"role": "system", "content": QUICK_ACTIONS_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Content: {section_content}"}
+    ]
+    _log_prompt('quick_actions', messages, model)
+    return messages
+
+
+def build_tutor_messages(question, context, current_chapter_title='', model=config.DEFAULT_CHAT_MODEL):
+    """Messages for the tutoring endpoints (streaming and non-streaming)"""
+    context = trim_to_tokens(context, config.PROMPT_TOKEN_BUDGETS['tutor'], model)
+    messages = [
+        {"role": "system", "content": TUTOR_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Current Chapter: {current_chapter_title}\nContext: {context}\n\nQ: {question}"}
+    ]
+    _log_prompt('tutor', messages, model)
+    return messages
@@ -1,190 +1,389 @@
 # services/user_service.py
+import atexit
 import os
-import ssl
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from pymongo import MongoClient
-from bson import ObjectId
+from flask import g, has_request_context
 import config
+from storage import get_repository
+from utils.error_handler import ApiError
 
-# Initialize MongoDB with multiple connection methods
-try:
-    # Check if we're on Render
-    is_render = os.environ.get('RENDER', 'false').lower() == 'true'
-    
-    if is_render:
-        print("Running on Render - trying multiple MongoDB connection methods")
-        
-        # Try multiple connection methods
-        connection_options = [
-            # Method 1: Standard SRV connection with TLS options
-            {
-                "name": "Standard SRV with TLS options",
-                "options": {
-                    "tls": True,
-                    "tlsAllowInvalidCertificates": True,
-                    "retryWrites": True,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                }
-            },
-            # Method 2: Direct connection without SRV
-            {
-                "name": "Direct connection without SRV",
-                "options": {
-                    "tls": True,
-                    "tlsAllowInvalidCertificates": True,
-                    "retryWrites": True,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                },
-                "uri_modifier": lambda uri: uri.replace("mongodb+srv://", "mongodb://")
-            },
-            # Method 3: SSL with certificate requirements disabled
-            {
-                "name": "SSL with cert requirements disabled",
-                "options": {
-                    "ssl": True,
-                    "ssl_cert_reqs": ssl.CERT_NONE,
-                    "retryWrites": False,
-                    "connectTimeoutMS": 30000,
-                    "socketTimeoutMS": 30000,
-                    "serverSelectionTimeoutMS": 30000
-                }
-            }
-        ]
-        
-        # Try each method until one works
-        last_error = None
-        for method in connection_options:
-            try:
-                print(f"Trying MongoDB connection method: {method['name']}")
-                
-                # Apply URI modifier if specified
-                if "uri_modifier" in method:
-                    uri = method["uri_modifier"](config.MONGODB_URI)
-                    print(f"Modified URI: {uri.split('@')[0]}@***")
-                else:
-                    uri = config.MONGODB_URI
-                
-                # Create client with options
-                client = MongoClient(uri, **method["options"])
-                
-                # Test connection
-                client.admin.command('ping')
-                print(f"MongoDB connection successful with method: {method['name']}")
-                
-                # Get database
-                db = client[config.MONGODB_DB_NAME]
-                users_collection = db.users
-                
-                # Exit the loop if connection works
-                break
-                
-            except Exception as e:
-                print(f"Connection method failed: {method['name']} - {e}")
-                last_error = e
-                continue
-        
-        # If we've tried all methods and still have an error, raise it
-        if last_error and 'users_collection' not in locals():
-            raise last_error
-    else:
-        # Standard connection for local development
-        print("Local environment - using standard MongoDB connection")
-        client = MongoClient(config.MONGODB_URI)
-        db = client[config.MONGODB_DB_NAME]
-        users_collection = db.users
-        
-except Exception as e:
-    print(f"MongoDB connection error in user_service.py: {e}")
-    
-    # Define a mock collection for development/testing
-    class MockCollection:
-        def find_one(self, query=None, *args, **kwargs):
-            print(f"Mock DB - find_one in users with query: {query}")
-            if query and '_id' in query:
-                return {
-                    "_id": query['_id'], 
-                    "email": "test@hy.ly", 
-                    "name": "Test User", 
-                    "course_progress": {},
-                    "completed_chapters": [],
-                    "total_time_spent": 0
-                }
-            return None
-            
-        def update_one(self, query, update, *args, **kwargs):
-            print(f"Mock DB - update_one in users: {query} → {update}")
-            return True
-            
-        def find(self, *args, **kwargs):
-            print(f"Mock DB - find in users")
-            return []
-    
-    # Use mock database if MongoDB connection fails
-    print("Using mock database for development/testing")
-    class MockDB:
-        def __getattr__(self, name):
-            return MockCollection()
-    
-    db = MockDB()
-    users_collection = db.users
+# Users, chapter progress and dwell buckets, in MongoDB or the embedded
+# SQLite store depending on STORAGE_BACKEND (see storage/)
+repository = get_repository()
+
+# Projections for the hot paths; None loads the whole document. The legacy
+# embedded fields are read until migrate_progress.py has moved them out.
+LEGACY_PROGRESS_FIELDS = ('course_progress', 'completed_chapters')
+SESSION_FIELDS = ('_id',)
+PROGRESS_FIELDS = ('name', 'email', 'total_time_spent') + LEGACY_PROGRESS_FIELDS
+COMPLETED_FIELDS = ('completed_chapters',)
 
-def get_user_by_id(user_id):
-    """Get user by ID"""
+# User documents, keyed by (user_id, fields), and chapter progress, keyed by
+# (user_id, 'progress'), are memoised for the current request only. Just the
+# session projection (the _id, which never changes) is also kept in a short
+# per-process TTL cache: invalidation only reaches the worker that handled a
+# write, so anything mutable cached there could be served stale by the others.
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def _cache_key(user_id, fields):
+    return (str(user_id), tuple(fields) if fields else None)
+
+def _request_memo():
+    """Per-request memo on flask.g, or None outside a request"""
+    if not has_request_context():
+        return None
+    if 'user_docs' not in g:
+        g.user_docs = {}
+    return g.user_docs
+
+def _cache_get(keys):
+    """First live entry among keys, from the request memo or the TTL cache"""
+    now = time.monotonic()
+    memo = _request_memo()
+    with _user_cache_lock:
+        for key in keys:
+            if memo is not None and key in memo:
+                return memo[key]
+            entry = _user_cache.get(key)
+            if entry and entry[0] > now:
+                _user_cache.move_to_end(key)
+                if memo is not None:
+                    memo[key] = entry[1]
+                return entry[1]
+    return None
+
+def _cache_put(key, value):
+    memo = _request_memo()
+    if memo is not None:
+        memo[key] = value
+    if key[1] != SESSION_FIELDS:
+        return
+    with _user_cache_lock:
+        _user_cache[key] = (time.monotonic() + config.USER_CACHE_TTL_SECONDS, value)
+        _user_cache.move_to_end(key)
+        while len(_user_cache) > config.USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+
+def invalidate_user(user_id):
+    """Drop every cached projection of a user after a write"""
+    user_id = str(user_id)
+    memo = _request_memo()
+    with _user_cache_lock:
+        for key in [k for k in _user_cache if k[0] == user_id]:
+            del _user_cache[key]
+        if memo is not None:
+            for key in [k for k in memo if k[0] == user_id]:
+                del memo[key]
+
+def get_user_by_id(user_id, fields=None):
+    """Get user by ID, loading only `fields` when given.
+
+    Served from the request memo when possible (and, for SESSION_FIELDS, the
+    short TTL cache); treat the returned document as read-only.
+    """
     if not user_id:
         return None
-    
+
+    # A cached full document satisfies any projection
+    user = _cache_get([_cache_key(user_id, fields), _cache_key(user_id, None)])
+    if user is not None:
+        return user
+
     try:
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = repository.get_user(user_id, fields)
+        if user is not None:
+            _cache_put(_cache_key(user_id, fields), user)
         return user
+    except ApiError:
+        # DatabaseUnavailableError: a 503 with Retry-After, not "user not found"
+        raise
     except Exception as e:
         print(f"Error getting user by ID: {e}")
         return None
 
-def get_all_users():
-    """Get all users from the database"""
-    try:
-        users = list(users_collection.find())
-        
-        # Convert ObjectId to string and datetime objects to strings for JSON serialization
-        for user in users:
-            user['_id'] = str(user['_id'])
-            if 'created_at' in user:
-                user['created_at'] = user['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if 'last_login' in user:
-                user['last_login'] = user['last_login'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        return users
-    except Exception as e:
-        print(f"Error getting all users: {e}")
-        return []
+# Fields the session needs after login
+LOGIN_FIELDS = ('email', 'name', 'picture', 'created_at')
+
+def upsert_login(email, name, google_id, picture):
+    """Create the user on first login or stamp last_login, atomically in one round trip"""
+    # MongoDB keeps datetimes to the millisecond; truncate so the created_at
+    # read back from a first login compares equal to this value
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    on_insert = {
+        'name': name,
+        'name_lower': (name or '').lower(),
+        'google_id': google_id,
+        'picture': picture,
+        'created_at': now,
+        'total_time_spent': 0,
+        'bookmarks': []
+    }
+    user = repository.upsert_login(email, on_insert, now, LOGIN_FIELDS)
+
+    if user.get('created_at') == now:
+        print(f"Created new user: {email}")
+    else:
+        print(f"Updated existing user: {email}")
+    invalidate_user(user['_id'])
+    return user
+
+# Fields shown in the admin user listing
+ADMIN_LIST_FIELDS = ('email', 'name', 'google_id', 'created_at', 'last_login', 'last_activity',
+                     'total_time_spent', 'completed_chapters')
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+
+def list_users(search=None, after=None, limit=50):
+    """One page of users in _id order, optionally filtered by an email or name prefix.
+
+    `after` is the cursor returned with the previous page. Returns
+    (users, next_cursor); next_cursor is None on the last page.
+    """
+    search = search.strip().lower() if search else None
+    # One extra row tells whether there is a next page
+    users = repository.list_users(search, after, limit + 1, ADMIN_LIST_FIELDS)
+    next_cursor = str(users[limit - 1]['_id']) if len(users) > limit else None
+    users = users[:limit]
+
+    completed = completed_chapters_by_user([user['_id'] for user in users])
+    for user in users:
+        chapters = [{'chapter_id': title, 'completed': True} for title in completed.get(user['_id'], [])]
+        user['completed_chapters'] = _completed_titles(user, chapters)
+        user['_id'] = str(user['_id'])
+        for field in ('created_at', 'last_login', 'last_activity'):
+            if field in user:
+                user[field] = _format_datetime(user[field])
+    return users, next_cursor
+
+def count_users():
+    """Cheap user count for the admin header"""
+    return repository.count_users()
+
+def completed_chapters_by_user(user_ids):
+    """Completed chapter titles for a page of users"""
+    if not user_ids:
+        return {}
+    return repository.completed_chapters_by_user(user_ids)
+
+def _dwell_sample(chapter_title, section_index, seconds, at):
+    return {'chapter_id': chapter_title, 'section_index': section_index,
+            'seconds': min(max(0, seconds), config.DWELL_MAX_SECONDS), 'at': at}
+
+def _dwell_appends(user_id, samples):
+    """Group a user's dwell samples into bucket appends: [(append, samples)].
+
+    Buckets are per chapter and hour and hold at most DWELL_BUCKET_MAX_SAMPLES
+    samples, stored compactly as {s: section_index, d: seconds, o: seconds
+    into the hour}.
+    """
+    buckets = {}
+    for sample in samples:
+        hour = sample['at'].replace(minute=0, second=0, microsecond=0)
+        buckets.setdefault((sample['chapter_id'], hour), []).append(sample)
+
+    appends = []
+    size = config.DWELL_BUCKET_MAX_SAMPLES
+    for (chapter_title, hour), bucket_samples in buckets.items():
+        for start in range(0, len(bucket_samples), size):
+            chunk = bucket_samples[start:start + size]
+            appends.append(({
+                'user_id': user_id,
+                'chapter_id': chapter_title,
+                'hour': hour,
+                'samples': [{'s': sample['section_index'], 'd': sample['seconds'],
+                             'o': int((sample['at'] - hour).total_seconds())} for sample in chunk],
+            }, chunk))
+    return appends
+
+def _empty_entry(at=None):
+    return {'chapters': {}, 'time_spent': 0, 'dwell': [], 'at': at}
+
+class ProgressBuffer:
+    """Write-behind buffer for progress saves.
+
+    Updates are merged per user and chapter (latest section index, summed
+    time) and flushed as unordered bulk_writes every PROGRESS_FLUSH_SECONDS,
+    when PROGRESS_MAX_PENDING users are waiting, and at process exit. Dwell
+    samples are appended to their hourly buckets in the same flush. Failed
+    operations are merged back and retried on the next flush.
+    """
+
+    def __init__(self):
+        # user_id -> {'chapters': {title: {'section_index', 'time_spent'}}, 'time_spent': n,
+        #             'dwell': [samples], 'at': datetime}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    def add(self, user_id, chapter_title, section_index, time_spent=0, dwell=None):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._pending.setdefault(user_id, _empty_entry())
+            chapter = entry['chapters'].setdefault(chapter_title, {'section_index': section_index, 'time_spent': 0})
+            chapter['section_index'] = section_index
+            chapter['time_spent'] += time_spent
+            entry['time_spent'] += time_spent
+            if dwell:
+                entry['dwell'].append(dwell)
+            entry['at'] = datetime.utcnow()
+            full = len(self._pending) >= config.PROGRESS_MAX_PENDING
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def _merge_back(self, batch):
+        with self._lock:
+            for user_id, old in batch.items():
+                entry = self._pending.setdefault(user_id, _empty_entry(old['at']))
+                # Newer positions win; time spent accumulates
+                for chapter_title, old_chapter in old['chapters'].items():
+                    chapter = entry['chapters'].get(chapter_title)
+                    if chapter is None:
+                        entry['chapters'][chapter_title] = old_chapter
+                    else:
+                        chapter['time_spent'] += old_chapter['time_spent']
+                entry['time_spent'] += old['time_spent']
+                entry['dwell'].extend(old['dwell'])
 
-def update_user_progress(user_id, chapter_title, section_index, time_spent=0):
-    """Update user's progress for a specific chapter"""
+    def flush(self):
+        """Write all pending updates; returns how many users were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            chapter_keys, chapter_updates, user_keys, user_updates = [], [], [], []
+            dwell_keys, dwell_appends = [], []
+            for user_id, entry in batch.items():
+                for chapter_title, chapter in entry['chapters'].items():
+                    chapter_keys.append((user_id, chapter_title))
+                    chapter_updates.append({'user_id': user_id, 'chapter_id': chapter_title,
+                                            'section_index': chapter['section_index'],
+                                            'time_spent': chapter['time_spent'], 'at': entry['at']})
+                user_keys.append(user_id)
+                user_updates.append({'user_id': user_id, 'time_spent': entry['time_spent'], 'at': entry['at']})
+                for append, samples in _dwell_appends(user_id, entry['dwell']):
+                    dwell_keys.append((user_id, samples))
+                    dwell_appends.append(append)
+
+            # Only the failed halves are retried, so nothing is counted twice
+            retry = {}
+            for index in repository.write_chapter_progress(chapter_updates):
+                user_id, chapter_title = chapter_keys[index]
+                entry = retry.setdefault(user_id, _empty_entry(batch[user_id]['at']))
+                entry['chapters'][chapter_title] = batch[user_id]['chapters'][chapter_title]
+            for index in repository.write_activity(user_updates):
+                user_id = user_keys[index]
+                retry.setdefault(user_id, _empty_entry(batch[user_id]['at']))['time_spent'] = batch[user_id]['time_spent']
+            for index in repository.append_dwell(dwell_appends):
+                user_id, samples = dwell_keys[index]
+                retry.setdefault(user_id, _empty_entry(batch[user_id]['at']))['dwell'].extend(samples)
+            if retry:
+                print(f"Progress flush: {len(retry)} of {len(batch)} users will be retried")
+                self._merge_back(retry)
+
+            for user_id in batch:
+                invalidate_user(user_id)
+            return len(batch) - len(retry)
+
+    def overlay(self, user_id, course_progress, total_time_spent):
+        """Apply not-yet-flushed updates to values read from the database"""
+        with self._lock:
+            entry = self._pending.get(str(user_id))
+            if entry is None:
+                return course_progress, total_time_spent
+            course_progress = dict(course_progress)
+            for chapter_title, chapter in entry['chapters'].items():
+                course_progress[chapter_title] = {'section_index': chapter['section_index'], 'last_updated': entry['at']}
+            return course_progress, total_time_spent + entry['time_spent']
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+            self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(config.PROGRESS_FLUSH_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Progress flusher error: {e}")
+
+    def _after_fork(self):
+        # Updates buffered in the parent belong to the parent
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+progress_buffer = ProgressBuffer()
+atexit.register(progress_buffer.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=progress_buffer._after_fork)
+
+def flush_progress():
+    """Write buffered progress now (worker shutdown, admin tooling)"""
+    return progress_buffer.flush()
+
+def update_user_progress(user_id, chapter_title, section_index, time_spent=0, dwell_section=None):
+    """Update user's progress for a specific chapter.
+
+    dwell_section is the (chapter_title, section_index) the time_spent was
+    spent reading; when given it is also recorded as a dwell sample.
+    """
     if not user_id or not chapter_title:
         return False
-    
-    try:
-        users_collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {
-                '$set': {
-                    f'course_progress.{chapter_title}': {
-                        'section_index': section_index,
-                        'last_updated': datetime.utcnow()
-                    },
-                    'last_activity': datetime.utcnow()
-                },
-                '$inc': {'total_time_spent': time_spent}
-            }
-        )
+
+    now = datetime.utcnow()
+    dwell = _dwell_sample(dwell_section[0], dwell_section[1], time_spent, now) if dwell_section else None
+    if config.PROGRESS_WRITE_MODE == 'buffered':
+        progress_buffer.add(user_id, chapter_title, section_index, time_spent, dwell)
         return True
-    except Exception as e:
-        print(f"Error updating user progress: {e}")
+    
+    failed = repository.write_chapter_progress([{'user_id': user_id, 'chapter_id': chapter_title,
+                                                 'section_index': section_index, 'time_spent': time_spent,
+                                                 'at': now}])
+    failed |= repository.write_activity([{'user_id': user_id, 'time_spent': time_spent, 'at': now}])
+    if dwell:
+        failed |= repository.append_dwell([append for append, _ in _dwell_appends(user_id, [dwell])])
+    invalidate_user(user_id)
+    if failed:
+        print(f"Error updating user progress for {user_id}")
         return False
+    return True
+
+def save_progress_batch(user_id, events):
+    """Record several progress events at once; returns how many were accepted"""
+    accepted = 0
+    for event in events:
+        if update_user_progress(user_id, event['chapter_title'], event['section_index'], event['time_spent'],
+                                event.get('dwell_section')):
+            accepted += 1
+    return accepted
 
 def complete_chapter(user_id, completed_chapter):
     """Mark a chapter as completed for a user"""
@@ -192,28 +391,143 @@ def complete_chapter(user_id, completed_chapter):
         return False
     
     try:
-        users_collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {
-                '$addToSet': {'completed_chapters': completed_chapter},
-                '$set': {'last_activity': datetime.utcnow()}
-            }
-        )
+        repository.complete_chapter(user_id, completed_chapter, datetime.utcnow())
+        invalidate_user(user_id)
         return True
+    except ApiError:
+        raise
     except Exception as e:
         print(f"Error completing chapter: {e}")
         return False
 
+def get_chapter_progress(user_id):
+    """A user's progress documents (one per chapter started), memoised for the request"""
+    key = (str(user_id), 'progress')
+    docs = _cache_get([key])
+    if docs is not None:
+        return docs
+    try:
+        docs = repository.chapter_progress(user_id)
+    except ApiError:
+        raise
+    except Exception as e:
+        print(f"Error getting chapter progress: {e}")
+        return []
+    _cache_put(key, docs)
+    return docs
+
+def flatten_legacy_progress(course_progress, prefix=''):
+    """Flatten the embedded course_progress map; titles with dots were stored nested"""
+    for key, value in (course_progress or {}).items():
+        if not isinstance(value, dict):
+            continue
+        title = f"{prefix}.{key}" if prefix else key
+        if 'section_index' in value:
+            yield title, value
+        else:
+            yield from flatten_legacy_progress(value, title)
+
+def _completed_titles(user, chapters):
+    completed = list(user.get('completed_chapters', []))
+    for doc in chapters:
+        if doc.get('completed') and doc['chapter_id'] not in completed:
+            completed.append(doc['chapter_id'])
+    return completed
+
 def get_user_progress(user_id):
     """Get user's progress details"""
-    user = get_user_by_id(user_id)
+    user = get_user_by_id(user_id, PROGRESS_FIELDS)
     if not user:
         return None
+
+    chapters = get_chapter_progress(user_id)
+    course_progress = {
+        title: {'section_index': value.get('section_index', 0), 'last_updated': value.get('last_updated')}
+        for title, value in flatten_legacy_progress(user.get('course_progress'))
+    }
+    for doc in chapters:
+        if 'section_index' in doc:
+            course_progress[doc['chapter_id']] = {
+                'section_index': doc['section_index'],
+                'last_updated': doc.get('last_updated')
+            }
+
+    # Include buffered saves that haven't been flushed yet
+    course_progress, total_time_spent = progress_buffer.overlay(
+        user_id, course_progress, user.get('total_time_spent', 0))
     
     return {
         "name": user.get('name'),
         "email": user.get('email'),
-        "completed_chapters": user.get('completed_chapters', []),
-        "course_progress": user.get('course_progress', {}),
-        "total_time_spent": user.get('total_time_spent', 0)
+        "completed_chapters": _completed_titles(user, chapters),
+        "course_progress": course_progress,
+        "total_time_spent": total_time_spent
+    }
+
+def get_completed_chapters(user_id):
+    """Titles of the chapters a user has completed, or None if the user is unknown"""
+    user = get_user_by_id(user_id, COMPLETED_FIELDS)
+    if not user:
+        return None
+    return _completed_titles(user, get_chapter_progress(user_id))
+
+# Columns of the progress export, one row per (user, chapter)
+EXPORT_FIELDS = (
+    'user_id', 'email', 'name', 'total_time_spent', 'last_activity',
+    'chapter_id', 'section_index', 'completed', 'completed_at', 'chapter_time_spent', 'chapter_last_updated'
+)
+EXPORT_USER_FIELDS = ('email', 'name', 'total_time_spent', 'last_activity') + LEGACY_PROGRESS_FIELDS
+
+def _export_rows(user, chapters):
+    base = {
+        'user_id': str(user['_id']),
+        'email': user.get('email'),
+        'name': user.get('name'),
+        'total_time_spent': user.get('total_time_spent', 0),
+        'last_activity': user.get('last_activity'),
+    }
+    # Not-yet-migrated users still carry their progress embedded
+    by_chapter = {
+        title: {'chapter_id': title, 'section_index': value.get('section_index'),
+                'last_updated': value.get('last_updated')}
+        for title, value in flatten_legacy_progress(user.get('course_progress'))
     }
+    for title in user.get('completed_chapters', []):
+        by_chapter.setdefault(title, {'chapter_id': title})['completed'] = True
+    for doc in chapters:
+        by_chapter[doc['chapter_id']] = dict(by_chapter.get(doc['chapter_id'], {}), **doc)
+
+    if not by_chapter:
+        yield base
+    for doc in by_chapter.values():
+        yield dict(base,
+                   chapter_id=doc['chapter_id'],
+                   section_index=doc.get('section_index'),
+                   completed=bool(doc.get('completed')),
+                   completed_at=doc.get('completed_at'),
+                   chapter_time_spent=doc.get('time_spent', 0),
+                   chapter_last_updated=doc.get('last_updated'))
+
+def iter_progress_export(since=None, batch_size=500):
+    """Yield one export row per (user, chapter), optionally only users active since `since`.
+
+    Users are read through a batched, projected cursor and their progress is
+    fetched one batch at a time, so memory stays flat however many learners
+    there are.
+    """
+    batch = []
+    for user in repository.iter_users(since, EXPORT_USER_FIELDS, batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            yield from _export_batch(batch)
+            batch = []
+    if batch:
+        yield from _export_batch(batch)
+
+
+def _export_batch(users):
+    chapters = {}
+    for doc in repository.progress_for_users([user['_id'] for user in users]):
+        chapters.setdefault(doc.pop('user_id'), []).append(doc)
+    for user in users:
+        yield from _export_rows(user, chapters.get(user['_id'], []))
@@ -0,0 +1,104 @@
+# startup_benchmark.py
+"""Measure app startup: interpreter start to import, first request and database readiness.
+
+Each run starts a fresh Python process, imports app.py, serves one request
+through the Flask test client and then waits for the background MongoDB
+connection to finish.
+
+    python startup_benchmark.py --runs 5
+    RENDER=true python startup_benchmark.py --runs 3 --path /ready --out startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as application
+imported = time.perf_counter()
+response = application.app.test_client().get(sys.argv[1])
+first_request = time.perf_counter()
+import db_connection
+ready = db_connection.wait_until_ready(float(sys.argv[2]))
+database_ready = time.perf_counter()
+print("STARTUP " + json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first_request - started) * 1000,
+    "first_status": response.status_code,
+    "database_ready_ms": (database_ready - started) * 1000 if ready else None,
+    "database": db_connection.status()["state"],
+}))
+'''
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1)
+    return round(ordered[min(index, len(ordered) - 1)], 1)
+
+
+def run_once(path, ready_timeout):
+    """Start a fresh interpreter and return its timings"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    launched = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', PROBE, path, str(ready_timeout)],
+        cwd=root, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - launched) * 1000
+
+    for line in proc.stdout.splitlines():
+        if line.startswith('STARTUP '):
+            result = json.loads(line[len('STARTUP '):])
+            result["process_ms"] = total_ms
+            return result
+    raise RuntimeError(f"Startup probe failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def summarize(runs):
+    summary = {}
+    for metric in ('import_ms', 'first_request_ms', 'database_ready_ms', 'process_ms'):
+        samples = [r[metric] for r in runs if r.get(metric) is not None]
+        summary[metric] = {
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "max": round(max(samples), 1) if samples else None,
+        }
+    summary["database_states"] = sorted({r["database"] for r in runs})
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import-to-first-request time")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/health', help="path for the first request")
+    parser.add_argument('--ready-timeout', type=float, default=60,
+                        help="seconds to wait for the database after the first request")
+    parser.add_argument('--out', help="write the JSON report here")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        result = run_once(args.path, args.ready_timeout)
+        runs.append(result)
+        print(f"run {i + 1}: import {result['import_ms']:.0f}ms, "
+              f"first request {result['first_request_ms']:.0f}ms ({result['first_status']}), "
+              f"database {result['database']}")
+
+    report = {
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "render": os.environ.get('RENDER', 'false'),
+        "path": args.path,
+        "summary": summarize(runs),
+        "runs": runs,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    print(json.dumps(report["summary"], indent=2))
@@ -41,6 +41,61 @@ document.addEventListener('DOMContentLoaded', () => {
     
     const API_BASE_URL = getApiUrl();
 
+    // --- Progress Reporting ---
+    // Section views are queued and sent in batches; whatever is left when the
+    // page is hidden goes out with sendBeacon so it survives the unload. Each
+    // event also says which section the elapsed time was spent on (dwell time).
+    const PROGRESS_FLUSH_MS = 15000;
+    let progressQueue = [];
+    let lastProgressAt = Date.now();
+    let dwellSection = null;
+
+    function queueProgress() {
+        if (!currentChapterTitle) return;
+        const now = Date.now();
+        const event = {
+            chapter_title: currentChapterTitle,
+            section_index: currentSectionIndex,
+            time_spent: Math.round((now - lastProgressAt) / 1000)
+        };
+        if (dwellSection) {
+            event.dwell_chapter_title = dwellSection.chapter_title;
+            event.dwell_section_index = dwellSection.section_index;
+        }
+        progressQueue.push(event);
+        dwellSection = { chapter_title: currentChapterTitle, section_index: currentSectionIndex };
+        lastProgressAt = now;
+    }
+
+    function flushProgress(useBeacon = false) {
+        if (progressQueue.length === 0) return;
+        const body = JSON.stringify({ events: progressQueue });
+        progressQueue = [];
+        const url = `${API_BASE_URL}/progress/save-batch`;
+        if (useBeacon && navigator.sendBeacon &&
+            navigator.sendBeacon(url, new Blob([body], { type: 'text/plain' }))) {
+            return;
+        }
+        fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body,
+            keepalive: true
+        }).catch(error => console.error('Progress save failed:', error));
+    }
+
+    setInterval(() => flushProgress(), PROGRESS_FLUSH_MS);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            // Close the current section's dwell sample; time while hidden isn't counted
+            if (dwellSection) queueProgress();
+            flushProgress(true);
+        } else {
+            lastProgressAt = Date.now();
+        }
+    });
+    window.addEventListener('pagehide', () => flushProgress(true));
+
     // --- Loading Screen Functions ---
     function showFullScreenLoader() {
         const loader = document.getElementById('full-screen-loader');
@@ -86,7 +141,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- Chat History Management ---
     function saveChatToHistory(view) {
         if (chatHistory[view]) {
-            chatHistory[view] = Array.from(chatMessages.children).map(row => ({
+            // The "load earlier" button loses its handler when saved as HTML
+            const rows = Array.from(chatMessages.children).filter(row => !row.classList.contains('load-earlier'));
+            chatHistory[view] = rows.map(row => ({
                 html: row.outerHTML,
                 sender: row.classList.contains('user-message-row') ? 'user' : 'bot',
                 type: row.querySelector('.notion-content') ? 'notion' : 
@@ -105,6 +162,52 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // --- Transcript Restore ---
+    // Earlier questions and answers are kept server-side, one page per bucket;
+    // the newest page is restored the first time a view is opened.
+    const restoredViews = new Set();
+
+    function buildTranscriptRow(message) {
+        const isUser = message.role === 'user';
+        const bubble = createMessageElement(isUser ? 'user' : 'bot', isUser ? 'default' : 'ai');
+        if (isUser) {
+            bubble.textContent = message.content;
+        } else {
+            bubble.insertAdjacentHTML('beforeend', marked.parse(message.content));
+        }
+        // createMessageElement appends at the bottom; the caller places the row
+        return bubble.parentElement;
+    }
+
+    async function restoreTranscript(view, before = null) {
+        const params = new URLSearchParams({ chapter: view === 'toc' ? '' : view });
+        if (before) params.set('before', before);
+        try {
+            const response = await fetch(`${API_BASE_URL}/chat/history?${params}`);
+            if (!response.ok) return;
+            const data = await response.json();
+            if (currentView !== view || data.messages.length === 0) return;
+
+            const earlier = document.createDocumentFragment();
+            if (data.before) {
+                const button = document.createElement('button');
+                button.classList.add('load-earlier');
+                button.textContent = 'Load earlier messages';
+                button.addEventListener('click', () => {
+                    button.remove();
+                    restoreTranscript(view, data.before);
+                });
+                earlier.appendChild(button);
+            }
+            data.messages.forEach(message => earlier.appendChild(buildTranscriptRow(message)));
+            const scrollFromBottom = chatWindow.scrollHeight - chatWindow.scrollTop;
+            chatMessages.prepend(earlier);
+            chatWindow.scrollTop = chatWindow.scrollHeight - scrollFromBottom;
+        } catch (error) {
+            console.error('Transcript restore failed:', error);
+        }
+    }
+
     function switchToView(newView, sectionTitle = '') {
         // Save current chat
         saveChatToHistory(currentView);
@@ -119,6 +222,10 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Load chat for new view
         loadChatFromHistory(newView);
+        if (!restoredViews.has(newView)) {
+            restoredViews.add(newView);
+            restoreTranscript(newView);
+        }
         
         // Update banner
         updateBanner(newView === 'toc' ? 'toc' : 'chapter', sectionTitle);
@@ -493,82 +600,116 @@ document.addEventListener('DOMContentLoaded', () => {
         showLoadingBar();
         try {
             const context = (botState === 'AWAITING_COURSE_START') ? tableOfContents : currentChapterContent;
-            const response = await fetch(`${API_BASE_URL}/ask-question-stream`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    question, 
-                    context,
-                    current_chapter_title: currentChapterTitle 
-                })
+            const requestBody = JSON.stringify({ 
+                question, 
+                context,
+                current_chapter_title: currentChapterTitle 
             });
             
-            if (!response.ok) {
-                hideLoadingBar();
-                throw new Error("AI server error");
-            }
-            
-            // Create AI response message bubble
-            const botMessageBubble = createMessageElement('bot', 'ai');
-            
-            // Read the streaming response
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
+            let botMessageBubble = null;
             let fullResponse = '';
             let hasStartedStreaming = false;
+            let lastEventId = null;
+            let resumeAttempts = 0;
             
             while (true) {
-                const { done, value } = await reader.read();
-                if (done) break;
-                
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n');
+                const headers = { 'Content-Type': 'application/json' };
+                if (lastEventId) {
+                    // Resume the buffered answer instead of asking again
+                    headers['Last-Event-ID'] = lastEventId;
+                }
                 
-                for (const line of lines) {
-                    if (line.startsWith('data: ')) {
-                        const data = line.slice(6);
-                        if (data === '[DONE]') {
-                            // Ensure loading bar is completely hidden
-                            forceHideLoadingBar();
-                            
-                            // *** UPDATED: Don't render quick actions if chapter is completed ***
-                            if (completedChapters.includes(currentChapterTitle)) {
-                                console.log('🚫 Chapter completed - not showing quick actions after AI response');
-                                return;
-                            }
-                            
-                            // Streaming complete - render quick actions only if chapter not completed
-                            if (botState === 'AWAITING_COURSE_START') {
-                                renderQuickActions(QUICK_ACTIONS.START);
-                            } else if (botState === 'AWAITING_NEXT_SECTION') {
-                                const currentSection = chapterSections[currentSectionIndex];
-                                if (currentSection) {
-                                    renderDynamicQuickActions(currentSection.content);
-                                } else {
-                                    renderQuickActions(['Move to next section']);
-                                }
-                            }
-                            return;
-                        }
+                let finished = false;
+                try {
+                    const response = await fetch(`${API_BASE_URL}/ask-question-stream`, {
+                        method: 'POST',
+                        headers,
+                        body: requestBody
+                    });
+                    
+                    if (!response.ok) {
+                        hideLoadingBar();
+                        throw new Error("AI server error");
+                    }
+                    
+                    // Create AI response message bubble
+                    if (!botMessageBubble) {
+                        botMessageBubble = createMessageElement('bot', 'ai');
+                    }
+                    
+                    // Read the streaming response
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let pendingText = '';
+                    
+                    while (!finished) {
+                        const { done, value } = await reader.read();
+                        if (done) break;
+                        
+                        // Keep any partial line until the rest of it arrives
+                        pendingText += decoder.decode(value, { stream: true });
+                        const lines = pendingText.split('\n');
+                        pendingText = lines.pop();
                         
-                        try {
-                            const parsed = JSON.parse(data);
-                            if (parsed.content) {
-                                // Hide loading bar on first content chunk
-                                if (!hasStartedStreaming) {
-                                    hideLoadingBar();
-                                    hasStartedStreaming = true;
+                        for (const line of lines) {
+                            if (line.startsWith('id: ')) {
+                                lastEventId = line.slice(4);
+                            } else if (line.startsWith('data: ')) {
+                                const data = line.slice(6);
+                                if (data === '[DONE]') {
+                                    finished = true;
+                                    break;
                                 }
                                 
-                                fullResponse += parsed.content;
-                                // Update the message bubble with streaming content
-                                botMessageBubble.innerHTML = marked.parse(fullResponse);
-                                chatWindow.scrollTop = chatWindow.scrollHeight;
+                                try {
+                                    const parsed = JSON.parse(data);
+                                    if (parsed.content) {
+                                        // Hide loading bar on first content chunk
+                                        if (!hasStartedStreaming) {
+                                            hideLoadingBar();
+                                            hasStartedStreaming = true;
+                                        }
+                                        
+                                        fullResponse += parsed.content;
+                                        // Update the message bubble with streaming content
+                                        botMessageBubble.innerHTML = marked.parse(fullResponse);
+                                        chatWindow.scrollTop = chatWindow.scrollHeight;
+                                    }
+                                } catch (e) {
+                                    // Ignore parsing errors for malformed events
+                                }
                             }
-                        } catch (e) {
-                            // Ignore parsing errors for incomplete chunks
                         }
                     }
+                } catch (streamError) {
+                    // Network drop mid-answer: retry with Last-Event-ID a few times
+                    if (!lastEventId || resumeAttempts >= 3) throw streamError;
+                }
+                
+                if (finished) break;
+                if (!lastEventId || resumeAttempts >= 3) throw new Error("Stream ended early");
+                resumeAttempts++;
+                await new Promise(resolve => setTimeout(resolve, 500 * resumeAttempts));
+            }
+            
+            // Ensure loading bar is completely hidden
+            forceHideLoadingBar();
+            
+            // *** UPDATED: Don't render quick actions if chapter is completed ***
+            if (completedChapters.includes(currentChapterTitle)) {
+                console.log('🚫 Chapter completed - not showing quick actions after AI response');
+                return;
+            }
+            
+            // Streaming complete - render quick actions only if chapter not completed
+            if (botState === 'AWAITING_COURSE_START') {
+                renderQuickActions(QUICK_ACTIONS.START);
+            } else if (botState === 'AWAITING_NEXT_SECTION') {
+                const currentSection = chapterSections[currentSectionIndex];
+                if (currentSection) {
+                    renderDynamicQuickActions(currentSection.content);
+                } else {
+                    renderQuickActions(['Move to next section']);
                 }
             }
         } catch (error) {
@@ -655,6 +796,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function displayCurrentSection() {
         if (currentSectionIndex < chapterSections.length) {
+            queueProgress();
             const section = chapterSections[currentSectionIndex];
             const sectionBubble = createMessageElement('bot', 'notion');
             if (section.content.includes('| ---')) {
@@ -846,6 +988,8 @@ document.addEventListener('DOMContentLoaded', () => {
             
             // Start in table of contents view
             updateBanner('toc');
+            restoredViews.add('toc');
+            restoreTranscript('toc');
             
             const tocBubble = createMessageElement('bot', 'notion');
             // Faster typing for table of contents (Notion content)
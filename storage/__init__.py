@@ -0,0 +1,38 @@
+# storage/__init__.py
+"""User and progress storage behind one repository interface.
+
+STORAGE_BACKEND picks the implementation: 'mongo' (production, through the
+shared client in db_connection.py) or 'sqlite' (an embedded database file with
+the same indexes, for offline development and load tests).
+"""
+import threading
+import config
+from storage.base import Repository
+
+_repository = None
+_lock = threading.Lock()
+
+
+def _create(backend):
+    if backend == 'mongo':
+        from storage.mongo_repository import MongoRepository
+        return MongoRepository()
+    if backend == 'sqlite':
+        from storage.sqlite_repository import SqliteRepository
+        return SqliteRepository(config.SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'mongo' or 'sqlite')")
+
+
+def get_repository():
+    """The process-wide repository for the configured backend"""
+    global _repository
+    if _repository is None:
+        with _lock:
+            if _repository is None:
+                _repository = _create(config.STORAGE_BACKEND)
+    return _repository
+
+
+def uses_mongo():
+    """True when MongoDB is the storage backend (analytics and transcripts need it)"""
+    return config.STORAGE_BACKEND == 'mongo'
@@ -0,0 +1,79 @@
+# storage/base.py
+from abc import ABC, abstractmethod
+
+
+class Repository(ABC):
+    """Storage operations behind services/user_service.py.
+
+    Users are dicts keyed like the Mongo documents ('_id', 'email', ...);
+    `fields` limits which ones are loaded. Batch writes take lists of plain
+    dicts and return the set of indexes that failed, so callers can retry
+    just those. Datetimes are naive UTC.
+    """
+
+    name = None
+
+    # --- Users ---
+
+    @abstractmethod
+    def get_user(self, user_id, fields=None):
+        """One user, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_login(self, email, on_insert, now, fields):
+        """Stamp last_login=now, creating the user from `on_insert` if needed; returns `fields` of the user"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_users(self, search, after, limit, fields):
+        """Up to `limit` users in _id order after the `after` cursor, optionally
+        filtered by a lower-cased email or name prefix"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_users(self):
+        """Cheap, possibly approximate, number of users"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_users(self, since, fields, batch_size):
+        """Every user (active since `since` when given), read in batches"""
+        raise NotImplementedError
+
+    # --- Progress ---
+
+    @abstractmethod
+    def chapter_progress(self, user_id):
+        """A user's chapter progress: chapter_id, section_index, completed, last_updated, time_spent"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def progress_for_users(self, user_ids):
+        """Chapter progress of several users, each with user_id and completed_at"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def completed_chapters_by_user(self, user_ids):
+        """{user_id: [completed chapter titles]}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_chapter_progress(self, updates):
+        """Upsert {user_id, chapter_id, section_index, time_spent, at}: set the position, add the time"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_activity(self, updates):
+        """Apply {user_id, time_spent, at} to users: raise last_activity, add total_time_spent"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_dwell(self, appends):
+        """Append {user_id, chapter_id, hour, samples} to that hour's open dwell bucket"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete_chapter(self, user_id, chapter_id, at):
+        """Mark a chapter completed (creating its progress if needed) and raise last_activity"""
+        raise NotImplementedError
@@ -0,0 +1,156 @@
+# storage/mongo_repository.py
+import re
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.write_concern import WriteConcern
+import config
+from db_connection import get_collection
+from storage.base import Repository
+
+# Chapter progress lives in its own collection, one document per
+# (user_id, chapter_id) where chapter_id is the chapter title, so user
+# documents stay small.
+CHAPTER_PROGRESS_PROJECTION = {
+    '_id': 0, 'chapter_id': 1, 'section_index': 1, 'completed': 1, 'last_updated': 1, 'time_spent': 1
+}
+EXPORT_PROGRESS_PROJECTION = dict(CHAPTER_PROGRESS_PROJECTION, user_id=1, completed_at=1)
+
+
+def _projection(fields):
+    return {field: 1 for field in fields} if fields else None
+
+
+class MongoRepository(Repository):
+    """Users, progress and dwell buckets in MongoDB (indexes in db_indexes.py)"""
+
+    name = 'mongo'
+
+    def __init__(self):
+        # Shared, lazily connected handles (see db_connection.py)
+        self.users = get_collection('users')
+        self.progress = get_collection('progress')
+        # Section dwell samples, bucketed per (user_id, chapter_id, hour)
+        self.dwell = get_collection('dwell_buckets')
+
+    def _durable(self, collection):
+        """Collection with the configured write concern for progress writes"""
+        return collection.with_options(write_concern=WriteConcern(w=config.PROGRESS_WRITE_CONCERN))
+
+    def _bulk_write(self, collection, operations):
+        """Unordered bulk write; returns the indexes of the operations that failed"""
+        if not operations:
+            return set()
+        try:
+            self._durable(collection).bulk_write(operations, ordered=False)
+            return set()
+        except BulkWriteError as e:
+            # Unordered: everything except the reported failures was applied
+            return {error['index'] for error in e.details.get('writeErrors', [])}
+        except Exception as e:
+            print(f"Progress bulk write to {collection.name} failed: {e}")
+            return set(range(len(operations)))
+
+    # --- Users ---
+
+    def get_user(self, user_id, fields=None):
+        return self.users.find_one({'_id': ObjectId(user_id)}, _projection(fields))
+
+    def upsert_login(self, email, on_insert, now, fields):
+        update = {'$set': {'last_login': now}, '$setOnInsert': on_insert}
+        try:
+            return self.users.find_one_and_update(
+                {'email': email}, update, projection=_projection(fields),
+                upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # Two first logins raced; the other one inserted, so this is now an update
+            return self.users.find_one_and_update(
+                {'email': email}, update, projection=_projection(fields),
+                return_document=ReturnDocument.AFTER)
+
+    def list_users(self, search, after, limit, fields):
+        query = {}
+        if search:
+            # Anchored prefixes can use the email and name_lower indexes
+            prefix = '^' + re.escape(search)
+            query['$or'] = [{'email': {'$regex': prefix}}, {'name_lower': {'$regex': prefix}}]
+        if after:
+            query['_id'] = {'$gt': ObjectId(after)}
+        return list(self.users.find(query, _projection(fields)).sort('_id', 1).limit(limit))
+
+    def count_users(self):
+        # From collection metadata, no scan
+        return self.users.estimated_document_count()
+
+    def iter_users(self, since, fields, batch_size):
+        query = {}
+        if since:
+            query['last_activity'] = {'$gte': since}
+        cursor = self.users.find(query, _projection(fields), batch_size=batch_size)
+        if since:
+            cursor = cursor.sort('last_activity', 1)
+        return iter(cursor)
+
+    # --- Progress ---
+
+    def chapter_progress(self, user_id):
+        return list(self.progress.find({'user_id': ObjectId(user_id)}, CHAPTER_PROGRESS_PROJECTION))
+
+    def progress_for_users(self, user_ids):
+        return list(self.progress.find({'user_id': {'$in': list(user_ids)}}, EXPORT_PROGRESS_PROJECTION))
+
+    def completed_chapters_by_user(self, user_ids):
+        if not user_ids:
+            return {}
+        completed = {}
+        for row in self.progress.aggregate([
+            {'$match': {'user_id': {'$in': list(user_ids)}, 'completed': True}},
+            {'$group': {'_id': '$user_id', 'chapters': {'$push': '$chapter_id'}}}
+        ]):
+            completed[row['_id']] = row['chapters']
+        return completed
+
+    def write_chapter_progress(self, updates):
+        return self._bulk_write(self.progress, [
+            UpdateOne(
+                {'user_id': ObjectId(update['user_id']), 'chapter_id': update['chapter_id']},
+                {'$set': {'section_index': update['section_index'], 'last_updated': update['at']},
+                 '$inc': {'time_spent': update['time_spent']}},
+                upsert=True)
+            for update in updates
+        ])
+
+    def write_activity(self, updates):
+        # Fixed-size update to the user document itself
+        return self._bulk_write(self.users, [
+            UpdateOne(
+                {'_id': ObjectId(update['user_id'])},
+                {'$max': {'last_activity': update['at']}, '$inc': {'total_time_spent': update['time_spent']}})
+            for update in updates
+        ])
+
+    def append_dwell(self, appends):
+        """A bucket holds at most DWELL_BUCKET_MAX_SAMPLES samples; a full bucket
+        no longer matches the filter, so the upsert starts a new one"""
+        return self._bulk_write(self.dwell, [
+            UpdateOne(
+                {'user_id': ObjectId(append['user_id']), 'chapter_id': append['chapter_id'],
+                 'hour': append['hour'],
+                 'count': {'$lte': config.DWELL_BUCKET_MAX_SAMPLES - len(append['samples'])}},
+                {'$push': {'samples': {'$each': append['samples']}},
+                 '$inc': {'count': len(append['samples']),
+                          'total_seconds': sum(sample['d'] for sample in append['samples'])}},
+                upsert=True)
+            for append in appends
+        ])
+
+    def complete_chapter(self, user_id, chapter_id, at):
+        self.progress.update_one(
+            {'user_id': ObjectId(user_id), 'chapter_id': chapter_id},
+            {
+                '$set': {'completed': True, 'completed_at': at, 'last_updated': at},
+                '$setOnInsert': {'section_index': 0, 'time_spent': 0}
+            },
+            upsert=True
+        )
+        self.users.update_one({'_id': ObjectId(user_id)}, {'$max': {'last_activity': at}})
@@ -0,0 +1,285 @@
+# storage/sqlite_repository.py
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from bson import ObjectId
+import config
+from storage.base import Repository
+
+# Same shape and indexes as the Mongo collections (see db_indexes.py), so
+# offline load tests pay for real, indexed writes
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT,
+    name_lower TEXT,
+    google_id TEXT UNIQUE,
+    picture TEXT,
+    created_at TEXT,
+    last_login TEXT,
+    last_activity TEXT,
+    total_time_spent INTEGER NOT NULL DEFAULT 0,
+    bookmarks TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS users_last_activity ON users (last_activity DESC);
+CREATE INDEX IF NOT EXISTS users_name_lower ON users (name_lower);
+
+CREATE TABLE IF NOT EXISTS progress (
+    user_id TEXT NOT NULL,
+    chapter_id TEXT NOT NULL,
+    section_index INTEGER NOT NULL DEFAULT 0,
+    time_spent INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (user_id, chapter_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS progress_user_completed ON progress (user_id, completed, chapter_id);
+CREATE INDEX IF NOT EXISTS progress_chapter_completed ON progress (chapter_id, completed);
+CREATE INDEX IF NOT EXISTS progress_last_updated ON progress (last_updated DESC);
+
+CREATE TABLE IF NOT EXISTS dwell_buckets (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    chapter_id TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    total_seconds INTEGER NOT NULL DEFAULT 0,
+    samples TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS dwell_user_chapter_hour ON dwell_buckets (user_id, chapter_id, hour DESC);
+CREATE INDEX IF NOT EXISTS dwell_hour ON dwell_buckets (hour DESC);
+"""
+
+USER_COLUMNS = ('email', 'name', 'name_lower', 'google_id', 'picture', 'created_at', 'last_login',
+                'last_activity', 'total_time_spent', 'bookmarks')
+DATETIME_COLUMNS = ('created_at', 'last_login', 'last_activity', 'completed_at', 'last_updated')
+PROGRESS_COLUMNS = 'chapter_id, section_index, completed, last_updated, time_spent'
+
+# Well under SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+
+def _to_db(value):
+    # Fixed width, so stored datetimes compare correctly as text
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f') if isinstance(value, datetime) else value
+
+
+def _from_row(row):
+    doc = dict(row)
+    for column in DATETIME_COLUMNS:
+        if doc.get(column):
+            doc[column] = datetime.fromisoformat(doc[column])
+    if 'id' in doc:
+        doc['_id'] = doc.pop('id')
+    if 'completed' in doc:
+        doc['completed'] = bool(doc['completed'])
+    if 'bookmarks' in doc:
+        doc['bookmarks'] = json.loads(doc['bookmarks'])
+    return doc
+
+
+def _user_columns(fields):
+    """SELECT list for a projection; fields SQLite doesn't store (legacy embedded progress) are skipped"""
+    if not fields:
+        return ', '.join(('id',) + USER_COLUMNS)
+    return ', '.join(['id'] + [field for field in fields if field in USER_COLUMNS])
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), IN_CHUNK):
+        yield values[start:start + IN_CHUNK]
+
+
+class SqliteRepository(Repository):
+    """Users, progress and dwell buckets in an embedded SQLite file.
+
+    One connection per thread (and per process after fork), WAL journaling so
+    readers don't block the writer, and one transaction per batch write.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=config.SQLITE_BUSY_TIMEOUT_SECONDS,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}')
+            local.conn, local.pid = conn, os.getpid()
+            self._ensure_schema(conn)
+        return local.conn
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+                print(f"SQLite storage ready at {self.path}")
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _batch(self, label, rows, write):
+        """Run write(conn, row) for every row in one transaction; all-or-nothing"""
+        if not rows:
+            return set()
+        try:
+            with self._transaction() as conn:
+                for row in rows:
+                    write(conn, row)
+            return set()
+        except sqlite3.Error as e:
+            print(f"SQLite {label} batch failed: {e}")
+            return set(range(len(rows)))
+
+    # --- Users ---
+
+    def get_user(self, user_id, fields=None):
+        row = self._conn().execute(
+            f"SELECT {_user_columns(fields)} FROM users WHERE id = ?", (str(user_id),)).fetchone()
+        return _from_row(row) if row else None
+
+    def upsert_login(self, email, on_insert, now, fields):
+        values = dict(on_insert, bookmarks=json.dumps(on_insert.get('bookmarks', [])))
+        columns = [column for column in USER_COLUMNS if column in values]
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO users (id, email, last_login, {', '.join(columns)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' for _ in columns)}) "
+                "ON CONFLICT (email) DO UPDATE SET last_login = excluded.last_login",
+                [str(ObjectId()), email, _to_db(now)] + [_to_db(values[column]) for column in columns])
+            row = conn.execute(f"SELECT {_user_columns(fields)} FROM users WHERE email = ?", (email,)).fetchone()
+        return _from_row(row)
+
+    def list_users(self, search, after, limit, fields):
+        clauses, params = [], []
+        if search:
+            # Prefix ranges use the unique email index and users_name_lower
+            clauses.append("((email >= ? AND email < ?) OR (name_lower >= ? AND name_lower < ?))")
+            params += [search, search + '\uffff'] * 2
+        if after:
+            clauses.append("id > ?")
+            params.append(str(after))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._conn().execute(
+            f"SELECT {_user_columns(fields)} FROM users {where} ORDER BY id LIMIT ?", params + [limit])
+        return [_from_row(row) for row in rows]
+
+    def count_users(self):
+        return self._conn().execute("SELECT count(*) FROM users").fetchone()[0]
+
+    def iter_users(self, since, fields, batch_size):
+        if since:
+            cursor = self._conn().execute(
+                f"SELECT {_user_columns(fields)} FROM users WHERE last_activity >= ? ORDER BY last_activity",
+                (_to_db(since),))
+        else:
+            cursor = self._conn().execute(f"SELECT {_user_columns(fields)} FROM users")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield _from_row(row)
+
+    # --- Progress ---
+
+    def chapter_progress(self, user_id):
+        rows = self._conn().execute(
+            f"SELECT {PROGRESS_COLUMNS} FROM progress WHERE user_id = ?", (str(user_id),))
+        return [_from_row(row) for row in rows]
+
+    def progress_for_users(self, user_ids):
+        docs = []
+        for chunk in _chunks(str(user_id) for user_id in user_ids):
+            rows = self._conn().execute(
+                f"SELECT user_id, completed_at, {PROGRESS_COLUMNS} FROM progress "
+                f"WHERE user_id IN ({', '.join('?' for _ in chunk)})", chunk)
+            docs.extend(_from_row(row) for row in rows)
+        return docs
+
+    def completed_chapters_by_user(self, user_ids):
+        completed = {}
+        for chunk in _chunks(str(user_id) for user_id in user_ids):
+            rows = self._conn().execute(
+                f"SELECT user_id, chapter_id FROM progress "
+                f"WHERE user_id IN ({', '.join('?' for _ in chunk)}) AND completed = 1", chunk)
+            for user_id, chapter_id in rows:
+                completed.setdefault(user_id, []).append(chapter_id)
+        return completed
+
+    def write_chapter_progress(self, updates):
+        def write(conn, update):
+            conn.execute(
+                "INSERT INTO progress (user_id, chapter_id, section_index, time_spent, last_updated) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (user_id, chapter_id) DO UPDATE SET "
+                "section_index = excluded.section_index, "
+                "time_spent = time_spent + excluded.time_spent, "
+                "last_updated = excluded.last_updated",
+                (str(update['user_id']), update['chapter_id'], update['section_index'],
+                 update['time_spent'], _to_db(update['at'])))
+        return self._batch('progress', updates, write)
+
+    def write_activity(self, updates):
+        def write(conn, update):
+            conn.execute(
+                "UPDATE users SET last_activity = max(coalesce(last_activity, ''), ?), "
+                "total_time_spent = total_time_spent + ? WHERE id = ?",
+                (_to_db(update['at']), update['time_spent'], str(update['user_id'])))
+        return self._batch('activity', updates, write)
+
+    def append_dwell(self, appends):
+        def write(conn, append):
+            key = (str(append['user_id']), append['chapter_id'], _to_db(append['hour']))
+            samples = append['samples']
+            bucket = conn.execute(
+                "SELECT id, samples FROM dwell_buckets WHERE user_id = ? AND chapter_id = ? AND hour = ? "
+                "AND count <= ? ORDER BY id DESC LIMIT 1",
+                key + (config.DWELL_BUCKET_MAX_SAMPLES - len(samples),)).fetchone()
+            total = sum(sample['d'] for sample in samples)
+            if bucket:
+                conn.execute(
+                    "UPDATE dwell_buckets SET samples = ?, count = count + ?, total_seconds = total_seconds + ? "
+                    "WHERE id = ?",
+                    (json.dumps(json.loads(bucket['samples']) + samples), len(samples), total, bucket['id']))
+            else:
+                conn.execute(
+                    "INSERT INTO dwell_buckets (user_id, chapter_id, hour, count, total_seconds, samples) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (len(samples), total, json.dumps(samples)))
+        return self._batch('dwell', appends, write)
+
+    def complete_chapter(self, user_id, chapter_id, at):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO progress (user_id, chapter_id, completed, completed_at, last_updated) "
+                "VALUES (?, ?, 1, ?, ?) ON CONFLICT (user_id, chapter_id) DO UPDATE SET "
+                "completed = 1, completed_at = excluded.completed_at, last_updated = excluded.last_updated",
+                (str(user_id), chapter_id, _to_db(at), _to_db(at)))
+            conn.execute(
+                "UPDATE users SET last_activity = max(coalesce(last_activity, ''), ?) WHERE id = ?",
+                (_to_db(at), str(user_id)))
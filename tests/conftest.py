@@ -0,0 +1,68 @@
+# tests/conftest.py
+"""Shared test setup: offline backends only (SQLite storage, memory cache, the
+local OpenAI stand-in), configured before any app module reads config.py."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='course-tests-'), 'storage.db')
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ['ANALYTICS_ROLLUP_ENABLED'] = 'false'
+os.environ['AI_HEDGE_ENABLED'] = 'false'
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+# The app is imported, not served: no flushers, schedulers or warm-up calls
+os.environ['DEFER_BACKGROUND_START'] = 'true'
+
+
+@pytest.fixture(scope='session')
+def standin():
+    """The local OpenAI stand-in on a random port, with the app's openai client pointed at it"""
+    import openai
+    import openai_standin
+    server, base_url = openai_standin.start_in_background(
+        settings=openai_standin.StandinSettings(ttft_ms=0, inter_token_ms=0))
+    previous = openai.api_base, openai.api_key
+    openai.api_base, openai.api_key = base_url, 'test'
+    yield base_url
+    openai.api_base, openai.api_key = previous
+    server.shutdown()
+
+
+@pytest.fixture
+def client():
+    """Flask test client for the whole app"""
+    import app
+    app.app.config['TESTING'] = True
+    return app.app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Put a user in the session the way the Google callback does"""
+    def login(user):
+        with client.session_transaction() as session:
+            session['user'] = {'id': str(user['_id']), 'email': user['email'], 'name': user.get('name'),
+                               'picture': None, 'is_authenticated': True}
+    return login
+
+
+@pytest.fixture
+def offline_tokenizer(monkeypatch):
+    """tiktoken as it behaves without network access or a TIKTOKEN_CACHE_DIR copy"""
+    from services import prompt_builder
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("openaipublic.blob.core.windows.net unreachable")
+
+    if prompt_builder.tiktoken is not None:
+        monkeypatch.setattr(prompt_builder.tiktoken, 'encoding_for_model', unavailable)
+        monkeypatch.setattr(prompt_builder.tiktoken, 'get_encoding', unavailable)
+    prompt_builder._encoding.cache_clear()
+    yield
+    prompt_builder._encoding.cache_clear()
@@ -0,0 +1,57 @@
+# tests/test_admin_routes.py
+import pytest
+
+import config
+from services import analytics_service
+
+LEARNER = {'_id': 'u-learner', 'email': 'learner@hy.ly'}
+ADMIN = {'_id': 'u-admin', 'email': 'Admin@hy.ly'}
+
+
+@pytest.fixture(autouse=True)
+def admins(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_EMAILS', {'admin@hy.ly'})
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(analytics_service, 'refresh_rollups', lambda: calls.append(1) or {'chapter_funnel': 3})
+    return calls
+
+
+def test_analytics_refresh_requires_a_login(client, refreshes):
+    response = client.post('/admin/analytics/refresh')
+    assert response.status_code == 302
+    assert refreshes == []
+
+
+def test_analytics_refresh_is_refused_for_learners(client, login, refreshes):
+    login(LEARNER)
+    response = client.post('/admin/analytics/refresh')
+    assert response.status_code == 403
+    assert refreshes == []
+
+
+def test_admins_can_refresh_analytics(client, login, refreshes):
+    login(ADMIN)
+    response = client.post('/admin/analytics/refresh')
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'refreshed': {'chapter_funnel': 3}}
+    assert refreshes == [1]
+
+
+def test_progress_export_is_refused_for_learners(client, login):
+    login(LEARNER)
+    assert client.get('/admin/export/progress').status_code == 403
+
+
+def test_admins_can_export_progress(client, login, monkeypatch):
+    from services import user_service
+    rows = [{'user_id': 'u-learner', 'email': 'learner@hy.ly', 'chapter_id': 'Chapter 1: Intro'}]
+    monkeypatch.setattr(user_service, 'iter_progress_export', lambda since, batch_size: iter(rows))
+    login(ADMIN)
+    response = client.get('/admin/export/progress?format=csv')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="progress-')
+    assert 'learner@hy.ly' in response.get_data(as_text=True)
@@ -0,0 +1,42 @@
+# tests/test_ai_eval.py
+import argparse
+
+import openai
+import pytest
+
+import ai_eval
+
+
+@pytest.fixture
+def standin_run(monkeypatch, tmp_path):
+    """Run the harness the way `python ai_eval.py --standin` does, restoring the openai client after"""
+    monkeypatch.delenv('OPENAI_API_BASE', raising=False)
+    monkeypatch.setattr(openai, 'api_base', openai.api_base)
+    monkeypatch.setattr(openai, 'api_key', openai.api_key)
+    args = argparse.Namespace(
+        golden=ai_eval.DEFAULT_GOLDEN_SET, label='smoke', variant=None, standin=True, fixture=None,
+        api_base=None, ttft_ms=0, inter_token_ms=0, record=str(tmp_path / 'fixture.json'),
+        out=str(tmp_path / 'report.json'), compare=None)
+    yield lambda: ai_eval.run(args)
+    monkeypatch.delenv('OPENAI_API_BASE', raising=False)
+    from services import openai_transport
+    openai_transport.reset_session()
+
+
+def test_standin_baseline_passes_the_quality_checks(standin_run):
+    summary = standin_run()['summary']
+
+    assert summary['classify']['accuracy'] == 1.0
+    assert summary['quick_actions']['valid_rate'] == 1.0
+    assert summary['quick_actions']['fallback_rate'] == 0.0
+    assert summary['ask']['within_two_sentences_rate'] == 1.0
+    assert summary['ask']['grounding_mean'] >= 0.5
+    for endpoint in ('classify', 'quick_actions', 'ask'):
+        assert summary[endpoint]['cases'] > 0
+        assert summary[endpoint]['latency_p95_ms'] >= summary[endpoint]['latency_p50_ms']
+
+
+def test_latency_percentiles_use_the_router_helper():
+    summary = ai_eval._summarize([10.0, 20.0, 30.0, 40.0], [])
+    assert (summary['latency_p50_ms'], summary['latency_p95_ms']) == (20.0, 40.0)
+    assert ai_eval._summarize([], [])['latency_p50_ms'] is None
@@ -0,0 +1,50 @@
+# tests/test_ai_routes.py
+import pytest
+
+import config
+from services import ai_quota, openai_transport
+from services.openai_transport import ConcurrencyGate
+
+USER = {'_id': 'u-ada', 'email': 'ada@hy.ly'}
+ASK = {'question': 'What is a cap rate used for?',
+       'context': 'Cap rate is net operating income divided by the purchase price of a property.',
+       'current_chapter_title': 'Chapter 2: Valuation'}
+
+
+@pytest.fixture(autouse=True)
+def fresh_quota(monkeypatch):
+    monkeypatch.setattr(ai_quota, '_buckets', ai_quota.OrderedDict())
+
+
+@pytest.fixture
+def saturated_gate(monkeypatch):
+    """One slot, already taken, and no room to wait"""
+    gate = ConcurrencyGate(1, 0, 0.01)
+    gate.acquire(flow='someone-else')
+    monkeypatch.setattr(openai_transport, 'gate', gate)
+    return gate
+
+
+def test_full_upstream_queue_is_503_with_retry_after(client, login, standin, saturated_gate):
+    login(USER)
+    response = client.post('/ai/ask', json=ASK)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(config.OPENAI_RETRY_AFTER_SECONDS)
+
+    response = client.post('/ai/ask-stream', json=ASK)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+
+def test_quota_is_429_with_retry_after_once_the_burst_is_spent(client, login, standin, monkeypatch):
+    monkeypatch.setitem(config.AI_ENDPOINT_CLASSES, 'tutor',
+                        dict(config.AI_ENDPOINT_CLASSES['tutor'], burst=1, per_minute=1))
+    login(USER)
+    first = client.post('/ai/ask', json=ASK)
+    assert first.status_code == 200
+    assert first.get_json()['answer'].startswith('Great question!')
+
+    second = client.post('/ai/ask', json=ASK)
+    assert second.status_code == 429
+    assert int(second.headers['Retry-After']) >= 1
+    assert 'too quickly' in second.get_json()['error']
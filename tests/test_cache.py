@@ -0,0 +1,158 @@
+# tests/test_cache.py
+import os
+import threading
+import time
+
+import pytest
+
+import config
+from cache import memory_cache
+from cache.base import Cache
+from cache.disk_cache import DiskCache
+from cache.memory_cache import MemoryCache
+
+
+@pytest.fixture
+def fast_leases(monkeypatch):
+    monkeypatch.setattr(config, 'CACHE_LEASE_SECONDS', 30)
+    monkeypatch.setattr(config, 'CACHE_LEASE_WAIT_SECONDS', 2)
+    monkeypatch.setattr(config, 'CACHE_POLL_SECONDS', 0.01)
+
+
+@pytest.fixture
+def disk(tmp_path, fast_leases):
+    return DiskCache(str(tmp_path / 'cache'), local=MemoryCache(16))
+
+
+def test_backends_must_implement_storage():
+    class Partial(Cache):
+        def _read(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(2)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 60)
+    assert cache.get('a') == 1
+    cache.set('c', 3, 60)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_cache.time, 'monotonic', lambda: now[0])
+    cache = MemoryCache(8)
+    cache.set('page', {'title': 'Intro'}, 10)
+    assert cache.get('page') == {'title': 'Intro'}
+    now[0] += 11
+    assert cache.get('page') is None
+
+
+def test_none_results_are_not_cached():
+    cache = MemoryCache(8)
+    calls = []
+    assert cache.get_or_compute('missing', lambda: calls.append(1), 60) is None
+    assert cache.get_or_compute('missing', lambda: calls.append(1), 60) is None
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_compute_once():
+    cache = MemoryCache(8)
+    calls = []
+    started = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'course map'
+
+    def worker(results):
+        started.wait()
+        results.append(cache.get_or_compute('course_map', compute, 60))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['course map'] * 8
+    assert len(calls) == 1
+
+
+def test_disk_lease_is_exclusive_until_released(disk):
+    key = disk._key('page:p1')
+    assert disk._acquire_lease(key, 30) is True
+    assert disk._acquire_lease(key, 30) is False
+    disk._release_lease(key)
+    assert disk._acquire_lease(key, 30) is True
+
+
+def test_disk_lease_left_by_a_dead_holder_is_taken_over(disk):
+    key = disk._key('page:p1')
+    assert disk._acquire_lease(key, 30) is True
+    stale = time.time() - 60
+    os.utime(disk._path(key, '.lock'), (stale, stale))
+    assert disk._acquire_lease(key, 30) is True
+
+
+def test_waits_for_the_lease_holder_instead_of_computing(disk):
+    key = disk._key('page:p1')
+    assert disk._acquire_lease(key, 30) is True
+    # Another process holds the lease and stores the value a moment later
+    threading.Timer(0.1, lambda: DiskCache(disk.directory).set('page:p1', 'rendered', 60)).start()
+
+    calls = []
+    value = disk.get_or_compute('page:p1', lambda: calls.append(1) or 'recomputed', 60)
+    assert value == 'rendered'
+    assert calls == []
+    assert disk.counts['lease_waits'] == 1
+
+
+def test_computes_when_the_lease_holder_never_finishes(disk, monkeypatch):
+    monkeypatch.setattr(config, 'CACHE_LEASE_WAIT_SECONDS', 0.05)
+    assert disk._acquire_lease(disk._key('page:p1'), 30) is True
+    assert disk.get_or_compute('page:p1', lambda: 'recomputed', 60) == 'recomputed'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_processes_sharing_a_directory_compute_once(disk):
+    marker = os.path.join(disk.directory, 'computes.log')
+
+    def compute():
+        with open(marker, 'a') as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.2)
+        return 'course map'
+
+    pids = []
+    for _ in range(4):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                child = DiskCache(disk.directory)
+                status = 0 if child.get_or_compute('course_map', compute, 60) == 'course map' else 1
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        pids.append(pid)
+
+    assert all(os.waitpid(pid, 0)[1] == 0 for pid in pids)
+    with open(marker) as f:
+        assert len(f.read().split()) == 1
+
+
+def test_prune_removes_expired_entries(disk):
+    disk.set('fresh', 1, 60)
+    disk.set('stale', 2, 60)
+    disk._write(disk._key('stale'), '2', -1)
+    assert disk.prune() == 1
+    assert disk.get('fresh') == 1
+    assert disk._read(disk._key('stale')) is None
@@ -0,0 +1,87 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+from services import circuit_breaker
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test', failure_threshold=3, open_seconds=30)
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_open_circuit_fails_fast(breaker, clock):
+    _open(breaker)
+    clock[0] += 10
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_in == pytest.approx(20)
+
+
+def test_half_open_lets_one_probe_through(breaker, clock):
+    _open(breaker)
+    clock[0] += 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes(breaker, clock):
+    _open(breaker)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_for_another_period(breaker, clock):
+    _open(breaker)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock[0] += 1
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_neutral_outcome_frees_the_probe_slot(breaker, clock):
+    _open(breaker)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_neutral()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,99 @@
+# tests/test_meta_answers.py
+import pytest
+
+from services import meta_answers, notion_service
+
+COURSE_MAP = {
+    "Table of contents": "toc",
+    "Chapter 1: Introduction": "p1",
+    "Chapter 2: Valuation": "p2",
+    "Chapter 3: Development": "p3",
+}
+# 600 words -> 3 minutes at the default 200 words per minute
+PAGES = {"p1": "word " * 200, "p2": "word " * 400, "p3": "word " * 600}
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("How long will this chapter take?", 'chapter_time'),
+    ("how long is this chapter", 'chapter_time'),
+    ("How long does it take to read this chapter?", 'chapter_time'),
+    ("How long will it take me to finish the course?", 'chapter_time'),
+    ("How much time does this chapter take to complete?", 'chapter_time'),
+    ("How long does it take to complete chapter 3?", 'chapter_time'),
+    ("How long are the chapters?", 'chapter_time'),
+    ("How long will it take to read?", 'chapter_time'),
+    ("What's the reading time?", 'chapter_time'),
+    ("How many chapters are there?", 'chapter_count'),
+    ("how many chapters does this course have?", 'chapter_count'),
+    ("How many chapters are in the course?", 'chapter_count'),
+    ("How many chapters in total", 'chapter_count'),
+    ("How many chapters do I have left?", 'chapters_left'),
+    ("how many more chapters?", 'chapters_left'),
+    ("Which chapters are remaining?", 'chapters_left'),
+    ("What have I completed?", 'completed'),
+    ("Which chapters have I finished?", 'completed'),
+])
+def test_course_questions_are_meta(question, intent):
+    assert meta_answers.detect_meta_intent(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "How long does it take to lease up a property?",
+    "How long will it take to stabilize occupancy after a renovation?",
+    "How much time does it take to close a deal?",
+    "how long do I have to finish the due diligence period?",
+    "How long does it take to read a rent roll?",
+    "How long is the lease-up period in the course example?",
+    "How long does it take to finish the lease-up phase?",
+    "How many chapters did the author write about cap rates?",
+    "How many chapters are there about cap rates?",
+    "How many chapters cover more advanced topics?",
+    "What is cap rate?",
+    "",
+])
+def test_content_questions_go_to_the_tutor(question):
+    assert meta_answers.detect_meta_intent(question) is None
+
+
+@pytest.fixture
+def course(monkeypatch):
+    rendered = []
+
+    def render_page(page_id):
+        rendered.append(page_id)
+        return PAGES[page_id]
+
+    monkeypatch.setattr(notion_service, 'build_course_map', lambda *args, **kwargs: COURSE_MAP)
+    monkeypatch.setattr(notion_service, 'render_page', render_page)
+    monkeypatch.setattr(notion_service, 'chapter_word_counts', {})
+    return rendered
+
+
+def test_chapter_time_uses_the_rendered_chapter_not_the_request(course):
+    answer = meta_answers.answer_meta_question("How long will this chapter take?", "Chapter 3: Development")
+    assert "**Chapter 3: Development** is about 600 words" in answer
+    assert "3 minutes" in answer
+    # Cached word count afterwards
+    meta_answers.answer_meta_question("How long is this chapter?", "Chapter 3: Development")
+    assert course == ["p3"]
+
+
+def test_chapter_time_from_the_table_of_contents_estimates_the_first_chapter(course):
+    answer = meta_answers.answer_meta_question("How long will this chapter take?", "")
+    assert "**Chapter 1: Introduction** is about 200 words" in answer
+    assert "1 minute " in answer
+
+
+def test_unknown_chapter_falls_back_to_the_llm(course):
+    assert meta_answers.answer_meta_question("How long is this chapter?", "Chapter 9: Missing") is None
+
+
+def test_content_question_is_not_answered_locally(course):
+    assert meta_answers.answer_meta_question(
+        "How long does it take to lease up a property?", "Chapter 3: Development") is None
+    assert course == []
+
+
+def test_chapter_count(course):
+    answer = meta_answers.answer_meta_question("How many chapters are there?")
+    assert answer.startswith("The course has 3 chapters")
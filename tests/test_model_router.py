@@ -0,0 +1,116 @@
+# tests/test_model_router.py
+import openai
+import pytest
+
+import config
+from services import model_router
+from services.circuit_breaker import openai_breaker
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture(autouse=True)
+def fresh_router():
+    model_router._stats.clear()
+    model_router._degraded_until.clear()
+    openai_breaker.record_success()
+    yield
+    model_router._stats.clear()
+    model_router._degraded_until.clear()
+    openai_breaker.record_success()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock for the router, advanced by the fake upstream"""
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_route_uses_the_primary_model_by_default():
+    chosen = model_router.route('tutor')
+    assert chosen.model == config.AI_MODEL_ROUTES['tutor']['model']
+    assert chosen.fallback_model == config.AI_FALLBACK_MODEL
+    assert chosen.reason is None
+
+
+def test_slo_breach_routes_to_the_fallback():
+    settings = config.AI_MODEL_ROUTES['tutor']
+    for _ in range(model_router.MIN_SAMPLES_FOR_SLO):
+        model_router.record('tutor', settings['model'], settings['slo_p95_ms'] * 2)
+
+    chosen = model_router.route('tutor')
+    assert chosen.model == config.AI_FALLBACK_MODEL
+    assert chosen.reason == 'slo_breach'
+    # Still degraded for the cooldown, even though the window was cleared
+    assert model_router.route('tutor').reason == 'slo_breach'
+
+
+def test_too_few_samples_never_breach():
+    settings = config.AI_MODEL_ROUTES['tutor']
+    for _ in range(model_router.MIN_SAMPLES_FOR_SLO - 1):
+        model_router.record('tutor', settings['model'], settings['slo_p95_ms'] * 2)
+    assert model_router.route('tutor').reason is None
+
+
+def test_retryable_error_fails_over_to_the_fallback_model(monkeypatch):
+    calls = []
+
+    def upstream(chosen_route, model, messages, user_id, stream):
+        calls.append(model)
+        if model == chosen_route.model:
+            raise openai.error.APIConnectionError("connection reset")
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+    monkeypatch.setattr(model_router, '_guarded_call', upstream)
+    chosen = model_router.route('tutor')
+    assert model_router.complete(chosen, MESSAGES)['choices'][0]['message']['content'] == 'ok'
+    assert calls == [chosen.model, config.AI_FALLBACK_MODEL]
+    assert chosen.reason == 'upstream_error'
+    assert model_router.model_stats()[f"tutor/{chosen.model}"]['errors'] == 1
+
+
+def test_timeouts_count_against_the_slo(monkeypatch, clock):
+    settings = config.AI_MODEL_ROUTES['tutor']
+    timeout_ms = settings['slo_p95_ms'] * 3
+
+    def upstream(chosen_route, model, messages, user_id, stream):
+        if model == settings['model']:
+            clock[0] += timeout_ms / 1000.0
+            raise openai.error.Timeout("Request timed out")
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+    monkeypatch.setattr(model_router, '_guarded_call', upstream)
+    for _ in range(model_router.MIN_SAMPLES_FOR_SLO):
+        model_router.complete(model_router.route('tutor'), MESSAGES)
+
+    stats = model_router.model_stats()[f"tutor/{settings['model']}"]
+    assert stats['errors'] == model_router.MIN_SAMPLES_FOR_SLO
+    assert stats['p95_ms'] == pytest.approx(timeout_ms)
+    assert model_router.route('tutor').reason == 'slo_breach'
+
+
+def test_non_retryable_error_is_not_retried(monkeypatch):
+    calls = []
+
+    def upstream(chosen_route, model, messages, user_id, stream):
+        calls.append(model)
+        raise openai.error.InvalidRequestError("bad request", None)
+
+    monkeypatch.setattr(model_router, '_guarded_call', upstream)
+    with pytest.raises(openai.error.InvalidRequestError):
+        model_router.complete(model_router.route('tutor'), MESSAGES)
+    assert len(calls) == 1
+
+
+def test_complete_against_the_standin_records_latency_and_tokens(standin):
+    chosen = model_router.route('classify')
+    response = model_router.complete(chosen, [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Say hello!"},
+    ])
+    assert response.choices[0].message.content
+    stats = model_router.model_stats()[f"classify/{chosen.model}"]
+    assert stats['calls'] == 1 and stats['errors'] == 0
+    assert stats['p50_ms'] is not None and stats['prompt_tokens'] > 0
@@ -0,0 +1,45 @@
+# tests/test_openai_standin.py
+import openai_standin
+from services import prompt_builder
+
+CONTEXT = ("Cap rate is net operating income divided by the purchase price of a property. "
+           "A lower cap rate usually means a lower risk and a higher price.")
+
+
+def test_tutor_reply_is_grounded_in_the_context_not_the_question():
+    for question in ("What is cap rate?", "Why does a lower cap rate mean a higher price for the buyer?",
+                     "Can you explain how net operating income relates to cap rate?"):
+        messages = prompt_builder.build_tutor_messages(question, CONTEXT, "Chapter 2: Valuation")
+        reply = openai_standin.canned_reply(messages, {})
+        grounding = reply.split("Great question! ", 1)[1]
+        assert grounding in CONTEXT
+        assert question.lower() not in reply.lower()
+
+
+def test_replies_are_deterministic():
+    messages = prompt_builder.build_tutor_messages("What is cap rate?", CONTEXT, "Chapter 2: Valuation")
+    assert openai_standin.canned_reply(messages, {}) == openai_standin.canned_reply(messages, {})
+
+
+def test_intent_and_quick_action_replies():
+    intent = prompt_builder.build_intent_messages("ok, next")
+    assert openai_standin.canned_reply(intent, {}) == 'CONTINUE'
+    actions = openai_standin.canned_reply(prompt_builder.build_quick_actions_messages(CONTEXT), {})
+    lines = actions.splitlines()
+    assert [line[:3] for line in lines] == ['1. ', '2. ', '3. ']
+    assert all(line.endswith('?"') for line in lines)
+
+
+def test_tutor_reply_is_two_sentences_and_keeps_acronyms():
+    context = "## Cap Rate\n\nA property with $1,000,000 of NOI valued at $20,000,000 trades at a 5% cap rate."
+    messages = prompt_builder.build_tutor_messages("What is NOI?", context, "Chapter 2: Valuation")
+    reply = openai_standin.canned_reply(messages, {})
+    assert reply == "Great question! A property with $1,000,000 of NOI valued at $20,000,000 trades at a 5% cap rate."
+
+
+def test_quick_action_terms_stay_on_one_line_and_are_unique():
+    content = ("## Cap Rate\n\nThe Capitalization Rate, or Cap Rate, is Net Operating Income divided by "
+               "property value.")
+    actions = openai_standin.canned_reply(prompt_builder.build_quick_actions_messages(content), {})
+    assert actions.splitlines() == ['1. "What is Cap Rate?"', '2. "What is Capitalization Rate?"',
+                                    '3. "What is Net Operating Income?"']
@@ -0,0 +1,107 @@
+# tests/test_openai_transport.py
+import threading
+import time
+
+import pytest
+
+from services import openai_transport
+from services.openai_transport import ConcurrencyGate, UpstreamBusyError
+
+
+def _wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the gate")
+        time.sleep(0.001)
+
+
+def _queue(gate, flow, cost, name, order):
+    """Start a caller that records its name once served, then frees the slot"""
+    def call():
+        gate.acquire(flow=flow, cost=cost)
+        order.append(name)
+        gate.release()
+
+    waiting = gate.stats()['waiting']
+    thread = threading.Thread(target=call)
+    thread.start()
+    # Enqueue one at a time so arrival order is deterministic
+    _wait_until(lambda: gate.stats()['waiting'] == waiting + 1)
+    return thread
+
+
+def test_waiters_are_served_by_finish_tag_not_arrival():
+    gate = ConcurrencyGate(1, 10, 5)
+    gate.acquire(flow='holder')
+    order = []
+    threads = [
+        _queue(gate, 'heavy', 1, 'heavy-1', order),
+        _queue(gate, 'heavy', 1, 'heavy-2', order),
+        _queue(gate, 'heavy', 1, 'heavy-3', order),
+        _queue(gate, 'light', 1, 'light-1', order),
+        _queue(gate, 'costly', 3, 'costly-1', order),
+    ]
+    gate.release()
+    for thread in threads:
+        thread.join(2)
+
+    # Tags: heavy 1, 2, 3; light 1; costly 3 (ties go to the earlier arrival)
+    assert order == ['heavy-1', 'light-1', 'heavy-2', 'heavy-3', 'costly-1']
+    assert gate.stats() == {'active': 0, 'waiting': 0, 'flows_waiting': 0}
+    assert gate.virtual_time == 0.0 and gate._flow_finish == {}
+
+
+def test_per_flow_and_total_queue_caps():
+    gate = ConcurrencyGate(1, 2, 5, max_waiting_per_flow=1)
+    gate.acquire(flow='holder')
+    order = []
+    first = _queue(gate, 'ada', 1, 'ada-1', order)
+    with pytest.raises(UpstreamBusyError) as error:
+        gate.acquire(flow='ada')
+    assert error.value.status_code == 503 and error.value.headers['Retry-After']
+
+    second = _queue(gate, 'grace', 1, 'grace-1', order)
+    with pytest.raises(UpstreamBusyError):
+        gate.acquire(flow='alan')
+
+    gate.release()
+    first.join(2)
+    second.join(2)
+    assert order == ['ada-1', 'grace-1']
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    gate = ConcurrencyGate(1, 10, 0.05)
+    gate.acquire(flow='holder')
+    with pytest.raises(UpstreamBusyError):
+        gate.acquire(flow='ada')
+    assert gate.stats() == {'active': 1, 'waiting': 0, 'flows_waiting': 0}
+
+    # The slot goes back to the pool instead of to the departed waiter
+    gate.release()
+    assert gate.stats()['active'] == 0
+    gate.acquire(flow='grace')
+    assert gate.stats()['active'] == 1
+
+
+def test_slot_granted_just_after_the_timeout_is_kept(monkeypatch):
+    gate = ConcurrencyGate(1, 10, 0.01)
+    gate.acquire(flow='holder')
+
+    class LateEvent(threading.Event):
+        def wait(self, timeout=None):
+            # The wait expires, then the holder hands over its slot before the
+            # waiter re-takes the lock
+            super().wait(timeout)
+            gate.release()
+            return False
+
+    monkeypatch.setattr(openai_transport.threading, 'Event', LateEvent)
+    gate.acquire(flow='ada')
+    monkeypatch.undo()
+
+    # The waiter owns the slot it was handed; releasing it leaves the gate idle
+    assert gate.stats() == {'active': 1, 'waiting': 0, 'flows_waiting': 0}
+    gate.release()
+    assert gate.stats() == {'active': 0, 'waiting': 0, 'flows_waiting': 0}
@@ -0,0 +1,69 @@
+# tests/test_progress_routes.py
+import pytest
+
+from db_connection import DatabaseUnavailableError
+from services import user_service
+from storage.sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    repository = SqliteRepository(str(tmp_path / 'users.db'))
+    monkeypatch.setattr(user_service, 'repository', repository)
+    user_service._user_cache.clear()
+    return repository
+
+
+@pytest.fixture
+def user(repository, login):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    user_service._user_cache.clear()
+    login(user)
+    return user
+
+
+@pytest.fixture
+def outage(repository, monkeypatch):
+    """MongoDB unreachable: every repository call raises like get_db() does"""
+    def unavailable(*args, **kwargs):
+        raise DatabaseUnavailableError("Database is unavailable: connection refused")
+
+    for method in ('get_user', 'chapter_progress', 'complete_chapter'):
+        monkeypatch.setattr(repository, method, unavailable)
+
+
+def _assert_retry_later(response):
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert 'unavailable' in response.get_json()['error']
+
+
+def test_complete_chapter_during_an_outage_is_503_not_401(client, user, outage):
+    response = client.post('/progress/complete-chapter', json={'chapter_title': 'Chapter 1: Intro'})
+    _assert_retry_later(response)
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('get', '/progress/user', None),
+    ('get', '/get-user-progress', None),
+    ('post', '/progress/save', {'chapter_title': 'Chapter 1: Intro', 'section_index': 2, 'time_spent': 5}),
+    ('post', '/progress/save-batch', {'events': [{'chapter_title': 'Chapter 1: Intro', 'section_index': 2}]}),
+])
+def test_outage_is_503_with_retry_after_on_every_progress_route(client, user, outage, method, path, body):
+    response = getattr(client, method)(path, json=body)
+    _assert_retry_later(response)
+
+
+def test_progress_is_served_once_the_database_is_back(client, user, repository):
+    response = client.post('/progress/save', json={'chapter_title': 'Chapter 1: Intro', 'section_index': 2})
+    assert response.status_code == 200
+    user_service.flush_progress()
+
+    progress = client.get('/progress/user').get_json()['user']
+    assert progress['email'] == 'ada@example.com'
+    assert progress['course_progress']['Chapter 1: Intro']['section_index'] == 2
+
+
+def test_unknown_user_is_still_401(client, repository, login):
+    login({'_id': 'gone', 'email': 'gone@example.com'})
+    assert client.get('/progress/user').status_code == 401
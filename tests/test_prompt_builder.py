@@ -0,0 +1,35 @@
+# tests/test_prompt_builder.py
+from services import ai_service, prompt_builder
+
+CONTEXT = ("Cap rate is net operating income divided by the purchase price of a property. "
+           "A lower cap rate usually means a lower risk and a higher price.")
+
+
+def test_count_tokens_falls_back_when_the_encoding_cannot_load(offline_tokenizer):
+    assert prompt_builder._encoding('gpt-3.5-turbo') is None
+    assert prompt_builder.count_tokens('a' * 40) == 10
+
+
+def test_trim_to_tokens_without_an_encoding(offline_tokenizer):
+    trimmed = prompt_builder.trim_to_tokens(CONTEXT * 20, 30)
+    assert trimmed.endswith('...')
+    assert prompt_builder.count_tokens(trimmed) <= 32
+
+
+def test_messages_build_without_an_encoding(offline_tokenizer):
+    messages = prompt_builder.build_tutor_messages("What is cap rate?", CONTEXT, "Chapter 2: Valuation")
+    assert messages[0]['content'] == prompt_builder.TUTOR_SYSTEM_PROMPT
+    assert "Q: What is cap rate?" in messages[1]['content']
+    assert prompt_builder.count_message_tokens(messages) > 0
+
+
+def test_ai_service_works_without_an_encoding(offline_tokenizer, standin):
+    assert ai_service.classify_user_intent("ok, next please", "Intro", "Cap rates") == 'CONTINUE'
+    assert ai_service.classify_user_intent("what does NOI mean?", "Intro", "Cap rates") == 'QUESTION'
+
+    answer = ai_service.ask_question("What is cap rate?", CONTEXT, "Chapter 2: Valuation")
+    assert answer.startswith("Great question!")
+
+    chunks = list(ai_service.stream_response("What is cap rate?", CONTEXT, "Chapter 2: Valuation"))
+    streamed = ''.join(c['choices'][0].get('delta', {}).get('content', '') for c in chunks if c.get('choices'))
+    assert streamed.startswith("Great question!")
@@ -0,0 +1,134 @@
+# tests/test_sqlite_repository.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from storage.base import Repository
+from storage.sqlite_repository import IN_CHUNK, SqliteRepository
+
+T0 = datetime(2026, 1, 5, 9, 30, 0, 123000)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return SqliteRepository(str(tmp_path / 'storage.db'))
+
+
+def _login(repo, email, name, at=T0):
+    on_insert = {'name': name, 'name_lower': name.lower(), 'google_id': f'g-{email}', 'picture': None,
+                 'created_at': at, 'total_time_spent': 0, 'bookmarks': []}
+    return repo.upsert_login(email, on_insert, at, ('email', 'name', 'created_at', 'last_login'))
+
+
+def test_repository_backends_must_implement_every_method():
+    class Partial(Repository):
+        def get_user(self, user_id, fields=None):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_upsert_login_inserts_once_then_stamps_last_login(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    assert user['created_at'] == T0 and user['last_login'] == T0
+
+    later = T0 + timedelta(days=1)
+    again = _login(repo, 'ada@example.com', 'Someone else', at=later)
+    assert again['_id'] == user['_id']
+    assert again['name'] == 'Ada'
+    assert again['created_at'] == T0 and again['last_login'] == later
+    assert repo.count_users() == 1
+
+
+def test_get_user_projects_fields(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    loaded = repo.get_user(user['_id'], ('email', 'bookmarks', 'completed_chapters'))
+    assert loaded == {'_id': user['_id'], 'email': 'ada@example.com', 'bookmarks': []}
+    assert repo.get_user('missing') is None
+
+
+def test_list_users_prefix_search_and_keyset_pages(repo):
+    for email, name in [('ada@example.com', 'Ada'), ('alan@example.com', 'Alan'),
+                        ('grace@example.com', 'Grace'), ('bob@adacorp.com', 'Bob')]:
+        _login(repo, email, name)
+
+    assert {u['email'] for u in repo.list_users('ada', None, 10, ('email',))} == {'ada@example.com'}
+    assert {u['email'] for u in repo.list_users('a', None, 10, ('email',))} == {'ada@example.com', 'alan@example.com'}
+
+    first = repo.list_users(None, None, 3, ('email',))
+    rest = repo.list_users(None, first[-1]['_id'], 3, ('email',))
+    assert len(first) == 3 and len(rest) == 1
+    assert [u['_id'] for u in first + rest] == sorted(u['_id'] for u in first + rest)
+
+
+def test_progress_writes_accumulate_time_and_keep_latest_section(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    update = {'user_id': user['_id'], 'chapter_id': 'Chapter 1: Intro', 'section_index': 2, 'time_spent': 30, 'at': T0}
+    assert repo.write_chapter_progress([update]) == set()
+    assert repo.write_chapter_progress([dict(update, section_index=4, time_spent=15, at=T0 + timedelta(minutes=1))]) == set()
+
+    [progress] = repo.chapter_progress(user['_id'])
+    assert progress['section_index'] == 4 and progress['time_spent'] == 45
+    assert progress['completed'] is False
+    assert progress['last_updated'] == T0 + timedelta(minutes=1)
+
+
+def test_activity_keeps_the_latest_timestamp(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    repo.write_activity([{'user_id': user['_id'], 'time_spent': 10, 'at': T0 + timedelta(hours=1)}])
+    repo.write_activity([{'user_id': user['_id'], 'time_spent': 5, 'at': T0}])
+    loaded = repo.get_user(user['_id'], ('last_activity', 'total_time_spent'))
+    assert loaded['last_activity'] == T0 + timedelta(hours=1)
+    assert loaded['total_time_spent'] == 15
+
+
+def test_failed_batch_reports_every_index_and_writes_nothing(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    good = {'user_id': user['_id'], 'chapter_id': 'Chapter 1: Intro', 'section_index': 1, 'time_spent': 5, 'at': T0}
+    bad = dict(good, chapter_id='Chapter 2: Valuation', section_index=None)
+    assert repo.write_chapter_progress([good, bad]) == {0, 1}
+    assert repo.chapter_progress(user['_id']) == []
+
+
+def test_complete_chapter_and_completed_lookups(repo):
+    users = [_login(repo, f'user{i}@example.com', f'User {i}') for i in range(3)]
+    repo.complete_chapter(users[0]['_id'], 'Chapter 1: Intro', T0)
+    repo.complete_chapter(users[0]['_id'], 'Chapter 2: Valuation', T0)
+    repo.complete_chapter(users[1]['_id'], 'Chapter 1: Intro', T0)
+
+    completed = repo.completed_chapters_by_user([u['_id'] for u in users])
+    assert sorted(completed[users[0]['_id']]) == ['Chapter 1: Intro', 'Chapter 2: Valuation']
+    assert completed[users[1]['_id']] == ['Chapter 1: Intro']
+    assert users[2]['_id'] not in completed
+    assert repo.get_user(users[0]['_id'], ('last_activity',))['last_activity'] == T0
+
+
+def test_progress_for_many_users_is_chunked(repo):
+    user = _login(repo, 'ada@example.com', 'Ada')
+    repo.complete_chapter(user['_id'], 'Chapter 1: Intro', T0)
+    user_ids = [f'missing-{i}' for i in range(IN_CHUNK * 2)] + [user['_id']]
+    [row] = repo.progress_for_users(user_ids)
+    assert row['user_id'] == user['_id'] and row['completed_at'] == T0
+
+
+def test_iter_users_since_in_batches(repo):
+    users = [_login(repo, f'user{i}@example.com', f'User {i}') for i in range(5)]
+    for i, user in enumerate(users):
+        repo.write_activity([{'user_id': user['_id'], 'time_spent': 0, 'at': T0 + timedelta(days=i)}])
+    recent = list(repo.iter_users(T0 + timedelta(days=2), ('email', 'last_activity'), 2))
+    assert [u['email'] for u in recent] == ['user2@example.com', 'user3@example.com', 'user4@example.com']
+    assert len(list(repo.iter_users(None, ('email',), 2))) == 5
+
+
+def test_dwell_buckets_cap_their_sample_count(repo, monkeypatch):
+    monkeypatch.setattr(config, 'DWELL_BUCKET_MAX_SAMPLES', 5)
+    hour = T0.replace(minute=0, second=0, microsecond=0)
+    append = {'user_id': 'u1', 'chapter_id': 'Chapter 1: Intro', 'hour': hour,
+              'samples': [{'s': 0, 'd': 10}, {'s': 1, 'd': 20}, {'s': 2, 'd': 30}]}
+    assert repo.append_dwell([append]) == set()
+    assert repo.append_dwell([append]) == set()
+
+    rows = repo._conn().execute("SELECT count, total_seconds FROM dwell_buckets ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [(3, 60), (3, 60)]
@@ -0,0 +1,100 @@
+# tests/test_sse.py
+import json
+import threading
+
+import pytest
+
+import config
+from utils import sse
+
+
+@pytest.fixture(autouse=True)
+def streams(monkeypatch):
+    monkeypatch.setattr(config, 'SSE_COALESCE_MS', 0)
+    monkeypatch.setattr(config, 'SSE_COALESCE_MAX_CHARS', 1)
+    monkeypatch.setattr(sse, '_streams', sse.OrderedDict())
+    return sse._streams
+
+
+def _frames(text):
+    """(event id, data) pairs from SSE text, skipping keep-alive comments"""
+    events = []
+    for block in text.split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if lines:
+            events.append((lines['id'], lines['data']))
+    return events
+
+
+def _content(events):
+    return ''.join(json.loads(data).get('content', '') for _, data in events if data != '[DONE]')
+
+
+def _finished_stream(deltas, owner='user-1'):
+    gate = threading.Event()
+
+    def produce():
+        gate.wait(5)
+        yield from deltas
+
+    buffer = sse.start_stream(produce, owner=owner)
+    gate.set()
+    text = ''.join(sse.iter_events(buffer))
+    return buffer, _frames(text)
+
+
+def test_stream_frames_are_numbered_and_end_with_done():
+    buffer, events = _finished_stream(['Great ', 'question', '!'])
+    assert [event_id for event_id, _ in events] == [f"{buffer.stream_id}:{seq}" for seq in range(1, 5)]
+    assert events[-1][1] == '[DONE]'
+    assert _content(events) == 'Great question!'
+
+
+def test_resume_replays_only_events_after_last_event_id():
+    buffer, events = _finished_stream(['one ', 'two ', 'three'])
+    resumed, seq = sse.resume_stream(events[0][0], owner='user-1')
+    assert resumed is buffer and seq == 1
+
+    replay = _frames(''.join(sse.iter_events(resumed, seq)))
+    assert replay == events[1:]
+    assert _content(replay) == 'two three'
+
+
+def test_resume_is_refused_for_another_user_or_an_unknown_stream():
+    _, events = _finished_stream(['secret'])
+    assert sse.resume_stream(events[0][0], owner='user-2') == (None, 0)
+    assert sse.resume_stream('missing:1', owner='user-1') == (None, 0)
+    assert sse.resume_stream('not-an-id', owner='user-1') == (None, 0)
+
+
+def test_resume_is_refused_once_events_fall_out_of_the_window(monkeypatch):
+    monkeypatch.setattr(config, 'SSE_RESUME_BUFFER_EVENTS', 2)
+    buffer, events = _finished_stream(['a', 'b', 'c', 'd'])
+    assert [seq for seq, _ in buffer.events] == [4, 5]
+    assert sse.resume_stream(f"{buffer.stream_id}:1", owner='user-1') == (None, 0)
+    assert sse.resume_stream(f"{buffer.stream_id}:3", owner='user-1')[0] is buffer
+
+
+def test_finished_streams_expire_after_the_ttl(streams, monkeypatch):
+    buffer, _ = _finished_stream(['done'])
+    monkeypatch.setattr(config, 'SSE_RESUME_TTL_SECONDS', 60)
+    buffer.updated_at -= 61
+    sse.single_event_stream({'content': 'next'}, owner='user-1')
+    assert buffer.stream_id not in streams
+
+
+def test_registry_is_capped(streams, monkeypatch):
+    monkeypatch.setattr(config, 'SSE_MAX_STREAMS', 3)
+    buffers = [sse.single_event_stream({'content': str(i)}) for i in range(5)]
+    assert list(streams) == [b.stream_id for b in buffers[-3:]]
+
+
+def test_producer_errors_become_an_error_event():
+    def produce():
+        yield 'partial '
+        raise RuntimeError('upstream went away')
+
+    buffer = sse.start_stream(produce, owner='user-1')
+    events = _frames(''.join(sse.iter_events(buffer)))
+    assert json.loads(events[-2][1]) == {'error': 'Sorry, I encountered an issue.'}
+    assert events[-1][1] == '[DONE]'
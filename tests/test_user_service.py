@@ -0,0 +1,166 @@
+# tests/test_user_service.py
+import os
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from services import user_service
+from storage.sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    repository = SqliteRepository(str(tmp_path / 'users.db'))
+    monkeypatch.setattr(user_service, 'repository', repository)
+    user_service._user_cache.clear()
+    return repository
+
+
+def test_first_login_creates_the_user_and_later_logins_update_it(repository, capsys):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    assert "Created new user: ada@example.com" in capsys.readouterr().out
+
+    again = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    assert "Updated existing user: ada@example.com" in capsys.readouterr().out
+    assert again['_id'] == user['_id']
+    assert again['created_at'] == user['created_at']
+
+
+def test_new_user_detected_at_mongo_millisecond_precision(repository, monkeypatch, capsys):
+    upsert = repository.upsert_login
+
+    def millisecond_upsert(email, on_insert, now, fields):
+        # What MongoDB hands back: datetimes truncated to milliseconds
+        user = upsert(email, on_insert, now, fields)
+        created_at = user['created_at']
+        return dict(user, created_at=created_at.replace(microsecond=created_at.microsecond // 1000 * 1000))
+
+    monkeypatch.setattr(repository, 'upsert_login', millisecond_upsert)
+    user_service.upsert_login('grace@example.com', 'Grace', 'g-2', None)
+    assert "Created new user: grace@example.com" in capsys.readouterr().out
+
+
+@pytest.fixture
+def buffer(repository):
+    buffer = user_service.ProgressBuffer()
+    # Flush by hand instead of from the background thread
+    buffer._thread_pid = os.getpid()
+    return buffer
+
+
+def _fail_once(monkeypatch, repository, method):
+    write = getattr(repository, method)
+    calls = []
+
+    def failing(items):
+        calls.append(len(items))
+        if len(calls) == 1:
+            return set(range(len(items)))
+        return write(items)
+
+    monkeypatch.setattr(repository, method, failing)
+    return calls
+
+
+def test_failed_activity_write_is_retried_without_rewriting_progress(repository, buffer, monkeypatch):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    activity_calls = _fail_once(monkeypatch, repository, 'write_activity')
+    buffer.add(user['_id'], 'Chapter 1: Intro', 2, time_spent=30)
+
+    assert buffer.flush() == 0
+    assert buffer.pending_count() == 1
+    assert buffer.flush() == 1
+    assert activity_calls == [1, 1]
+
+    [progress] = repository.chapter_progress(user['_id'])
+    assert progress['section_index'] == 2 and progress['time_spent'] == 30
+    assert repository.get_user(user['_id'], ('total_time_spent',))['total_time_spent'] == 30
+
+
+def test_failed_progress_merges_with_newer_updates(repository, buffer, monkeypatch):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    _fail_once(monkeypatch, repository, 'write_chapter_progress')
+    buffer.add(user['_id'], 'Chapter 1: Intro', 2, time_spent=30)
+    buffer.flush()
+
+    # The reader moved on while the failed write waited for its retry
+    buffer.add(user['_id'], 'Chapter 1: Intro', 5, time_spent=10)
+    buffer.flush()
+
+    [progress] = repository.chapter_progress(user['_id'])
+    assert progress['section_index'] == 5 and progress['time_spent'] == 40
+    assert repository.get_user(user['_id'], ('total_time_spent',))['total_time_spent'] == 40
+    assert buffer.pending_count() == 0
+
+
+def test_failed_dwell_append_is_retried(repository, buffer, monkeypatch):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    dwell_calls = _fail_once(monkeypatch, repository, 'append_dwell')
+    sample = {'chapter_id': 'Chapter 1: Intro', 'section_index': 2, 'seconds': 12,
+              'at': datetime(2026, 1, 5, 9, 30)}
+    buffer.add(user['_id'], 'Chapter 1: Intro', 2, time_spent=12, dwell=sample)
+
+    buffer.flush()
+    buffer.flush()
+    assert dwell_calls == [1, 1]
+    [row] = repository._conn().execute("SELECT count, total_seconds FROM dwell_buckets").fetchall()
+    assert tuple(row) == (1, 12)
+    assert repository.get_user(user['_id'], ('total_time_spent',))['total_time_spent'] == 12
+
+
+def test_database_outage_is_not_reported_as_a_missing_user(repository, monkeypatch):
+    from db_connection import DatabaseUnavailableError
+
+    def unavailable(*args, **kwargs):
+        raise DatabaseUnavailableError()
+
+    monkeypatch.setattr(repository, 'get_user', unavailable)
+    monkeypatch.setattr(repository, 'chapter_progress', unavailable)
+    with pytest.raises(DatabaseUnavailableError):
+        user_service.get_user_by_id('missing', user_service.SESSION_FIELDS)
+    with pytest.raises(DatabaseUnavailableError):
+        user_service.get_chapter_progress('missing')
+
+
+@pytest.fixture
+def request_scope():
+    app = Flask(__name__)
+    return app.test_request_context
+
+
+def _write_from_another_worker(repository, user_id, section_index):
+    """A write handled by a different process: nothing here is invalidated"""
+    repository.write_chapter_progress([{'user_id': user_id, 'chapter_id': 'Chapter 1: Intro',
+                                        'section_index': section_index, 'time_spent': 5,
+                                        'at': datetime.utcnow()}])
+    repository.complete_chapter(user_id, 'Chapter 1: Intro', datetime.utcnow())
+
+
+def test_progress_written_by_another_worker_is_seen_on_the_next_request(repository, request_scope):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    with request_scope():
+        assert user_service.get_user_progress(user['_id'])['completed_chapters'] == []
+        _write_from_another_worker(repository, user['_id'], 3)
+        # Memoised for the rest of this request
+        assert user_service.get_user_progress(user['_id'])['completed_chapters'] == []
+
+    with request_scope():
+        progress = user_service.get_user_progress(user['_id'])
+        assert progress['completed_chapters'] == ['Chapter 1: Intro']
+        assert progress['course_progress']['Chapter 1: Intro']['section_index'] == 3
+
+
+def test_only_the_session_lookup_is_cached_across_requests(repository, request_scope, monkeypatch):
+    user = user_service.upsert_login('ada@example.com', 'Ada', 'g-1', None)
+    with request_scope():
+        user_service.get_user_by_id(user['_id'], user_service.SESSION_FIELDS)
+        user_service.get_user_progress(user['_id'])
+    assert list(user_service._user_cache) == [(user['_id'], user_service.SESSION_FIELDS)]
+
+    def unreachable(*args, **kwargs):
+        raise AssertionError("session lookup should be served from the cache")
+
+    monkeypatch.setattr(repository, 'get_user', unreachable)
+    with request_scope():
+        assert user_service.get_user_by_id(user['_id'], user_service.SESSION_FIELDS) == {'_id': user['_id']}
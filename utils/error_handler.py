@@ -16,10 +16,11 @@ logger = logging.getLogger('course_platform')
 
 class ApiError(Exception):
     """Custom exception for API errors"""
-    def __init__(self, message, status_code=500, details=None):
+    def __init__(self, message, status_code=500, details=None, headers=None):
         self.message = message
         self.status_code = status_code
         self.details = details
+        self.headers = headers or {}
         super().__init__(self.message)
 
 def handle_error(error, status_code=500, log_exception=True):
@@ -33,7 +34,8 @@ def handle_error(error, status_code=500, log_exception=True):
         "status": "error"
     }
     
-    return jsonify(response), status_code
+    headers = getattr(error, 'headers', None) or {}
+    return jsonify(response), status_code, headers
 
 def handle_api_error(error):
     """Handle ApiError exceptions"""
@@ -47,7 +49,7 @@ def handle_api_error(error):
     if error.details:
         response["details"] = error.details
     
-    return jsonify(response), error.status_code
+    return jsonify(response), error.status_code, error.headers
 
 def setup_error_handlers(app):
     """Set up error handlers for the Flask app"""
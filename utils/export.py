@@ -0,0 +1,55 @@
+# utils/export.py
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_since(value):
+    """Parse an ISO date or datetime for incremental exports; None passes through"""
+    if not value:
+        return None
+    try:
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid 'since' value: {value!r} (expected an ISO date or datetime)")
+    # Stored timestamps are naive UTC
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def ndjson_lines(rows):
+    """One JSON document per line"""
+    for row in rows:
+        yield json.dumps({key: _plain(value) for key, value in row.items()}, default=str) + "\n"
+
+
+def csv_lines(rows, fields):
+    """CSV header plus one line per row, written through a reused buffer"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: _plain(value) for key, value in row.items()})
+        if buffer.tell() >= 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def render(rows, fmt, fields):
+    """Serialize rows as NDJSON or CSV lazily"""
+    if fmt == 'csv':
+        return csv_lines(rows, fields)
+    return ndjson_lines(rows)
@@ -0,0 +1,63 @@
+# utils/instrumentation.py
+import time
+from contextlib import contextmanager
+from flask import g, request
+from utils import metrics
+from utils.metrics import registry
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+http_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request duration until the response is closed (includes streaming)',
+    ('endpoint', 'method'))
+dependency_calls = registry.counter(
+    'dependency_calls_total', 'Calls to Notion, MongoDB and OpenAI by operation and outcome',
+    ('dependency', 'operation', 'outcome'))
+dependency_duration = registry.histogram(
+    'dependency_duration_seconds', 'Time spent in Notion, MongoDB and OpenAI calls', ('dependency', 'operation'))
+
+
+def observe_dependency(dependency, operation, seconds, outcome='ok'):
+    dependency_calls.inc(dependency=dependency, operation=operation, outcome=outcome)
+    dependency_duration.observe(seconds, dependency=dependency, operation=operation)
+
+
+@contextmanager
+def timed(dependency, operation):
+    """Record one dependency call; exceptions count as outcome="error" and propagate"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        observe_dependency(dependency, operation, time.perf_counter() - started, outcome)
+
+
+def _before_request():
+    metrics.ensure_snapshots()
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    # Route endpoint, not the path, so labels stay bounded
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    status = str(response.status_code)
+
+    def record():
+        http_requests.inc(endpoint=endpoint, method=method, status=status)
+        http_duration.observe(time.perf_counter() - started, endpoint=endpoint, method=method)
+
+    # Runs once the body has been sent, so SSE responses count their full length
+    response.call_on_close(record)
+    return response
+
+
+def init_app(app):
+    """Time every request per endpoint"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,294 @@
+# utils/metrics.py
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import config
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """(suffix, labelvalues, extra labels, value) tuples for rendering"""
+        with self._lock:
+            return [('', key, None, value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {'kind': self.kind, 'documentation': self.documentation,
+                'labelnames': list(self.labelnames), 'values': values}
+
+    def _reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                out.append(('_bucket', key, [('le', _format_value(bound))], cumulative))
+            out.append(('_sum', key, None, state[-2]))
+            out.append(('_count', key, None, state[-1]))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), list(state)] for key, state in self._values.items()]
+        return {'kind': self.kind, 'documentation': self.documentation,
+                'labelnames': list(self.labelnames), 'buckets': list(self.buckets[:-1]), 'values': values}
+
+    def _reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+
+def _from_snapshot(name, data):
+    """Empty metric with the shape described by a snapshot entry"""
+    if data['kind'] == 'histogram':
+        return Histogram(name, data['documentation'], data['labelnames'], data['buckets'])
+    return Counter(name, data['documentation'], data['labelnames'])
+
+
+def merge_snapshots(snapshots):
+    """Add up registry snapshots from several processes into one Registry"""
+    merged = Registry()
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            metric = merged._register(_from_snapshot(name, data))
+            for key, value in data['values']:
+                key = tuple(key)
+                if metric.kind == 'histogram':
+                    state = metric._values.get(key)
+                    metric._values[key] = [a + b for a, b in zip(state, value)] if state else list(value)
+                else:
+                    metric._values[key] = metric._values.get(key, 0) + value
+    return merged
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """JSON-serializable raw values of every metric, for adding up across processes"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def _after_fork(self):
+        # Values recorded before the fork belong to the parent (see write_snapshot)
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._reset()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labelvalues, extra, value in metric.samples():
+                labels = _format_labels(metric.labelnames, labelvalues, extra)
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+registry = Registry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._after_fork)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# --- Multi-process aggregation ---
+#
+# With METRICS_DIR set (gunicorn.conf.py does), every process writes its
+# registry snapshot to METRICS_DIR/metrics-<pid>.json every
+# METRICS_SNAPSHOT_SECONDS and exposition() adds up all files, so a scrape
+# of any worker sees the whole host. The gunicorn master folds the files of
+# exited workers into metrics-archive.json so counters never go backwards.
+
+ARCHIVE_NAME = 'metrics-archive.json'
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _snapshot_path(pid):
+    return os.path.join(config.METRICS_DIR, f'metrics-{pid}.json')
+
+
+def _write_json(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=config.METRICS_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Gone (folded into the archive) between listing and reading
+        return None
+
+
+def write_snapshot():
+    """Write this process's values to METRICS_DIR (no-op without it)"""
+    if not config.METRICS_DIR:
+        return
+    try:
+        _write_json(_snapshot_path(os.getpid()), registry.snapshot())
+    except OSError as e:
+        print(f"Metrics snapshot failed: {e}")
+
+
+def ensure_snapshots():
+    """Start this process's snapshot writer once (cheap enough to call per request)"""
+    global _writer_pid
+    pid = os.getpid()
+    if not config.METRICS_DIR or _writer_pid == pid:
+        return
+    with _writer_lock:
+        if _writer_pid == pid:
+            return
+        _writer_pid = pid
+        os.makedirs(config.METRICS_DIR, exist_ok=True)
+        threading.Thread(target=_run_writer, name="metrics-snapshots", daemon=True).start()
+
+
+def _run_writer():
+    while True:
+        time.sleep(config.METRICS_SNAPSHOT_SECONDS)
+        write_snapshot()
+
+
+def mark_process_dead(pid):
+    """Fold an exited process's last snapshot into the archive (gunicorn child_exit)"""
+    if not config.METRICS_DIR:
+        return
+    path = _snapshot_path(pid)
+    snapshot = _read_json(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(config.METRICS_DIR, ARCHIVE_NAME)
+    archive = _read_json(archive_path) or {}
+    _write_json(archive_path, merge_snapshots([archive, snapshot]).snapshot())
+    os.unlink(path)
+
+
+def clear_snapshots():
+    """Start from zero (gunicorn on_starting): files from an earlier run don't count"""
+    if not config.METRICS_DIR:
+        return
+    os.makedirs(config.METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(config.METRICS_DIR, 'metrics-*.json')):
+        os.unlink(path)
+
+
+def exposition():
+    """Prometheus text for the whole host, or this process without METRICS_DIR"""
+    if not config.METRICS_DIR:
+        return registry.render()
+    write_snapshot()
+    snapshots = []
+    for path in glob.glob(os.path.join(config.METRICS_DIR, 'metrics-*.json')):
+        if path == _snapshot_path(os.getpid()):
+            continue
+        snapshot = _read_json(path)
+        if snapshot:
+            snapshots.append(snapshot)
+    # This process's own values are always current
+    snapshots.append(registry.snapshot())
+    return merge_snapshots(snapshots).render()
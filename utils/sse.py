@@ -0,0 +1,191 @@
+# utils/sse.py
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import config
+
+
+class StreamBuffer:
+    """Numbered SSE events for one streamed answer, kept so clients can resume"""
+
+    def __init__(self, stream_id, owner=None):
+        self.stream_id = stream_id
+        self.owner = owner
+        self.events = []  # list of (seq, frame) tuples
+        self.next_seq = 1
+        self.done = False
+        self.updated_at = time.monotonic()
+        self._pending = []
+        self._pending_len = 0
+        self._pending_since = None
+        self._cond = threading.Condition()
+
+    def _append_frame(self, data):
+        """Append one numbered frame (caller must hold the lock)"""
+        seq = self.next_seq
+        self.next_seq += 1
+        frame = f"id: {self.stream_id}:{seq}\ndata: {data}\n\n"
+        self.events.append((seq, frame))
+        # Keep only the most recent events for resume
+        overflow = len(self.events) - config.SSE_RESUME_BUFFER_EVENTS
+        if overflow > 0:
+            del self.events[:overflow]
+        self.updated_at = time.monotonic()
+        self._cond.notify_all()
+
+    def _flush_pending(self):
+        """Turn coalesced deltas into a single content frame (caller must hold the lock)"""
+        if not self._pending:
+            return
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_len = 0
+        self._pending_since = None
+        self._append_frame(json.dumps({'content': content}))
+
+    def add_delta(self, text):
+        """Coalesce a content delta, flushing once the size or time window is reached"""
+        if not text:
+            return
+        with self._cond:
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                # Wake readers so they time the coalescing window
+                self._cond.notify_all()
+            self._pending.append(text)
+            self._pending_len += len(text)
+            if (self._pending_len >= config.SSE_COALESCE_MAX_CHARS or
+                    time.monotonic() - self._pending_since >= config.SSE_COALESCE_MS / 1000.0):
+                self._flush_pending()
+
+    def add_event(self, payload):
+        """Append a non-content event (e.g. an error) after any pending content"""
+        with self._cond:
+            self._flush_pending()
+            self._append_frame(json.dumps(payload))
+
+    def finish(self):
+        """Flush remaining content and append the completion signal"""
+        with self._cond:
+            if self.done:
+                return
+            self._flush_pending()
+            self._append_frame("[DONE]")
+            self.done = True
+
+    def wait_events(self, after_seq, timeout):
+        """Return (frames after after_seq, done), waiting up to timeout for new ones"""
+        window = config.SSE_COALESCE_MS / 1000.0
+        with self._cond:
+            if not self._has_after(after_seq) and not self.done:
+                if self._pending_since is not None:
+                    timeout = min(timeout, max(0, self._pending_since + window - time.monotonic()))
+                self._cond.wait(timeout)
+            # Flush deltas that have sat in the coalescing window too long
+            if (self._pending_since is not None and
+                    time.monotonic() - self._pending_since >= window):
+                self._flush_pending()
+            frames = [(seq, frame) for seq, frame in self.events if seq > after_seq]
+            return frames, self.done
+
+    def _has_after(self, after_seq):
+        return bool(self.events) and self.events[-1][0] > after_seq
+
+
+# Per-process registry of recent streams, most recently created last
+_streams = OrderedDict()
+_streams_lock = threading.Lock()
+
+
+def _evict_streams():
+    """Drop finished streams past their TTL and cap the registry size (caller holds lock)"""
+    now = time.monotonic()
+    for stream_id in list(_streams.keys()):
+        buffer = _streams[stream_id]
+        if buffer.done and now - buffer.updated_at > config.SSE_RESUME_TTL_SECONDS:
+            del _streams[stream_id]
+    while len(_streams) > config.SSE_MAX_STREAMS:
+        _streams.popitem(last=False)
+
+
+def start_stream(produce_deltas, owner=None):
+    """Run produce_deltas() in a background thread, buffering its output as SSE events.
+
+    The producer keeps running if the client disconnects, so a reconnect with
+    Last-Event-ID can pick up the rest of the answer without a new LLM call.
+    """
+    buffer = StreamBuffer(uuid.uuid4().hex, owner)
+    with _streams_lock:
+        _streams[buffer.stream_id] = buffer
+        _evict_streams()
+
+    def run():
+        try:
+            for delta in produce_deltas():
+                buffer.add_delta(delta)
+        except Exception as e:
+            print(f"Error in streaming: {e}")
+            buffer.add_event({'error': 'Sorry, I encountered an issue.'})
+        finally:
+            buffer.finish()
+
+    threading.Thread(target=run, name=f"sse-{buffer.stream_id[:8]}", daemon=True).start()
+    return buffer
+
+
+def single_event_stream(payload, owner=None):
+    """Create an already-finished stream holding one event (e.g. a locally computed answer)"""
+    buffer = StreamBuffer(uuid.uuid4().hex, owner)
+    buffer.add_event(payload)
+    buffer.finish()
+    with _streams_lock:
+        _streams[buffer.stream_id] = buffer
+        _evict_streams()
+    return buffer
+
+
+def parse_last_event_id(last_event_id):
+    """Split a Last-Event-ID header into (stream_id, seq), or (None, 0) if malformed"""
+    if not last_event_id or ':' not in last_event_id:
+        return None, 0
+    stream_id, _, seq = last_event_id.rpartition(':')
+    try:
+        return stream_id, int(seq)
+    except ValueError:
+        return None, 0
+
+
+def resume_stream(last_event_id, owner=None):
+    """Find the buffered stream for a Last-Event-ID header; returns (buffer, seq) or (None, 0)"""
+    stream_id, seq = parse_last_event_id(last_event_id)
+    if not stream_id:
+        return None, 0
+    with _streams_lock:
+        buffer = _streams.get(stream_id)
+    if buffer is None or buffer.owner != owner:
+        return None, 0
+    # Events older than the resume window are gone, so the client must re-ask
+    if buffer.events and buffer.events[0][0] > seq + 1:
+        return None, 0
+    return buffer, seq
+
+
+def iter_events(buffer, after_seq=0):
+    """Yield SSE frames from a buffer, with keep-alive comments on idle streams"""
+    last_sent = time.monotonic()
+    while True:
+        wait = max(0, last_sent + config.SSE_HEARTBEAT_SECONDS - time.monotonic())
+        frames, done = buffer.wait_events(after_seq, wait)
+        if frames:
+            after_seq = frames[-1][0]
+            last_sent = time.monotonic()
+            # One write per batch of frames instead of one per token
+            yield "".join(frame for _, frame in frames)
+        elif time.monotonic() - last_sent >= config.SSE_HEARTBEAT_SECONDS:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        if done and not buffer._has_after(after_seq):
+            return